@@ -0,0 +1,124 @@
+"""Benchmark da inferência em blocos contra o modelo rodando com imgsz maior.
+
+Para imagens grandes com muitos objetos pequenos (mosaicos dos exemplos do ultralytics,
+ou um diretório próprio), compara:
+  - padrao:   a imagem inteira reduzida para a entrada de 640 do modelo (o `!detect` normal)
+  - blocos:   blocos sobrepostos + a imagem inteira, fundidos como no `!detect blocos`
+  - imgszN:   a imagem inteira com o modelo rodando em imgsz=N (ex.: 1280, 1920)
+
+Reporta a latência (mediana) e quantos objetos cada abordagem encontrou, incluindo os
+pequenos (lado menor que `--lado-pequeno` pixels), e exporta tudo em JSON.
+
+Uso:
+    python benchmarks/bench_blocos.py --tamanhos n --lados 2048,3072 --imgsz 1280,1920 --saida blocos.json
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import bot  # noqa: E402
+from bench_detect import gerar_corpus, commit_atual, saida_bot  # noqa: E402
+
+
+def inferir_padrao(modelo, image_array, args):
+    return bot.inferir_lote(modelo, [image_array], args.conf)[0]
+
+
+def inferir_blocos(modelo, image_array, args):
+    """Mesmo corte e fusão do bot, com os lotes montados aqui em vez do micro-batcher"""
+    recortes, posicoes = bot.cortar_blocos(image_array, args.bloco, args.sobreposicao)
+    fontes = recortes + [image_array]
+    resultados = []
+    for i in range(0, len(fontes), args.lote):
+        resultados += bot.inferir_lote(modelo, fontes[i:i + args.lote], args.conf)
+    altura, largura = image_array.shape[:2]
+    return bot.fundir_blocos(resultados, posicoes + [None], (largura, altura))
+
+
+def inferir_imgsz(imgsz):
+    def inferir(modelo, image_array, args):
+        with bot.trava_modelo(modelo):
+            result = modelo(image_array, conf=args.conf, imgsz=imgsz, verbose=False)[0]
+        return bot.extrair_deteccoes(result)
+    return inferir
+
+
+def medir(func, modelo, image_array, args):
+    func(modelo, image_array, args)  # aquecimento (novo formato de entrada)
+    tempos = []
+    for _ in range(args.repeticoes):
+        inicio = time.perf_counter()
+        deteccoes = func(modelo, image_array, args)
+        tempos.append(time.perf_counter() - inicio)
+    xyxy = deteccoes['xyxy']
+    lados = np.minimum(xyxy[:, 2] - xyxy[:, 0], xyxy[:, 3] - xyxy[:, 1])
+    return {
+        'ms': float(np.median(tempos) * 1000),
+        'objetos': int(len(deteccoes['cls'])),
+        'pequenos': int((lados < args.lado_pequeno).sum()),
+        'conf_media': float(deteccoes['conf'].mean()) if len(deteccoes['conf']) else 0.0
+    }
+
+
+async def main(args):
+    lados = [int(v) for v in args.lados.split(',')]
+    grades = [int(v) for v in args.densidades.split(',')]
+    corpus = gerar_corpus(args.corpus, lados, grades)
+    abordagens = [('padrao', inferir_padrao), ('blocos', inferir_blocos)]
+    abordagens += [(f"imgsz{n}", inferir_imgsz(int(n))) for n in args.imgsz.split(',') if n]
+    print(f"Corpus: {len(corpus)} imagens; blocos de {args.bloco}px com {args.sobreposicao:.0%} de sobreposição")
+
+    bot.BACKEND_REPORT = False
+    resultados = []
+    for tamanho in args.tamanhos.split(','):
+        with saida_bot(args.verbose):
+            modelo = await bot.MODEL_POOL.obter(tamanho)
+        print(f"\n== YOLOv8{tamanho} ==")
+        print(f"{'imagem':<28}{'abordagem':<11}{'ms':>9}{'objetos':>9}{'pequenos':>10}{'conf':>7}")
+        for item in corpus:
+            _, image_array, _ = bot.preparar_imagem(item['dados'], max(item['lado'], bot.CONFIG['decode_target']))
+            for nome, func in abordagens:
+                with saida_bot(args.verbose):
+                    medida = medir(func, modelo, image_array, args)
+                print(f"{item['nome']:<28}{nome:<11}{medida['ms']:>9.0f}{medida['objetos']:>9}"
+                      f"{medida['pequenos']:>10}{medida['conf_media']:>7.2f}")
+                resultados.append({'tamanho': tamanho, 'imagem': item['nome'], 'abordagem': nome, **medida})
+
+    if args.saida:
+        relatorio = {
+            'meta': {'commit': commit_atual(), 'data': time.strftime('%Y-%m-%d %H:%M:%S'), 'cpus': os.cpu_count(),
+                     'argumentos': vars(args)},
+            'resultados': resultados
+        }
+        with open(args.saida, 'w', encoding='utf-8') as f:
+            json.dump(relatorio, f, indent=2, ensure_ascii=False)
+        print(f"\nResultados salvos em {args.saida}")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--tamanhos', default='n', help="tamanhos de modelo, separados por vírgula (ex.: n,s)")
+    parser.add_argument('--lados', default='2048', help="maior lado das imagens do corpus")
+    parser.add_argument('--densidades', default='4', help="grades de mosaico (objetos menores e mais numerosos)")
+    parser.add_argument('--corpus', help="diretório com imagens próprias (padrão: exemplos do ultralytics)")
+    parser.add_argument('--imgsz', default='1280,1920', help="tamanhos de entrada para a imagem inteira")
+    parser.add_argument('--bloco', type=int, default=bot.CONFIG['tile_size'])
+    parser.add_argument('--sobreposicao', type=float, default=bot.CONFIG['tile_overlap'])
+    parser.add_argument('--lote', type=int, default=bot.CONFIG['max_batch_size'], help="blocos por lote de inferência")
+    parser.add_argument('--conf', type=float, default=0.25)
+    parser.add_argument('--lado-pequeno', type=int, default=48, help="objetos com o lado menor abaixo disto contam como pequenos")
+    parser.add_argument('--repeticoes', type=int, default=3)
+    parser.add_argument('--saida', help="arquivo JSON para os resultados")
+    parser.add_argument('--verbose', action='store_true', help="mostra os logs do bot")
+    args = parser.parse_args()
+
+    if not args.verbose:
+        logging.getLogger('ultralytics').setLevel(logging.WARNING)
+    asyncio.run(main(args))
@@ -0,0 +1,88 @@
+"""Micro-benchmark da análise de cores: implementação vetorizada vs. Counter de tuplas.
+
+Uso: python benchmarks/bench_cores.py [--repeticoes N]
+"""
+import argparse
+import os
+import sys
+import timeit
+from collections import Counter
+
+import numpy as np
+from PIL import Image
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from bot import analyze_colors, _cores_quantizadas  # noqa: E402
+
+
+# Implementação original (lista de tuplas + Counter), mantida como referência
+def analyze_colors_counter(image, num_colors=5):
+    img_small = image.copy()
+    img_small.thumbnail((100, 100))
+    if img_small.mode != 'RGB':
+        img_small = img_small.convert('RGB')
+    pixels = np.array(img_small).reshape(-1, 3)
+    return _contar_counter(pixels, num_colors)
+
+def _contar_counter(pixels, num_colors=5):
+    pixels_simple = (pixels // 32) * 32
+    pixels_rgb = [tuple(pixel) for pixel in pixels_simple]
+    most_common = Counter(pixels_rgb).most_common(num_colors)
+    total_pixels = len(pixels_rgb)
+    return [{
+        'rgb': color,
+        'hex': '#{:02x}{:02x}{:02x}'.format(color[0], color[1], color[2]),
+        'percentage': count / total_pixels * 100
+    } for color, count in most_common]
+
+
+def gerar_imagem(largura, altura, tipo, rng):
+    if tipo == 'ruido':
+        dados = rng.integers(0, 256, size=(altura, largura, 3), dtype=np.uint8)
+    else:
+        # Gradiente suave com poucos tons, parecido com screenshots/memes
+        x = np.linspace(0, 255, largura, dtype=np.float32)
+        y = np.linspace(0, 255, altura, dtype=np.float32)
+        dados = np.stack(np.broadcast_arrays(x[None, :], y[:, None], (x[None, :] + y[:, None]) / 2), axis=2)
+        dados = dados.astype(np.uint8)
+    return Image.fromarray(dados, 'RGB')
+
+
+def medir(func, repeticoes):
+    return min(timeit.repeat(func, number=1, repeat=repeticoes)) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--repeticoes', type=int, default=20)
+    args = parser.parse_args()
+    rng = np.random.default_rng(0)
+
+    print("== analyze_colors (thumbnail 100x100) ==")
+    print(f"{'imagem':<22}{'counter (ms)':>14}{'numpy (ms)':>12}{'kmeans (ms)':>13}{'mediancut (ms)':>16}{'ganho':>8}  iguais")
+    for largura, altura in [(640, 480), (1920, 1080), (4000, 3000)]:
+        for tipo in ['gradiente', 'ruido']:
+            image = gerar_imagem(largura, altura, tipo, rng)
+            antigo = analyze_colors_counter(image)
+            novo = analyze_colors(image)
+            iguais = [(c['rgb'], c['hex']) for c in antigo] == [(c['rgb'], c['hex']) for c in novo]
+
+            t_antigo = medir(lambda: analyze_colors_counter(image), args.repeticoes)
+            t_novo = medir(lambda: analyze_colors(image), args.repeticoes)
+            t_kmeans = medir(lambda: analyze_colors(image, modo='kmeans'), max(1, args.repeticoes // 4))
+            t_mediancut = medir(lambda: analyze_colors(image, modo='mediancut'), args.repeticoes)
+            print(f"{f'{largura}x{altura} {tipo}':<22}{t_antigo:>14.2f}{t_novo:>12.2f}{t_kmeans:>13.2f}"
+                  f"{t_mediancut:>16.2f}{t_antigo / t_novo:>7.1f}x  {'sim' if iguais else 'NÃO'}")
+
+    # Apenas a contagem, sem thumbnail: mostra como cada abordagem escala com o número de pixels
+    print("\n== contagem de cores por número de pixels ==")
+    print(f"{'pixels':<12}{'counter (ms)':>14}{'numpy (ms)':>12}{'ganho':>8}")
+    for lado in [100, 250, 500, 1000]:
+        pixels = rng.integers(0, 256, size=(lado * lado, 3), dtype=np.uint8)
+        t_antigo = medir(lambda: _contar_counter(pixels), max(1, args.repeticoes // 4))
+        t_novo = medir(lambda: _cores_quantizadas(pixels, 5), args.repeticoes)
+        print(f"{lado * lado:<12}{t_antigo:>14.2f}{t_novo:>12.2f}{t_antigo / t_novo:>7.1f}x")
+
+
+if __name__ == '__main__':
+    main()
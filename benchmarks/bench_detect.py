@@ -0,0 +1,324 @@
+"""Benchmark offline do pipeline do detect, sem conexão com o Discord.
+
+Dirige o comando `detect` real (direto ou pelo roteamento do `on_message`) com
+stand-ins de ctx/Attachment, sobre um corpus de imagens locais com resoluções e
+densidades de objetos variadas. Reporta latência p50/p95/p99, imagens por segundo
+e o tempo de cada etapa (download, decode, cores, inferência, plot, encode, envio...)
+por tamanho de modelo e nível de concorrência, exportando tudo em JSON.
+
+Uso:
+    python benchmarks/bench_detect.py --tamanhos n,s --concorrencia 1,4,8 --pedidos 32 --saida bench.json
+"""
+import argparse
+import asyncio
+import contextlib
+import io
+import json
+import logging
+import os
+import platform
+import subprocess
+import sys
+import time
+
+import numpy as np
+from PIL import Image
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+import bot  # noqa: E402
+
+
+def saida_bot(verbose):
+    """Logs do bot visíveis com --verbose; descartados durante as medições normais"""
+    return contextlib.nullcontext() if verbose else contextlib.redirect_stdout(io.StringIO())
+
+
+# ---------------------------------------------------------------------------
+# Stand-ins dos objetos do discord.py usados pelo detect
+# ---------------------------------------------------------------------------
+
+class FakeAttachment:
+    def __init__(self, filename, dados, latencia=0.0):
+        self.filename = filename
+        self.size = len(dados)
+        self._dados = dados
+        self._latencia = latencia
+
+    async def read(self):
+        if self._latencia:
+            await asyncio.sleep(self._latencia)
+        return self._dados
+
+
+class FakeUser:
+    def __init__(self, user_id):
+        self.id = user_id
+        self.name = f"bench{user_id}"
+        self.bot = False
+
+
+class FakeGuild:
+    def __init__(self, guild_id):
+        self.id = guild_id
+        self.name = f"guild{guild_id}"
+        self.filesize_limit = 25 * 1024 * 1024
+
+
+class FakeChannel:
+    def __init__(self, channel_id):
+        self.id = channel_id
+
+
+class FakeSentMessage:
+    def __init__(self, content):
+        self.content = content
+
+    async def edit(self, content=None, **kwargs):
+        self.content = content
+
+
+class FakeMessage:
+    _proximo_id = 1
+
+    def __init__(self, content, attachments, user_id=1, guild_id=1):
+        self.id = FakeMessage._proximo_id
+        FakeMessage._proximo_id += 1
+        self.content = content
+        self.attachments = attachments
+        self.author = FakeUser(user_id)
+        self.guild = FakeGuild(guild_id)
+        self.channel = FakeChannel(guild_id * 100)
+
+
+class FakeContext:
+    def __init__(self, message, latencia_envio=0.0):
+        self.message = message
+        self.author = message.author
+        self.guild = message.guild
+        self.channel = message.channel
+        self.enviados = []
+        self._latencia_envio = latencia_envio
+
+    async def send(self, content=None, file=None, files=None, **kwargs):
+        if self._latencia_envio and (file or files):
+            await asyncio.sleep(self._latencia_envio)
+        self.enviados.append(content)
+        return FakeSentMessage(content)
+
+    async def reply(self, content=None, **kwargs):
+        return await self.send(content, **kwargs)
+
+
+# ---------------------------------------------------------------------------
+# Corpus
+# ---------------------------------------------------------------------------
+
+def imagens_base(diretorio):
+    if diretorio:
+        caminhos = sorted(
+            os.path.join(diretorio, nome) for nome in os.listdir(diretorio)
+            if nome.lower().endswith(('.png', '.jpg', '.jpeg', '.webp', '.bmp'))
+        )
+    else:
+        from ultralytics.utils import ASSETS
+        caminhos = sorted(str(p) for p in ASSETS.glob('*.jpg'))
+    return [(os.path.splitext(os.path.basename(c))[0], Image.open(c).convert('RGB')) for c in caminhos]
+
+
+def mosaico(imagem, grade):
+    """Repete a imagem em uma grade grade x grade: mais objetos na mesma área"""
+    w, h = imagem.size
+    tile = imagem.resize((max(1, w // grade), max(1, h // grade)))
+    saida = Image.new('RGB', (tile.width * grade, tile.height * grade))
+    for i in range(grade):
+        for j in range(grade):
+            saida.paste(tile, (j * tile.width, i * tile.height))
+    return saida
+
+
+def gerar_corpus(diretorio, lados, grades):
+    corpus = []
+    for nome, imagem in imagens_base(diretorio):
+        for grade in grades:
+            denso = mosaico(imagem, grade) if grade > 1 else imagem
+            for lado in lados:
+                escala = lado / max(denso.size)
+                redimensionada = denso.resize((max(1, round(denso.width * escala)), max(1, round(denso.height * escala))))
+                buffer = io.BytesIO()
+                redimensionada.save(buffer, format='JPEG', quality=90)
+                corpus.append({
+                    'nome': f"{nome}_{grade}x{grade}_{lado}px.jpg",
+                    'lado': lado,
+                    'grade': grade,
+                    'dados': buffer.getvalue()
+                })
+    return corpus
+
+
+# ---------------------------------------------------------------------------
+# Execução
+# ---------------------------------------------------------------------------
+
+def percentis(valores_s):
+    if not valores_s:
+        return None
+    ms = np.asarray(valores_s) * 1000
+    return {
+        'p50': float(np.percentile(ms, 50)),
+        'p95': float(np.percentile(ms, 95)),
+        'p99': float(np.percentile(ms, 99)),
+        'media': float(ms.mean()),
+        'n': int(ms.size)
+    }
+
+
+async def executar_pedido(args, corpus, indice, rota):
+    itens = [corpus[(indice + k) % len(corpus)] for k in range(args.imagens_por_pedido)]
+    attachments = [FakeAttachment(item['nome'], item['dados'], args.latencia_download_ms / 1000) for item in itens]
+    # Usuários/servidores distintos, como em tráfego real
+    message = FakeMessage('detect' if rota == 'on_message' else '!detect', attachments,
+                          user_id=indice % 50 + 1, guild_id=indice % 5 + 1)
+    ctx = FakeContext(message, args.latencia_envio_ms / 1000)
+
+    with bot.registrar_etapas() as tempos:
+        inicio = time.perf_counter()
+        if rota == 'on_message':
+            bot.bot.get_context = lambda msg, **kwargs: _contexto_pronto(ctx)
+            await bot.on_message(message)
+        else:
+            await bot.detect(ctx)
+        duracao = time.perf_counter() - inicio
+    return duracao, tempos, len(itens), ctx.enviados
+
+
+async def _contexto_pronto(ctx):
+    return ctx
+
+
+async def rodada(args, corpus, tamanho, concorrencia, rota):
+    semaforo = asyncio.Semaphore(concorrencia)
+    latencias, etapas, imagens, erros = [], {}, 0, 0
+
+    async def um(indice):
+        nonlocal imagens, erros
+        async with semaforo:
+            duracao, tempos, n_imagens, enviados = await executar_pedido(args, corpus, indice, rota)
+        latencias.append(duracao)
+        imagens += n_imagens
+        if not enviados or any(e and (e.startswith('Ocorreu um erro') or e.startswith('⏳') or e.startswith('Erro')) for e in enviados):
+            erros += 1
+        for etapa, valores in tempos.items():
+            etapas.setdefault(etapa, []).extend(valores)
+
+    inicio = time.perf_counter()
+    await asyncio.gather(*(um(i) for i in range(args.pedidos)))
+    duracao_total = time.perf_counter() - inicio
+
+    return {
+        'tamanho': tamanho,
+        'concorrencia': concorrencia,
+        'rota': rota,
+        'pedidos': args.pedidos,
+        'imagens': imagens,
+        'erros': erros,
+        'duracao_s': duracao_total,
+        'imagens_por_s': imagens / duracao_total,
+        'latencia_ms': percentis(latencias),
+        'etapas_ms': {etapa: percentis(valores) for etapa, valores in sorted(etapas.items())}
+    }
+
+
+def imprimir(resultado):
+    lat = resultado['latencia_ms']
+    print(f"\nYOLOv8{resultado['tamanho']} | concorrência {resultado['concorrencia']} | {resultado['rota']}: "
+          f"{resultado['imagens_por_s']:.2f} img/s | p50 {lat['p50']:.0f}ms p95 {lat['p95']:.0f}ms "
+          f"p99 {lat['p99']:.0f}ms | erros {resultado['erros']}")
+    for etapa, p in resultado['etapas_ms'].items():
+        print(f"    {etapa:<12} p50 {p['p50']:8.1f}ms  p95 {p['p95']:8.1f}ms  p99 {p['p99']:8.1f}ms  (n={p['n']})")
+
+
+def commit_atual():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'], cwd=RAIZ, text=True).strip()
+    except Exception:
+        return None
+
+
+async def main(args):
+    lados = [int(v) for v in args.resolucoes.split(',')]
+    grades = [int(v) for v in args.densidades.split(',')]
+    corpus = gerar_corpus(args.corpus, lados, grades)
+    print(f"Corpus: {len(corpus)} imagens ({', '.join(str(l) for l in lados)}px; grades {', '.join(str(g) for g in grades)})")
+
+    # Sem cache, por padrão: cada pedido percorre o pipeline completo
+    if not args.com_cache:
+        bot.DETECTION_CACHE.max_entradas = 0
+    bot.CONFIG['confidence_threshold'] = args.conf
+    # Sem limite de taxa, por padrão: o benchmark dispara pedidos muito mais rápido que um usuário
+    if not args.com_limite:
+        bot.CONFIG['user_rate_per_min'] = bot.CONFIG['guild_rate_per_min'] = 0
+
+    # Sem o relatório de backends, que atrasaria a inicialização e exportaria modelos para o disco
+    bot.BACKEND_REPORT = False
+    
+    resultados = []
+    for tamanho in args.tamanhos.split(','):
+        bot.CONFIG['model_size'] = tamanho
+        with saida_bot(args.verbose):
+            # Mesmo caminho da inicialização do bot: carrega, aquece e libera o detect
+            await bot.inicializar_modelo()
+            # Aquecimento adicional com o pipeline completo
+            for i in range(args.aquecimento):
+                await executar_pedido(args, corpus, i, 'comando')
+        for concorrencia in [int(v) for v in args.concorrencia.split(',')]:
+            for rota in args.rotas.split(','):
+                with saida_bot(args.verbose):
+                    resultado = await rodada(args, corpus, tamanho, concorrencia, rota)
+                imprimir(resultado)
+                resultados.append(resultado)
+
+    if args.saida:
+        import torch  # já carregado pelo modelo
+        relatorio = {
+            'meta': {
+                'commit': commit_atual(),
+                'data': time.strftime('%Y-%m-%d %H:%M:%S'),
+                'python': platform.python_version(),
+                'torch': torch.__version__,
+                'cpus': os.cpu_count(),
+                'plataforma': platform.platform(),
+                'config': {k: v for k, v in bot.CONFIG.items()},
+                'tempo_ate_pronto_s': bot.INICIALIZACAO['tempo_ate_pronto'],
+                'argumentos': vars(args)
+            },
+            'resultados': resultados
+        }
+        with open(args.saida, 'w', encoding='utf-8') as f:
+            json.dump(relatorio, f, indent=2, ensure_ascii=False)
+        print(f"\nResultados salvos em {args.saida}")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--tamanhos', default='n', help="tamanhos de modelo, separados por vírgula (ex.: n,s)")
+    parser.add_argument('--concorrencia', default='1,4', help="níveis de concorrência (ex.: 1,4,8)")
+    parser.add_argument('--rotas', default='on_message', help="on_message e/ou comando")
+    parser.add_argument('--pedidos', type=int, default=16, help="pedidos por rodada")
+    parser.add_argument('--imagens-por-pedido', type=int, default=1)
+    parser.add_argument('--resolucoes', default='320,640,1280,2560', help="maior lado das imagens do corpus")
+    parser.add_argument('--densidades', default='1,3', help="grades de mosaico (mais objetos por imagem)")
+    parser.add_argument('--corpus', help="diretório com imagens próprias (padrão: exemplos do ultralytics)")
+    parser.add_argument('--conf', type=float, default=0.25)
+    parser.add_argument('--aquecimento', type=int, default=2)
+    parser.add_argument('--latencia-download-ms', type=float, default=0.0, help="latência simulada do download do anexo")
+    parser.add_argument('--latencia-envio-ms', type=float, default=0.0, help="latência simulada do upload da resposta")
+    parser.add_argument('--com-cache', action='store_true', help="mantém o cache de detecções ligado")
+    parser.add_argument('--com-limite', action='store_true', help="mantém os limites de taxa por usuário/servidor")
+    parser.add_argument('--saida', help="arquivo JSON para os resultados")
+    parser.add_argument('--verbose', action='store_true', help="mostra os logs do bot")
+    args = parser.parse_args()
+
+    if not args.verbose:
+        logging.getLogger('ultralytics').setLevel(logging.WARNING)
+    asyncio.run(main(args))
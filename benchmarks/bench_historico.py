@@ -0,0 +1,101 @@
+"""Benchmark do histórico de detecções: gravação em lotes e consultas do `!historico`/`!top`.
+
+Preenche um banco SQLite temporário com pedidos sintéticos (várias classes, canais e
+servidores, espalhados pelos últimos dias) pelo mesmo caminho de gravação do bot e
+mede a vazão da gravação e a latência das consultas com o banco cheio.
+
+Uso:
+    python benchmarks/bench_historico.py --objetos 2000000 --lote 500
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import bot  # noqa: E402
+
+CLASSES = ['person', 'car', 'bus', 'truck', 'bicycle', 'dog', 'cat', 'bird', 'chair', 'bottle', 'cup', 'tv']
+
+
+def gerar_lote(rng, tamanho, args, agora):
+    lote = []
+    for _ in range(tamanho):
+        n = int(rng.integers(1, 2 * args.objetos_por_pedido))
+        classes_objetos = rng.choice(len(CLASSES), size=n, p=np.linspace(2, 1, len(CLASSES)) / np.linspace(2, 1, len(CLASSES)).sum())
+        confs = rng.uniform(0.25, 1.0, size=n)
+        objetos = [(CLASSES[c], float(p), str(bot.REGIOES[int(rng.integers(9))]), 100.0, 80.0)
+                   for c, p in zip(classes_objetos, confs)]
+        contagens = np.bincount(classes_objetos, minlength=len(CLASSES))
+        somas = np.bincount(classes_objetos, weights=confs, minlength=len(CLASSES))
+        classes = [(CLASSES[c], int(contagens[c]), float(somas[c] / contagens[c])) for c in np.flatnonzero(contagens)]
+        ts = agora - int(rng.integers(0, args.dias * 86400))
+        guild = int(rng.integers(1, args.servidores + 1))
+        canal = guild * 1000 + int(rng.integers(args.canais))
+        lote.append((ts, guild, canal, int(rng.integers(1, 5000)), 'n', 'imagem', classes, objetos))
+    return lote
+
+
+def medir_consulta(func, repeticoes):
+    tempos = []
+    for _ in range(repeticoes):
+        inicio = time.perf_counter()
+        func()
+        tempos.append(time.perf_counter() - inicio)
+    return float(np.median(tempos) * 1000)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--objetos', type=int, default=1_000_000, help="linhas por objeto a gravar (aproximado)")
+    parser.add_argument('--objetos-por-pedido', type=int, default=5)
+    parser.add_argument('--lote', type=int, default=bot.HISTORY_BATCH_SIZE, help="pedidos por transação")
+    parser.add_argument('--servidores', type=int, default=20)
+    parser.add_argument('--canais', type=int, default=10, help="canais por servidor")
+    parser.add_argument('--dias', type=int, default=90)
+    parser.add_argument('--repeticoes', type=int, default=20)
+    parser.add_argument('--banco', help="arquivo do banco (padrão: temporário)")
+    args = parser.parse_args()
+
+    caminho = args.banco or os.path.join(tempfile.mkdtemp(), 'historico_bench.db')
+    historico = bot.HistoricoDeteccoes(caminho, args.lote, 0, 0)
+    with historico._conectar() as conexao:
+        conexao.executescript(bot.ESQUEMA_HISTORICO)
+    conexao = historico._conectar()
+
+    rng = np.random.default_rng(0)
+    agora = int(time.time())
+    pedidos = objetos = 0
+    tempo_gravacao = 0.0
+    while objetos < args.objetos:
+        lote = gerar_lote(rng, args.lote, args, agora)
+        inicio = time.perf_counter()
+        historico._gravar(conexao, lote)
+        tempo_gravacao += time.perf_counter() - inicio
+        pedidos += len(lote)
+        objetos += sum(len(registro[7]) for registro in lote)
+    conexao.close()
+    print(f"Gravados {pedidos} pedidos e {objetos} objetos em {tempo_gravacao:.1f}s "
+          f"({pedidos / tempo_gravacao:.0f} pedidos/s, {objetos / tempo_gravacao:.0f} objetos/s, lotes de {args.lote})")
+    print(f"Banco: {caminho} ({os.path.getsize(caminho) / 1024**2:.0f} MB)\n")
+
+    consultas = [
+        ("!historico (canal, 7 dias)", lambda: historico.historico_canal(1, 1000, 7)),
+        ("!historico car (canal, 7 dias)", lambda: historico.historico_canal(1, 1000, 7, 'car')),
+        ("!historico car (canal, 90 dias)", lambda: historico.historico_canal(1, 1000, 90, 'car')),
+        ("!top classes (servidor, 7 dias)", lambda: historico.top(1, 'classes', 7)),
+        ("!top canais (servidor, 90 dias)", lambda: historico.top(1, 'canais', 90)),
+        ("sem agregados: car no canal (7 dias)", lambda: historico.consultar(
+            "SELECT COUNT(*) FROM objetos WHERE guild_id = ? AND canal_id = ? AND classe = ? AND ts >= ?",
+            (1, 1000, 'car', agora - 7 * 86400))),
+    ]
+    print(f"{'consulta':<40}{'mediana (ms)':>14}")
+    for nome, func in consultas:
+        print(f"{nome:<40}{medir_consulta(func, args.repeticoes):>14.2f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -1,717 +1,4347 @@
-import os
-import io
-import discord
-from discord.ext import commands
-from dotenv import load_dotenv
-from PIL import Image, ImageDraw, ImageFont
-import torch
-import numpy as np
-from collections import Counter
-from datetime import datetime
-import asyncio
-import aiohttp
-import threading
-
-# Adicionar classes seguras para o PyTorch 2.6
-try:
-    from ultralytics.nn.tasks import DetectionModel, BaseModel, ClassificationModel, SegmentationModel, PoseModel, OBBModel, RTDETRDetectionModel
-    from ultralytics.nn.modules import Conv, C2f, SPPF, Detect, AIFI, Bottleneck, BottleneckCSP, C1, C2, C3, C3Ghost, C3TR, C3x, CBAM, ChannelAttention, Classify, Concat, Conv2, ConvTranspose, DFL, DWConv, DWConvTranspose2d, Focus, GhostBottleneck, GhostConv, HGBlock, HGStem, LayerNorm2d, LightConv, MLP, MLPBlock, OBB, Pose, Proto, RTDETRDecoder, TransformerLayer
-    import torch.serialization
-    import torch.nn.modules.container
-    import ultralytics.nn.modules
-    import ultralytics.nn.tasks
-    
-    # Lista de classes que sabemos que existem
-    safe_classes = [
-        # Classes principais
-        DetectionModel,
-        BaseModel,
-        ClassificationModel,
-        SegmentationModel,
-        PoseModel,
-        OBBModel,
-        RTDETRDetectionModel,
-        
-        # Classes de módulos
-        Conv,
-        C2f,
-        SPPF,
-        Detect,
-        AIFI,
-        Bottleneck,
-        BottleneckCSP,
-        C1,
-        C2,
-        C3,
-        C3Ghost,
-        C3TR,
-        C3x,
-        CBAM,
-        ChannelAttention,
-        Classify,
-        Concat,
-        Conv2,
-        ConvTranspose,
-        DFL,
-        DWConv,
-        DWConvTranspose2d,
-        Focus,
-        GhostBottleneck,
-        GhostConv,
-        HGBlock,
-        HGStem,
-        LayerNorm2d,
-        LightConv,
-        MLP,
-        MLPBlock,
-        OBB,
-        Pose,
-        Proto,
-        RTDETRDecoder,
-        TransformerLayer,
-        
-        # Classes do PyTorch
-        torch.nn.modules.container.Sequential
-    ]
-    
-    torch.serialization.add_safe_globals(safe_classes)
-    print(f"Classes seguras adicionadas com sucesso! ({len(safe_classes)} classes)")
-except Exception as e:
-    print(f"Aviso: Não foi possível adicionar classes seguras: {str(e)}")
-
-# Carregar variáveis de ambiente
-try:
-    load_dotenv('config.env')
-except:
-    print("Arquivo config.env não encontrado. Certifique-se de criar o arquivo com base no config.env.example")
-
-# Configuração do bot
-intents = discord.Intents.default()
-intents.message_content = True
-bot = commands.Bot(command_prefix='!', intents=intents)
-
-# Configuração global
-CONFIG = {
-    'model_size': 'n',  # n=nano, s=small, m=medium, l=large, x=xlarge
-    'confidence_threshold': 0.5,
-    'max_objects': 20,
-    'color_analysis': True
-}
-
-# Dicionário para rastrear downloads em andamento
-DOWNLOADS_EM_ANDAMENTO = {}
-
-# Função para baixar modelos em uma thread separada
-def download_model_threaded(url, path, tamanho, message_id, channel_id):
-    try:
-        print(f"Iniciando download do modelo YOLOv8{tamanho} em thread separada...")
-        import urllib.request
-        
-        # Função para reportar progresso
-        def report_progress(count, block_size, total_size):
-            percent = int(count * block_size * 100 / total_size)
-            if percent % 10 == 0:  # Reportar a cada 10%
-                print(f"Download do modelo YOLOv8{tamanho}: {percent}% concluído")
-                # Não podemos atualizar o Discord diretamente de uma thread,
-                # então apenas armazenamos o progresso para consultas posteriores
-                DOWNLOADS_EM_ANDAMENTO[tamanho] = {
-                    'percent': percent,
-                    'status': 'downloading'
-                }
-        
-        # Fazer o download com relatório de progresso
-        urllib.request.urlretrieve(url, path, reporthook=report_progress)
-        
-        print(f"Download do modelo YOLOv8{tamanho} concluído!")
-        DOWNLOADS_EM_ANDAMENTO[tamanho] = {
-            'percent': 100,
-            'status': 'completed'
-        }
-    except Exception as e:
-        print(f"Erro no download do modelo: {str(e)}")
-        DOWNLOADS_EM_ANDAMENTO[tamanho] = {
-            'percent': 0,
-            'status': 'error',
-            'error': str(e)
-        }
-
-# Carregar modelo YOLO
-async def load_yolo_model(size='n', ctx=None):
-    print(f"Carregando modelo YOLO de tamanho '{size}'...")
-    model_path = f'yolov8{size}.pt'
-    
-    if not os.path.exists(model_path):
-        if ctx:
-            await ctx.send(f"Modelo YOLOv8{size} não encontrado. Iniciando download... (isso pode levar vários minutos para modelos maiores)")
-        print(f"Baixando o modelo YOLOv8{size}...")
-        
-        # URL do modelo
-        url = f"https://github.com/ultralytics/assets/releases/download/v0.0.0/yolov8{size}.pt"
-        
-        # Verificar o tamanho do modelo antes de baixar
-        modelo_sizes = {
-            'n': "6 MB",
-            's': "22 MB",
-            'm': "50 MB",
-            'l': "90 MB",
-            'x': "670 MB"
-        }
-        
-        if size in modelo_sizes and ctx:
-            await ctx.send(f"⬇️ Baixando YOLOv8{size} ({modelo_sizes[size]})...")
-        
-        # Para modelos maiores (m, l, x), usar download em thread separada
-        if size in ['m', 'l', 'x']:
-            # Armazenar informações de mensagem para atualizações
-            message_id = ctx.message.id if ctx else None
-            channel_id = ctx.channel.id if ctx else None
-            
-            # Iniciar download em uma thread separada
-            DOWNLOADS_EM_ANDAMENTO[size] = {
-                'percent': 0,
-                'status': 'starting'
-            }
-            
-            download_thread = threading.Thread(
-                target=download_model_threaded,
-                args=(url, model_path, size, message_id, channel_id)
-            )
-            download_thread.start()
-            
-            # Se temos um contexto, reportar progresso periodicamente
-            if ctx:
-                progress_message = await ctx.send("Progresso: 0%")
-                
-                while DOWNLOADS_EM_ANDAMENTO[size]['status'] == 'starting' or DOWNLOADS_EM_ANDAMENTO[size]['status'] == 'downloading':
-                    if DOWNLOADS_EM_ANDAMENTO[size]['status'] == 'downloading':
-                        percent = DOWNLOADS_EM_ANDAMENTO[size]['percent']
-                        await progress_message.edit(content=f"Progresso: {percent}% | {'▓' * (percent // 10)}{'░' * (10 - percent // 10)}")
-                    await asyncio.sleep(5)  # Verificar a cada 5 segundos
-                
-                status = DOWNLOADS_EM_ANDAMENTO[size]['status']
-                if status == 'completed':
-                    await progress_message.edit(content=f"✅ Download concluído! Carregando modelo...")
-                elif status == 'error':
-                    error = DOWNLOADS_EM_ANDAMENTO[size].get('error', 'desconhecido')
-                    await progress_message.edit(content=f"❌ Erro no download: {error}")
-                    raise Exception(f"Erro no download do modelo: {error}")
-            else:
-                # Se não temos contexto, apenas esperar o download terminar
-                download_thread.join()
-                status = DOWNLOADS_EM_ANDAMENTO[size]['status']
-                if status != 'completed':
-                    error = DOWNLOADS_EM_ANDAMENTO[size].get('error', 'desconhecido')
-                    raise Exception(f"Erro no download do modelo: {error}")
-        else:
-            # Para modelos menores, baixar diretamente
-            try:
-                import urllib.request
-                urllib.request.urlretrieve(url, model_path)
-                print("Modelo baixado com sucesso!")
-                if ctx:
-                    await ctx.send("✅ Download concluído! Carregando modelo...")
-            except Exception as e:
-                print(f"Erro ao baixar modelo: {str(e)}")
-                if ctx:
-                    await ctx.send(f"❌ Erro ao baixar modelo: {str(e)}")
-                raise e
-    
-    # Carregar modelo com opção weights_only=False
-    try:
-        from ultralytics import YOLO
-        model = YOLO(model_path)
-        print(f"Modelo YOLOv8{size} carregado com sucesso!")
-        return model
-    except Exception as e1:
-        print(f"Erro ao carregar o modelo normalmente: {str(e1)}")
-        print("Tentando com método alternativo...")
-        
-        # Método alternativo forçando weights_only=False
-        try:
-            import torch
-            orig_load = torch.load
-            def patched_load(f, *args, **kwargs):
-                kwargs['weights_only'] = False
-                return orig_load(f, *args, **kwargs)
-            
-            # Aplicar patch temporário
-            torch.load = patched_load
-            from ultralytics import YOLO
-            model = YOLO(model_path)
-            # Restaurar função original
-            torch.load = orig_load
-            print(f"Modelo YOLOv8{size} carregado com sucesso usando método alternativo!")
-            return model
-        except Exception as e2:
-            print(f"Erro no método alternativo: {str(e2)}")
-            print("Por favor, verifique a instalação do PyTorch e Ultralytics")
-            if ctx:
-                await ctx.send(f"❌ Erro ao carregar o modelo: {str(e2)}")
-            raise e2
-
-# Carregar modelo inicial em background após o bot iniciar
-model = None  # Será carregado após o bot iniciar
-
-# Armazenar hora de início
-@bot.event
-async def on_ready():
-    global model
-    import time
-    bot.start_time = time.time()
-    
-    print(f'{bot.user.name} está online!')
-    print(f'ID do Bot: {bot.user.id}')
-    print('------')
-    
-    # Carregar modelo inicial em background
-    try:
-        model = await load_yolo_model(CONFIG['model_size'])
-        print(f"Modelo inicial YOLOv8{CONFIG['model_size']} carregado com sucesso!")
-    except Exception as e:
-        print(f"Erro ao carregar modelo inicial: {str(e)}")
-
-@bot.event
-async def on_message(message):
-    # Ignorar mensagens do próprio bot
-    if message.author == bot.user:
-        return
-    
-    # Verificar se a mensagem começa com 'detect' sem o prefixo
-    if message.content.lower().startswith('detect') and message.attachments:
-        print(f"Comando 'detect' sem prefixo detectado de {message.author.name}")
-        ctx = await bot.get_context(message)
-        await detect(ctx)
-    # Verificar se a mensagem é apenas '!detect' sem anexos, mas há anexos na mensagem
-    elif message.content.lower() in ['!detect', 'detect'] and message.attachments:
-        print(f"Comando detect com anexos detectado de {message.author.name}")
-        ctx = await bot.get_context(message)
-        await detect(ctx)
-    else:
-        # Processamento normal de comandos
-        await bot.process_commands(message)
-
-@bot.command()
-async def modelo(ctx, tamanho=None):
-    """Altera o tamanho do modelo YOLO (n=nano, s=small, m=medium, l=large, x=xlarge)"""
-    global model, CONFIG
-    
-    tamanhos_validos = ['n', 's', 'm', 'l', 'x']
-    
-    if not tamanho:
-        await ctx.send(f"**Tamanho atual do modelo:** YOLOv8{CONFIG['model_size']}\n" + 
-                       f"Tamanhos disponíveis: {', '.join(['n (nano)', 's (small)', 'm (medium)', 'l (large)', 'x (xlarge)'])}\n" +
-                       "Use `!modelo <tamanho>` para mudar. Exemplo: `!modelo s`")
-        return
-    
-    if tamanho not in tamanhos_validos:
-        await ctx.send(f"Tamanho inválido! Use um dos seguintes: {', '.join(tamanhos_validos)}")
-        return
-    
-    if tamanho in ['l', 'x']:
-        await ctx.send(f"⚠️ Aviso: O modelo YOLOv8{tamanho} é muito grande e pode levar vários minutos para baixar. Tem certeza que deseja continuar? Digite `!confirmar modelo {tamanho}` para confirmar.")
-        return
-    
-    await ctx.send(f"Carregando modelo YOLOv8{tamanho}... Isso pode levar alguns segundos.")
-    
-    try:
-        new_model = await load_yolo_model(tamanho, ctx)
-        model = new_model
-        CONFIG['model_size'] = tamanho
-        await ctx.send(f"✅ Modelo YOLOv8{tamanho} carregado com sucesso!")
-    except Exception as e:
-        await ctx.send(f"❌ Erro ao carregar o modelo: {str(e)}")
-
-@bot.command()
-async def confirmar(ctx, tipo=None, tamanho=None):
-    """Confirma operações potencialmente demoradas"""
-    if tipo == 'modelo' and tamanho:
-        await ctx.send(f"Confirmado! Carregando modelo YOLOv8{tamanho}... Este processo pode levar vários minutos.")
-        try:
-            new_model = await load_yolo_model(tamanho, ctx)
-            global model, CONFIG
-            model = new_model
-            CONFIG['model_size'] = tamanho
-            await ctx.send(f"✅ Modelo YOLOv8{tamanho} carregado com sucesso!")
-        except Exception as e:
-            await ctx.send(f"❌ Erro ao carregar o modelo: {str(e)}")
-    else:
-        await ctx.send("Comando inválido. Use `!confirmar modelo <tamanho>` para confirmar a alteração do modelo.")
-
-@bot.command()
-async def config(ctx, param=None, valor=None):
-    """Altera configurações do bot de detecção"""
-    global CONFIG
-    
-    if not param:
-        # Mostrar configurações atuais
-        config_msg = "**Configurações Atuais:**\n"
-        for key, value in CONFIG.items():
-            config_msg += f"- **{key}**: {value}\n"
-        config_msg += "\nPara alterar: `!config <parametro> <valor>`"
-        await ctx.send(config_msg)
-        return
-    
-    # Verificar se o parâmetro existe
-    if param not in CONFIG:
-        await ctx.send(f"Parâmetro desconhecido: {param}. Parâmetros disponíveis: {', '.join(CONFIG.keys())}")
-        return
-    
-    if not valor:
-        await ctx.send(f"Valor atual de **{param}**: {CONFIG[param]}")
-        return
-    
-    # Converter o valor para o tipo adequado
-    try:
-        if param == 'confidence_threshold':
-            valor = float(valor)
-            if not (0 <= valor <= 1):
-                await ctx.send("Valor de confiança deve estar entre 0 e 1")
-                return
-        elif param == 'max_objects':
-            valor = int(valor)
-            if valor < 1:
-                await ctx.send("Número máximo de objetos deve ser pelo menos 1")
-                return
-        elif param == 'color_analysis':
-            valor = valor.lower() in ['true', 'yes', 'sim', '1', 'on', 'ativado']
-        
-        # Atualizar configuração
-        CONFIG[param] = valor
-        await ctx.send(f"✅ **{param}** atualizado para: **{valor}**")
-    except ValueError:
-        await ctx.send(f"Valor inválido para {param}. Verifique o tipo de dado.")
-
-# Função para analisar cores predominantes na imagem
-def analyze_colors(image, num_colors=5):
-    # Redimensionar imagem para processamento mais rápido
-    img_small = image.copy()
-    img_small.thumbnail((100, 100))
-    
-    # Converter para RGB se necessário
-    if img_small.mode != 'RGB':
-        img_small = img_small.convert('RGB')
-    
-    # Obter pixels
-    pixels = np.array(img_small)
-    pixels = pixels.reshape(-1, 3)
-    
-    # Agrupar cores similares
-    def rgb_to_hex(rgb):
-        return '#{:02x}{:02x}{:02x}'.format(rgb[0], rgb[1], rgb[2])
-    
-    # Simplificar cores (reduzir precisão para agrupar cores similares)
-    pixels_simple = (pixels // 32) * 32
-    pixels_rgb = [tuple(pixel) for pixel in pixels_simple]
-    
-    # Contar cores
-    color_counts = Counter(pixels_rgb)
-    
-    # Obter as cores mais comuns
-    most_common = color_counts.most_common(num_colors)
-    total_pixels = len(pixels_rgb)
-    
-    # Formatar resultados
-    colors = []
-    for color, count in most_common:
-        percentage = count / total_pixels * 100
-        hex_color = rgb_to_hex(color)
-        colors.append({
-            'rgb': color,
-            'hex': hex_color,
-            'percentage': percentage
-        })
-    
-    return colors
-
-@bot.command()
-async def detect(ctx):
-    """Comando para detectar objetos em uma imagem utilizando YOLO"""
-    print(f"Comando detect recebido de {ctx.author.name}")
-    
-    if not ctx.message.attachments:
-        print("Nenhum anexo encontrado na mensagem")
-        await ctx.send("Por favor, anexe uma imagem junto com o comando.")
-        return
-    
-    attachment = ctx.message.attachments[0]
-    print(f"Anexo encontrado: {attachment.filename}")
-    
-    # Verificar se é uma imagem
-    valid_extensions = ['.png', '.jpg', '.jpeg', '.webp', '.bmp', '.gif']
-    if not any(attachment.filename.lower().endswith(ext) for ext in valid_extensions):
-        print(f"Arquivo inválido: {attachment.filename}")
-        await ctx.send(f"Por favor, anexe um arquivo de imagem válido. Formatos suportados: {', '.join(valid_extensions)}")
-        return
-    
-    print("Baixando imagem...")
-    # Baixar a imagem
-    image_bytes = await attachment.read()
-    image = Image.open(io.BytesIO(image_bytes))
-    
-    # Converter para RGB se a imagem for RGBA para evitar problemas ao salvar como JPEG
-    if image.mode == 'RGBA':
-        print("Convertendo imagem RGBA para RGB...")
-        image = image.convert('RGB')
-    
-    # Salvar temporariamente a imagem
-    temp_img_path = "temp_image.jpg"
-    image.save(temp_img_path)
-    print(f"Imagem salva temporariamente em: {temp_img_path}")
-    
-    # Analisar cores predominantes se configurado
-    color_info = ""
-    if CONFIG['color_analysis']:
-        try:
-            print("Analisando cores predominantes...")
-            colors = analyze_colors(image)
-            color_info = "\n**Cores Predominantes:**\n"
-            for i, color in enumerate(colors):
-                color_info += f"{i+1}. {color['hex']} ({color['percentage']:.1f}%)\n"
-        except Exception as ce:
-            print(f"Erro na análise de cores: {str(ce)}")
-    
-    # Mensagem enquanto processa
-    await ctx.send("Processando imagem... Aguarde um momento.")
-    
-    try:
-        # Realizar a detecção
-        print("Iniciando detecção com YOLO...")
-        try:
-            # Usar threshold de confiança da configuração
-            results = model(temp_img_path, conf=CONFIG['confidence_threshold'])
-            print("Detecção concluída. Processando resultados...")
-        except Exception as yolo_error:
-            print(f"ERRO na detecção YOLO: {str(yolo_error)}")
-            await ctx.send(f"Erro ao processar a imagem com YOLO: {str(yolo_error)}")
-            # Limpar arquivo temporário em caso de erro
-            if os.path.exists(temp_img_path):
-                os.remove(temp_img_path)
-            return
-        
-        # Processar resultados
-        result = results[0]
-        result_img = result.plot()
-        result_image = Image.fromarray(result_img)
-        
-        # Adicionar informações na imagem
-        draw = ImageDraw.Draw(result_image)
-        try:
-            # Tenta carregar uma fonte
-            font = ImageFont.truetype("arial.ttf", 20)
-        except:
-            # Se não conseguir, usa fonte padrão
-            font = ImageFont.load_default()
-        
-        # Adicionar marca d'água
-        timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-        draw.text((10, 10), f"YOLOv8{CONFIG['model_size']} - {timestamp}", fill=(255, 255, 255), font=font)
-        
-        # Salvar a imagem com as detecções
-        output_path = "detection_result.jpg"
-        result_image.save(output_path)
-        print(f"Imagem com detecções salva em: {output_path}")
-        
-        # Contar objetos detectados
-        boxes = result.boxes
-        class_counts = {}
-        class_confidences = {}
-        detected_objects = []
-        
-        print("Objetos detectados:")
-        for box in boxes:
-            class_id = int(box.cls[0].item())
-            class_name = result.names[class_id]
-            confidence = float(box.conf[0].item())
-            
-            # Extrair coordenadas da bounding box (x1, y1, x2, y2)
-            x1, y1, x2, y2 = box.xyxy[0].tolist()
-            width = x2 - x1
-            height = y2 - y1
-            area = width * height
-            
-            # Calcular posição relativa na imagem
-            img_width, img_height = image.size
-            center_x = (x1 + x2) / 2
-            center_y = (y1 + y2) / 2
-            position_x = center_x / img_width
-            position_y = center_y / img_height
-            
-            # Determinar posição em termos de região
-            region = ""
-            if position_y < 0.33:
-                region += "superior "
-            elif position_y > 0.66:
-                region += "inferior "
-            else:
-                region += "centro "
-                
-            if position_x < 0.33:
-                region += "esquerdo"
-            elif position_x > 0.66:
-                region += "direito"
-            else:
-                region += "central"
-            
-            # Armazenar dados do objeto detectado
-            detected_objects.append({
-                "class": class_name,
-                "confidence": confidence,
-                "width": width,
-                "height": height,
-                "area": area,
-                "region": region
-            })
-            
-            print(f"- {class_name}: {confidence:.2f} (tamanho: {width:.1f}x{height:.1f})")
-            
-            # Atualizar contagens
-            if class_name in class_counts:
-                class_counts[class_name] += 1
-                class_confidences[class_name].append(confidence)
-            else:
-                class_counts[class_name] = 1
-                class_confidences[class_name] = [confidence]
-        
-        # Ordenar objetos por tamanho
-        detected_objects.sort(key=lambda x: x["area"], reverse=True)
-        
-        # Criar mensagem de detecção
-        detection_message = f"**Análise com YOLOv8{CONFIG['model_size']} (conf: {CONFIG['confidence_threshold']}):**\n\n"
-        detection_message += "**Objetos Detectados:**\n"
-        
-        # Adicionar resumo por classe
-        for class_name, count in class_counts.items():
-            avg_confidence = sum(class_confidences[class_name]) / len(class_confidences[class_name])
-            detection_message += f"- {class_name}: {count} (confiança média: {avg_confidence:.2%})\n"
-        
-        # Adicionar detalhes de cada objeto (limitado pelo max_objects da configuração)
-        if detected_objects:
-            detection_message += "\n**Detalhes dos Objetos:**\n"
-            for i, obj in enumerate(detected_objects[:CONFIG['max_objects']]):
-                detection_message += f"{i+1}. {obj['class']}: confiança {obj['confidence']:.2%}, tamanho {obj['width']:.1f}x{obj['height']:.1f} pixels, {obj['region']}\n"
-        
-        # Adicionar estatísticas gerais
-        detection_message += "\n**Estatísticas:**\n"
-        detection_message += f"- Total de objetos: {len(detected_objects)}\n"
-        detection_message += f"- Classes detectadas: {len(class_counts)}\n"
-        if detected_objects:
-            max_obj = max(detected_objects, key=lambda x: x["confidence"])
-            detection_message += f"- Objeto com maior confiança: {max_obj['class']} ({max_obj['confidence']:.2%})\n"
-            largest_obj = max(detected_objects, key=lambda x: x["area"])
-            detection_message += f"- Maior objeto: {largest_obj['class']} ({largest_obj['width']:.1f}x{largest_obj['height']:.1f} pixels)\n"
-        
-        # Adicionar análise de cores
-        detection_message += color_info
-        
-        # Adicionar timestamp
-        detection_message += f"\n*Processado em: {timestamp}*"
-        
-        # Enviar resultado
-        print("Enviando resultado para o Discord...")
-        await ctx.send(detection_message, file=discord.File(output_path))
-        print("Resultado enviado com sucesso!")
-        
-        # Limpar arquivos temporários
-        os.remove(temp_img_path)
-        os.remove(output_path)
-        print("Arquivos temporários removidos")
-        
-    except Exception as e:
-        print(f"ERRO na detecção: {str(e)}")
-        await ctx.send(f"Ocorreu um erro ao processar a imagem: {str(e)}")
-        # Limpar arquivo temporário em caso de erro
-        if os.path.exists(temp_img_path):
-            os.remove(temp_img_path)
-
-@bot.command()
-async def ajuda(ctx):
-    """Exibe informações de ajuda sobre o bot"""
-    help_text = """
-**Teste Bot de Detecção YOLO**
-
-**Comandos disponíveis:**
-`!detect` - Anexe uma imagem com este comando para detectar objetos nela
-`!modelo [tamanho]` - Verifica ou altera o tamanho do modelo YOLO (n, s, m, l, x)
-`!config [param] [valor]` - Verifica ou altera configurações de detecção
-`!ajuda` - Exibe esta mensagem de ajuda
-
-**Exemplos de uso:**
-1. `!detect` - Anexe uma imagem para detectar objetos
-2. `!modelo s` - Muda para o modelo small (mais preciso, mais lento)
-3. `!config confidence_threshold 0.3` - Reduz o limite de confiança para 0.3 (30%)
-4. `!config color_analysis false` - Desativa a análise de cores
-
-**Tamanhos de modelo disponíveis:**
-- `n` (nano): Mais rápido, menos preciso
-- `s` (small): Bom equilíbrio entre velocidade e precisão
-- `m` (medium): Médio porte, mais preciso
-- `l` (large): Grande, alta precisão
-- `x` (xlarge): Muito grande, precisão máxima, mais lento
-
-**Configurações disponíveis:**
-- `confidence_threshold`: Limite de confiança (0.0-1.0)
-- `max_objects`: Número máximo de objetos a mostrar nos detalhes
-- `color_analysis`: Análise de cores predominantes (true/false)
-    """
-    await ctx.send(help_text)
-
-@bot.command()
-async def status(ctx):
-    """Mostra o status atual do bot e downloads em andamento"""
-    global DOWNLOADS_EM_ANDAMENTO, CONFIG
-    
-    status_msg = "**Status do Bot de Detecção YOLO**\n\n"
-    
-    # Informações do modelo
-    status_msg += f"**Modelo Atual:** YOLOv8{CONFIG['model_size']}\n"
-    status_msg += f"**Configurações:**\n"
-    for key, value in CONFIG.items():
-        status_msg += f"- {key}: {value}\n"
-    
-    # Downloads em andamento
-    if DOWNLOADS_EM_ANDAMENTO:
-        status_msg += "\n**Downloads em Andamento:**\n"
-        for size, info in DOWNLOADS_EM_ANDAMENTO.items():
-            status = info['status']
-            if status == 'downloading':
-                percent = info['percent']
-                status_msg += f"- YOLOv8{size}: {percent}% | {'▓' * (percent // 10)}{'░' * (10 - percent // 10)}\n"
-            elif status == 'completed':
-                status_msg += f"- YOLOv8{size}: ✅ Concluído\n"
-            elif status == 'error':
-                error = info.get('error', 'desconhecido')
-                status_msg += f"- YOLOv8{size}: ❌ Erro ({error})\n"
-            else:
-                status_msg += f"- YOLOv8{size}: {status}\n"
-    
-    # Informações do sistema
-    status_msg += "\n**Informações do Sistema:**\n"
-    try:
-        import psutil
-        # Uso de memória
-        mem = psutil.virtual_memory()
-        status_msg += f"- Memória: {mem.percent}% usado ({mem.used / (1024**3):.1f}GB / {mem.total / (1024**3):.1f}GB)\n"
-        # Uso de CPU
-        status_msg += f"- CPU: {psutil.cpu_percent()}% usado\n"
-    except ImportError:
-        status_msg += "- Informações do sistema não disponíveis (psutil não instalado)\n"
-    
-    # Tempo online
-    import time
-    try:
-        uptime = time.time() - bot.start_time
-        hours, rem = divmod(uptime, 3600)
-        minutes, seconds = divmod(rem, 60)
-        status_msg += f"- Tempo online: {int(hours)}h {int(minutes)}m {int(seconds)}s\n"
-    except:
-        pass
-    
-    await ctx.send(status_msg)
-
-# Iniciar o bot
-if __name__ == "__main__":
-    token = os.getenv('DISCORD_TOKEN')
-    if token:
-        bot.run(token)
-    else:
+import os
+import io
+import discord
+from discord.ext import commands
+from dotenv import load_dotenv
+from PIL import Image, ImageDraw, ImageFont, ImageSequence
+import numpy as np
+from datetime import datetime
+import asyncio
+import aiohttp
+from aiohttp import web
+import threading
+import multiprocessing
+import queue
+import time
+import hashlib
+import bisect
+import math
+import heapq
+import json
+import gc
+import sqlite3
+import tempfile
+import contextvars
+from contextlib import contextmanager
+from collections import deque, OrderedDict
+import concurrent.futures
+from concurrent.futures import ThreadPoolExecutor
+
+# Momento em que o processo começou (para o tempo até ficar pronto)
+INICIO_PROCESSO = time.time()
+
+# torch e ultralytics só são importados quando o primeiro modelo é carregado
+_CLASSES_SEGURAS_REGISTRADAS = False
+
+def registrar_classes_seguras():
+    """Adiciona as classes seguras para o torch.load do PyTorch 2.6 (uma única vez)"""
+    global _CLASSES_SEGURAS_REGISTRADAS
+    if _CLASSES_SEGURAS_REGISTRADAS:
+        return
+    _CLASSES_SEGURAS_REGISTRADAS = True
+    
+    try:
+        from ultralytics.nn.tasks import DetectionModel, BaseModel, ClassificationModel, SegmentationModel, PoseModel, OBBModel, RTDETRDetectionModel
+        from ultralytics.nn.modules import Conv, C2f, SPPF, Detect, AIFI, Bottleneck, BottleneckCSP, C1, C2, C3, C3Ghost, C3TR, C3x, CBAM, ChannelAttention, Classify, Concat, Conv2, ConvTranspose, DFL, DWConv, DWConvTranspose2d, Focus, GhostBottleneck, GhostConv, HGBlock, HGStem, LayerNorm2d, LightConv, MLP, MLPBlock, OBB, Pose, Proto, RTDETRDecoder, TransformerLayer
+        import torch
+        import torch.serialization
+        import torch.nn.modules.container
+        import ultralytics.nn.modules
+        import ultralytics.nn.tasks
+    
+        # Lista de classes que sabemos que existem
+        safe_classes = [
+            # Classes principais
+            DetectionModel,
+            BaseModel,
+            ClassificationModel,
+            SegmentationModel,
+            PoseModel,
+            OBBModel,
+            RTDETRDetectionModel,
+        
+            # Classes de módulos
+            Conv,
+            C2f,
+            SPPF,
+            Detect,
+            AIFI,
+            Bottleneck,
+            BottleneckCSP,
+            C1,
+            C2,
+            C3,
+            C3Ghost,
+            C3TR,
+            C3x,
+            CBAM,
+            ChannelAttention,
+            Classify,
+            Concat,
+            Conv2,
+            ConvTranspose,
+            DFL,
+            DWConv,
+            DWConvTranspose2d,
+            Focus,
+            GhostBottleneck,
+            GhostConv,
+            HGBlock,
+            HGStem,
+            LayerNorm2d,
+            LightConv,
+            MLP,
+            MLPBlock,
+            OBB,
+            Pose,
+            Proto,
+            RTDETRDecoder,
+            TransformerLayer,
+        
+            # Classes do PyTorch
+            torch.nn.modules.container.Sequential
+        ]
+    
+        torch.serialization.add_safe_globals(safe_classes)
+        print(f"Classes seguras adicionadas com sucesso! ({len(safe_classes)} classes)")
+    except Exception as e:
+        print(f"Aviso: Não foi possível adicionar classes seguras: {str(e)}")
+
+# Carregar variáveis de ambiente
+try:
+    load_dotenv('config.env')
+except:
+    print("Arquivo config.env não encontrado. Certifique-se de criar o arquivo com base no config.env.example")
+
+# Configuração do bot
+intents = discord.Intents.default()
+intents.message_content = True
+bot = commands.Bot(command_prefix='!', intents=intents)
+
+# Configuração global
+CONFIG = {
+    'model_size': 'n',  # n=nano, s=small, m=medium, l=large, x=xlarge
+    'confidence_threshold': 0.5,
+    'max_objects': 20,
+    'color_analysis': True,
+    'color_mode': 'quantizado',  # quantizado, kmeans ou mediancut
+    'box_colors': False,  # cor dominante de cada objeto detectado
+    'batch_window_ms': 20,  # janela para agrupar pedidos simultâneos em um único lote
+    'max_batch_size': 8,
+    'backend': 'torch',  # torch, onnx, openvino ou torchscript
+    'precision': 'fp32',  # fp32, int8 (estática) ou int8-dinamico
+    'user_rate_per_min': 6,  # imagens por minuto por usuário (0 desativa o limite)
+    'user_burst': 4,  # rajada máxima de imagens por usuário
+    'guild_rate_per_min': 30,  # imagens por minuto por servidor (0 desativa o limite)
+    'guild_burst': 12,
+    'adaptive_size': False,  # reduz o tamanho do modelo automaticamente quando a latência estoura o SLO
+    'latency_slo_ms': 2000,  # SLO do p95 da latência de inferência (fila + lote + modelo)
+    'decode_target': 640,  # maior lado (aprox.) em que a imagem é decodificada; o modelo usa 640
+    'max_megapixels': 80,  # imagens maiores são recusadas antes de decodificar (decompression bombs)
+    'output_format': 'jpeg',  # jpeg, webp ou png
+    'output_quality': 75,  # qualidade do JPEG/WebP (1-95)
+    'preview_max_side': 0,  # reduz a imagem enviada a este maior lado (0 = tamanho decodificado)
+    'clip_fps': 2.0,  # quadros por segundo analisados em GIFs animados e vídeos
+    'clip_scene_threshold': 30,  # diferença média (0-255) que conta como mudança de cena (0 desativa)
+    'clip_max_frames': 120,  # máximo de quadros analisados por clipe
+    'clip_output': 'gif',  # gif (animação anotada) ou contato (folha de contato)
+    'tiled': False,  # inferência em blocos sobrepostos para achar objetos pequenos (também via `!detect blocos`)
+    'tile_size': 640,  # lado de cada bloco, em pixels da imagem decodificada
+    'tile_overlap': 0.2,  # fração de sobreposição entre blocos vizinhos
+    'tile_max_side': 2048  # maior lado em que a imagem é decodificada no modo em blocos
+}
+
+# Dicionário para rastrear downloads em andamento
+DOWNLOADS_EM_ANDAMENTO = {}
+
+# Tempos por etapa do pedido atual (download, decode, inferência...); None quando ninguém está medindo
+_TEMPOS_ETAPAS = contextvars.ContextVar('tempos_etapas', default=None)
+
+@contextmanager
+def registrar_etapas():
+    """Ativa a medição das etapas para o pedido (task) atual e devolve o dicionário etapa -> [segundos]"""
+    tempos = {}
+    token = _TEMPOS_ETAPAS.set(tempos)
+    try:
+        yield tempos
+    finally:
+        _TEMPOS_ETAPAS.reset(token)
+
+@contextmanager
+def medir_etapa(nome):
+    tempos = _TEMPOS_ETAPAS.get()
+    if tempos is None and not METRICAS.habilitado:
+        yield
+        return
+    inicio = time.perf_counter()
+    try:
+        yield
+    finally:
+        duracao = time.perf_counter() - inicio
+        if tempos is not None:
+            # setdefault/append são atômicos: imagens do mesmo pedido podem rodar em threads diferentes
+            tempos.setdefault(nome, []).append(duracao)
+        METRICAS.observar(nome, duracao)
+
+# Métricas em processo: histogramas por etapa e contadores, expostos pelo !metrics e pelo endpoint Prometheus
+METRICS_ENABLED = os.getenv('METRICS_ENABLED', 'true').lower() in ['true', '1', 'sim', 'yes']
+METRICS_HOST = os.getenv('METRICS_HOST', '127.0.0.1')
+METRICS_PORT = int(os.getenv('METRICS_PORT', '0'))  # 0 = endpoint HTTP desligado
+BUCKETS_SEGUNDOS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+class Histograma:
+    """Histograma de buckets fixos (cumulativos no formato Prometheus na exportação)"""
+    def __init__(self, buckets=BUCKETS_SEGUNDOS):
+        self.buckets = buckets
+        self.contagens = [0] * (len(buckets) + 1)  # último = +Inf
+        self.soma = 0.0
+        self.total = 0
+    
+    def observar(self, valor):
+        self.contagens[bisect.bisect_left(self.buckets, valor)] += 1
+        self.soma += valor
+        self.total += 1
+    
+    def percentil(self, q):
+        """Aproximação por interpolação linear dentro do bucket"""
+        if not self.total:
+            return None
+        alvo = q * self.total
+        acumulado = 0
+        for i, contagem in enumerate(self.contagens):
+            if acumulado + contagem >= alvo and contagem:
+                inferior = self.buckets[i - 1] if i > 0 else 0.0
+                superior = self.buckets[i] if i < len(self.buckets) else self.buckets[-1]
+                return inferior + (superior - inferior) * (alvo - acumulado) / contagem
+            acumulado += contagem
+        return self.buckets[-1]
+
+class Metricas:
+    def __init__(self, habilitado=True):
+        self.habilitado = habilitado
+        self.histogramas = {}
+        self.contadores = {}
+        self._lock = threading.Lock()  # observações chegam também das threads de inferência
+    
+    def observar(self, etapa, segundos):
+        if not self.habilitado:
+            return
+        with self._lock:
+            histograma = self.histogramas.get(etapa)
+            if histograma is None:
+                histograma = self.histogramas[etapa] = Histograma()
+            histograma.observar(segundos)
+    
+    def incrementar(self, nome, valor=1):
+        if not self.habilitado:
+            return
+        with self._lock:
+            self.contadores[nome] = self.contadores.get(nome, 0) + valor
+    
+    def formato_prometheus(self, gauges=None):
+        linhas = []
+        with self._lock:
+            for nome, valor in sorted(self.contadores.items()):
+                linhas.append(f"# TYPE yolobot_{nome}_total counter")
+                linhas.append(f"yolobot_{nome}_total {valor}")
+            if self.histogramas:
+                linhas.append("# TYPE yolobot_etapa_segundos histogram")
+            for etapa, h in sorted(self.histogramas.items()):
+                acumulado = 0
+                for limite, contagem in zip(list(h.buckets) + ['+Inf'], h.contagens):
+                    acumulado += contagem
+                    linhas.append(f'yolobot_etapa_segundos_bucket{{etapa="{etapa}",le="{limite}"}} {acumulado}')
+                linhas.append(f'yolobot_etapa_segundos_sum{{etapa="{etapa}"}} {h.soma}')
+                linhas.append(f'yolobot_etapa_segundos_count{{etapa="{etapa}"}} {h.total}')
+        for nome, valor in (gauges or {}).items():
+            linhas.append(f"# TYPE yolobot_{nome} gauge")
+            linhas.append(f"yolobot_{nome} {valor}")
+        return "\n".join(linhas) + "\n"
+
+METRICAS = Metricas(METRICS_ENABLED)
+
+# Limites de anexos do Discord por mensagem
+MAX_FILES_PER_MESSAGE = 10
+MAX_MESSAGE_LENGTH = 2000
+
+# Configuração do executor de inferência (fora do event loop)
+# Processos de inferência (0 = inferência no próprio processo, ver PoolProcessos)
+INFERENCE_PROCESSES = int(os.getenv('INFERENCE_PROCESSES', '0'))
+# Com processos de inferência, cada lote ocupa uma thread esperando a resposta pelo pipe
+INFERENCE_WORKERS = int(os.getenv('INFERENCE_WORKERS', (os.cpu_count() or 1) + INFERENCE_PROCESSES))
+# A fila comporta ao menos duas mensagens com o máximo de anexos, para que uma mensagem
+# cheia nunca rejeite parte das próprias imagens com poucos núcleos
+INFERENCE_QUEUE_MAX = int(os.getenv('INFERENCE_QUEUE_MAX', max(INFERENCE_WORKERS * 4, 2 * MAX_FILES_PER_MESSAGE)))
+
+# O modelo YOLO não é thread-safe: apenas uma inferência por vez em cada modelo, enquanto as
+# demais threads cuidam de decodificação, plot e salvamento. A trava é por modelo para que
+# aquecer o modelo novo de uma troca nunca bloqueie os pedidos no modelo atual
+MODEL_LOCK = threading.Lock()  # protege só a criação das travas por modelo
+
+def trava_modelo(modelo):
+    trava = getattr(modelo, '_trava_inferencia', None)
+    if trava is None:
+        with MODEL_LOCK:
+            trava = getattr(modelo, '_trava_inferencia', None)
+            if trava is None:
+                trava = modelo._trava_inferencia = threading.Lock()
+    return trava
+
+class FilaCheiaError(Exception):
+    """Levantada quando a fila de inferência está cheia (backpressure)"""
+
+# Chave de justiça da fila (servidor ou usuário) do pedido atual; definida pelo detect
+_CHAVE_PRIORIDADE = contextvars.ContextVar('chave_prioridade', default=None)
+# Trabalho de segundo plano (aquecimento de modelos): só roda quando não há pedido aguardando
+CHAVE_SEGUNDO_PLANO = ('segundo_plano', None)
+
+class InferenceExecutor:
+    """Pool de threads com fila de prioridade limitada para o trabalho pesado do detect.
+
+    A fila é repartida por servidor: tarefas de quem tem menos trabalho aguardando passam
+    na frente, para que um único servidor não monopolize o modelo.
+    """
+
+    def __init__(self, workers, max_fila):
+        self.workers = workers
+        self.max_fila = max_fila
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='yolo-worker')
+        self._lock = threading.Lock()
+        self._heap = []  # (prioridade, ordem de chegada, item)
+        self._sequencia = 0
+        self._por_chave = {}  # chave -> tarefas aguardando
+        self._pendentes = 0  # tarefas aceitas (na fila + em execução)
+        self._executando = 0
+        self._fundo = 0  # tarefas de segundo plano na fila (não contam para o limite)
+        self.concluidas = 0
+        self.rejeitadas = 0
+        self.enfileiradas = 0
+        self._esperas = deque(maxlen=200)  # tempos de espera na fila (s)
+        self._duracoes = deque(maxlen=200)  # tempos de execução (s)
+
+    @property
+    def profundidade(self):
+        """Número de tarefas de pedidos aguardando uma thread livre"""
+        with self._lock:
+            return self._pendentes - self._executando - self._fundo
+
+    @property
+    def executando(self):
+        with self._lock:
+            return self._executando
+
+    @property
+    def cheia(self):
+        return self.profundidade >= self.max_fila
+
+    def estatisticas_espera(self):
+        esperas = sorted(self._esperas)
+        if not esperas:
+            return 0.0, 0.0
+        media = sum(esperas) / len(esperas)
+        p95 = esperas[min(len(esperas) - 1, int(len(esperas) * 0.95))]
+        return media, p95
+
+    def estimar_espera(self):
+        """Segundos estimados até a fila atual esvaziar"""
+        duracoes = list(self._duracoes)
+        duracao_media = sum(duracoes) / len(duracoes) if duracoes else 1.0
+        return (self.profundidade + 1) * duracao_media / self.workers
+
+    def _liberar_chave(self, chave):
+        if chave is None:
+            return
+        restantes = self._por_chave.get(chave, 1) - 1
+        if restantes > 0:
+            self._por_chave[chave] = restantes
+        else:
+            self._por_chave.pop(chave, None)
+
+    def _proxima(self):
+        """Roda no pool: cada submissão executa a tarefa de maior prioridade no momento"""
+        with self._lock:
+            _, _, item = heapq.heappop(self._heap)
+            if item['segundo_plano']:
+                self._fundo -= 1
+            if not item['future'].set_running_or_notify_cancel():
+                return  # cancelada enquanto aguardava; a vaga já foi liberada
+            self._liberar_chave(item['chave'])
+            self._executando += 1
+        espera = time.perf_counter() - item['enfileirado_em']
+        self._esperas.append(espera)
+        METRICAS.observar('espera_fila', espera)
+        inicio = time.perf_counter()
+        try:
+            # Propagar o contexto (medição de etapas) para a thread do pool
+            item['future'].set_result(item['contexto'].run(item['func'], *item['args']))
+        except BaseException as e:
+            item['future'].set_exception(e)
+        finally:
+            self._duracoes.append(time.perf_counter() - inicio)
+            with self._lock:
+                self._executando -= 1
+                self._pendentes -= 1
+                self.concluidas += 1
+
+    async def executar(self, func, *args):
+        """Agenda func(*args) no pool e aguarda o resultado sem bloquear o event loop"""
+        chave = _CHAVE_PRIORIDADE.get()
+        future = concurrent.futures.Future()
+        with self._lock:
+            segundo_plano = chave == CHAVE_SEGUNDO_PLANO
+            if self._pendentes - self._executando - self._fundo >= self.max_fila and not segundo_plano:
+                self.rejeitadas += 1
+                raise FilaCheiaError(f"Fila de inferência cheia ({self.max_fila} tarefas aguardando)")
+            self._pendentes += 1
+            self.enfileiradas += 1
+            prioridade = 0
+            if segundo_plano:
+                prioridade = math.inf
+                chave = None
+                self._fundo += 1
+            elif chave is not None:
+                prioridade = self._por_chave.get(chave, 0)
+                self._por_chave[chave] = prioridade + 1
+            self._sequencia += 1
+            heapq.heappush(self._heap, (prioridade, self._sequencia, {
+                'func': func, 'args': args, 'chave': chave, 'future': future, 'segundo_plano': segundo_plano,
+                'contexto': contextvars.copy_context(), 'enfileirado_em': time.perf_counter()
+            }))
+        self._pool.submit(self._proxima)
+        try:
+            return await asyncio.wrap_future(future)
+        except asyncio.CancelledError:
+            # Se a tarefa ainda não começou, liberar a vaga reservada na fila
+            with self._lock:
+                if future.cancel():
+                    self._pendentes -= 1
+                    self._liberar_chave(chave)
+            raise
+
+INFERENCE_EXECUTOR = InferenceExecutor(INFERENCE_WORKERS, INFERENCE_QUEUE_MAX)
+
+class TokenBucket:
+    def __init__(self, capacidade, taxa):
+        self.capacidade = capacidade
+        self.taxa = taxa  # fichas por segundo
+        self.fichas = float(capacidade)
+        self.atualizado = time.monotonic()
+    
+    def reabastecer(self, capacidade, taxa):
+        agora = time.monotonic()
+        self.capacidade, self.taxa = capacidade, taxa
+        self.fichas = min(capacidade, self.fichas + (agora - self.atualizado) * taxa)
+        self.atualizado = agora
+    
+    def espera(self, custo):
+        """Segundos até haver fichas para o custo (0 = disponível agora; inf se o custo passa da rajada)"""
+        if custo > self.capacidade:
+            return math.inf
+        faltam = custo - self.fichas
+        return 0.0 if faltam <= 0 else faltam / self.taxa
+
+class RateLimiter:
+    """Token buckets por usuário e por servidor; os limites são lidos do CONFIG a cada pedido"""
+    MAX_BUCKETS = 10000
+    
+    def __init__(self):
+        self._buckets = {}
+        self.aceitos = 0
+        self.limitados = 0
+    
+    def _bucket(self, chave, capacidade, taxa):
+        bucket = self._buckets.get(chave)
+        if bucket is None:
+            if len(self._buckets) >= self.MAX_BUCKETS:
+                # Buckets cheios equivalem a buckets novos: podem ser descartados
+                for k in [k for k, b in self._buckets.items() if b.fichas >= b.capacidade]:
+                    del self._buckets[k]
+            bucket = self._buckets[chave] = TokenBucket(capacidade, taxa)
+        bucket.reabastecer(capacidade, taxa)
+        return bucket
+    
+    def _limites(self, ctx):
+        limites = [('user', ctx.author.id, 'user_rate_per_min', 'user_burst')]
+        if ctx.guild is not None:
+            limites.append(('guild', ctx.guild.id, 'guild_rate_per_min', 'guild_burst'))
+        return [(tipo, ident, taxa, rajada) for tipo, ident, taxa, rajada in limites if CONFIG[taxa] > 0]
+    
+    def maximo_por_mensagem(self, ctx):
+        """Mais imagens do que a menor rajada ativa nunca caberiam no balde (None = sem limite)"""
+        rajadas = [max(1, CONFIG[rajada]) for _, _, _, rajada in self._limites(ctx)]
+        return min(rajadas) if rajadas else None
+    
+    def verificar(self, ctx, custo=1):
+        """Consome `custo` fichas do usuário e do servidor; devolve 0 ou os segundos até tentar de novo"""
+        buckets = [self._bucket((tipo, ident), max(1, CONFIG[rajada]), CONFIG[taxa] / 60)
+                   for tipo, ident, taxa, rajada in self._limites(ctx)]
+        
+        # Só consome se todos os limites permitirem
+        espera = max((b.espera(custo) for b in buckets), default=0.0)
+        if espera > 0:
+            self.limitados += 1
+            return espera
+        for b in buckets:
+            b.fichas -= custo
+        self.aceitos += 1
+        return 0.0
+    
+    def devolver(self, ctx, custo=1):
+        """Devolve fichas de imagens que nem chegaram a ser processadas (fila cheia)"""
+        for tipo, ident, _, _ in self._limites(ctx):
+            bucket = self._buckets.get((tipo, ident))
+            if bucket is not None:
+                bucket.fichas = min(bucket.capacidade, bucket.fichas + custo)
+
+RATE_LIMITER = RateLimiter()
+
+# Inferência em lote: uma única passada do modelo para várias imagens
+def inferir_lote(modelo, sources, conf):
+    """Inferência de um lote; devolve as detecções de cada imagem (ver extrair_deteccoes)"""
+    if PROCESSOS_INFERENCIA is not None and PROCESSOS_INFERENCIA.disponivel and hasattr(modelo, 'artefato'):
+        try:
+            return PROCESSOS_INFERENCIA.inferir(modelo, sources, conf)
+        except ErroProcessoInferencia as e:
+            # O modelo também está carregado aqui: o pedido não falha enquanto o processo reinicia
+            print(f"{str(e)}; usando a inferência local")
+    with trava_modelo(modelo):
+        if getattr(modelo, 'backend_nome', 'torch') in BACKENDS_SEM_LOTE:
+            results = [modelo(source, conf=conf)[0] for source in sources]
+        else:
+            results = modelo(sources, conf=conf)
+    return [extrair_deteccoes(result) for result in results]
+
+class MicroBatcher:
+    """Agrupa pedidos de detecção simultâneos em lotes por modelo e confiança"""
+
+    def __init__(self, executor):
+        self.executor = executor
+        self._grupos = {}  # chave -> {'modelo', 'itens', 'timer'}
+        self.lotes = 0
+        self.imagens = 0
+        self.maior_lote = 0
+
+    async def inferir(self, modelo, model_size, conf, source):
+        """Enfileira uma imagem e aguarda o resultado do lote em que ela for incluída"""
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        
+        # Lotes só misturam pedidos com o mesmo modelo e o mesmo limite de confiança
+        chave = (model_size, conf, id(modelo))
+        grupo = self._grupos.get(chave)
+        if grupo is None:
+            grupo = {'modelo': modelo, 'conf': conf, 'itens': [], 'timer': None}
+            self._grupos[chave] = grupo
+            janela = max(0, CONFIG['batch_window_ms']) / 1000
+            grupo['timer'] = loop.call_later(janela, self._disparar, chave)
+        grupo['itens'].append((source, future))
+        
+        if len(grupo['itens']) >= max(1, CONFIG['max_batch_size']):
+            grupo['timer'].cancel()
+            self._disparar(chave)
+        
+        return await future
+
+    def _disparar(self, chave):
+        grupo = self._grupos.pop(chave, None)
+        if grupo:
+            asyncio.create_task(self._executar_lote(grupo))
+
+    async def _executar_lote(self, grupo):
+        itens = grupo['itens']
+        sources = [source for source, _ in itens]
+        print(f"Executando lote de {len(sources)} imagem(ns)...")
+        try:
+            results = await self.executor.executar(inferir_lote, grupo['modelo'], sources, grupo['conf'])
+            self.lotes += 1
+            self.imagens += len(itens)
+            self.maior_lote = max(self.maior_lote, len(itens))
+            for (_, future), result in zip(itens, results):
+                if not future.done():
+                    future.set_result(result)
+        except Exception as e:
+            for _, future in itens:
+                if not future.done():
+                    future.set_exception(e)
+        finally:
+            # Lote cancelado (CancelledError não é Exception, ex.: no desligamento): quem espera
+            # recebe o cancelamento em vez de ficar pendente para sempre
+            for _, future in itens:
+                if not future.done():
+                    future.cancel()
+
+MICRO_BATCHER = MicroBatcher(INFERENCE_EXECUTOR)
+
+# Processos de inferência: o processo principal cuida do gateway, downloads, decodificação e
+# renderização; N processos filhos mantêm os modelos aquecidos e só executam a inferência
+INFERENCE_PROCESS_THREADS = int(os.getenv('INFERENCE_PROCESS_THREADS', max(1, (os.cpu_count() or 1) // max(1, INFERENCE_PROCESSES))))
+MODELOS_POR_PROCESSO = int(os.getenv('MODELOS_POR_PROCESSO', '2'))
+INFERENCE_TIMEOUT_S = float(os.getenv('INFERENCE_TIMEOUT_S', '60'))
+MODEL_LOAD_TIMEOUT_S = float(os.getenv('MODEL_LOAD_TIMEOUT_S', '300'))
+HEALTH_CHECK_INTERVAL_S = float(os.getenv('HEALTH_CHECK_INTERVAL_S', '15'))
+HEALTH_CHECK_TIMEOUT_S = float(os.getenv('HEALTH_CHECK_TIMEOUT_S', '30'))  # inclui o import do torch em um processo recém-criado
+
+class ErroProcessoInferencia(Exception):
+    """Um processo de inferência morreu ou travou e não se recuperou"""
+
+def fixar_afinidade(nucleos):
+    """Afinidade de núcleos de todas as threads do processo atual.
+
+    No Linux sched_setaffinity(0, ...) vale só para a thread que chama; as threads já criadas
+    (event loop, executor, PIL) são fixadas uma a uma e as novas herdam a máscara de quem as cria.
+    """
+    if not nucleos or not hasattr(os, 'sched_setaffinity'):
+        return False
+    try:
+        tarefas = [int(tid) for tid in os.listdir('/proc/self/task')]
+    except OSError:
+        tarefas = [0]
+    for tid in tarefas:
+        try:
+            os.sched_setaffinity(tid, nucleos)
+        except ProcessLookupError:
+            pass  # thread terminou no meio do caminho
+    return True
+
+def configurar_threads(threads, interop=None, nucleos=None):
+    """Threads do torch (intra e inter-op) e afinidade de núcleos do processo atual"""
+    fixar_afinidade(nucleos)
+    import torch
+    torch.set_num_threads(threads)
+    if interop:
+        try:
+            torch.set_num_interop_threads(interop)
+        except RuntimeError:
+            # Só pode ser definido antes do primeiro trabalho inter-op do processo
+            print(f"Threads inter-op do torch já inicializadas; mantendo {torch.get_num_interop_threads()}")
+
+def _processo_inferencia(conexao, threads, nucleos=None, interop=None):
+    """Laço principal de um processo de inferência: recebe lotes pelo pipe e devolve as detecções"""
+    global PROCESSOS_INFERENCIA
+    PROCESSOS_INFERENCIA = None  # aqui dentro a inferência é sempre local
+    configurar_threads(threads, interop, nucleos)
+    modelos = OrderedDict()  # artefato -> modelo, do menos para o mais recentemente usado
+    
+    def obter_modelo(artefato, backend):
+        modelo = modelos.get(artefato)
+        if modelo is None:
+            modelo = construir_yolo(artefato) if backend == 'torch' else carregar_exportado(artefato, backend)
+            aquecer_modelo(modelo)
+            modelos[artefato] = modelo
+            while len(modelos) > MODELOS_POR_PROCESSO:
+                modelos.popitem(last=False)
+        modelos.move_to_end(artefato)
+        return modelo
+    
+    while True:
+        try:
+            mensagem = conexao.recv()
+        except (EOFError, KeyboardInterrupt):
+            break
+        tipo = mensagem[0]
+        if tipo == 'sair':
+            break
+        if tipo == 'ping':
+            conexao.send(('pong', list(modelos)))
+            continue
+        try:
+            inicio = time.perf_counter()
+            if tipo == 'carregar':
+                _, artefato, backend = mensagem
+                obter_modelo(artefato, backend)
+                conexao.send(('ok', list(modelos), time.perf_counter() - inicio))
+            elif tipo == 'descarregar':
+                modelos.pop(mensagem[1], None)
+                gc.collect()
+                conexao.send(('ok', list(modelos), time.perf_counter() - inicio))
+            else:
+                _, artefato, backend, conf, sources = mensagem
+                deteccoes = inferir_lote(obter_modelo(artefato, backend), sources, conf)
+                conexao.send(('ok', deteccoes, time.perf_counter() - inicio))
+        except Exception as e:
+            conexao.send(('erro', f"{type(e).__name__}: {str(e)}"))
+
+class ProcessoInferencia:
+    """Um processo filho de inferência, visto do processo principal"""
+    
+    def __init__(self, indice, contexto, threads, nucleos=None, interop=None):
+        self.indice = indice
+        self.threads = threads
+        self.nucleos = nucleos
+        self.interop = interop
+        self._contexto = contexto
+        self.pedidos = 0
+        self.imagens = 0
+        self.erros = 0
+        self.reinicios = 0
+        self.modelos = []
+        self.latencias = deque(maxlen=200)
+        self._iniciar()
+    
+    def _iniciar(self):
+        self.conexao, filho = self._contexto.Pipe()
+        self.processo = self._contexto.Process(
+            target=_processo_inferencia, args=(filho, self.threads, self.nucleos, self.interop),
+            name=f'yolo-inferencia-{self.indice}', daemon=True
+        )
+        self.processo.start()
+        filho.close()
+    
+    @property
+    def vivo(self):
+        return self.processo.is_alive()
+    
+    def chamar(self, mensagem, timeout):
+        self.conexao.send(mensagem)
+        if not self.conexao.poll(timeout):
+            raise TimeoutError(f"sem resposta em {timeout:.0f}s")
+        return self.conexao.recv()
+    
+    def reiniciar(self, motivo):
+        print(f"Reiniciando o processo de inferência {self.indice} (pid {self.processo.pid}): {motivo}")
+        self.processo.kill()
+        self.processo.join(timeout=5)
+        self.conexao.close()
+        self.reinicios += 1
+        self._iniciar()
+        # Recarregar (e aquecer) os modelos que o processo mantinha
+        for artefato, backend in self.modelos:
+            try:
+                self.chamar(('carregar', artefato, backend), MODEL_LOAD_TIMEOUT_S)
+            except Exception as e:
+                print(f"Erro ao recarregar {artefato} no processo {self.indice}: {str(e)}")
+
+class PoolProcessos:
+    def __init__(self, quantidade, threads, nucleos=None, interop=None):
+        self.quantidade = quantidade
+        self.threads = threads
+        self.nucleos = nucleos  # lista de núcleos por processo (afinidade), ou None
+        self.interop = interop
+        self.processos = []
+        self._livres = queue.Queue()
+        self.ativo = False
+    
+    @property
+    def disponivel(self):
+        return self.ativo
+    
+    def iniciar(self):
+        # spawn: fork de um processo com as threads do torch/asyncio pode travar
+        contexto = multiprocessing.get_context('spawn')
+        for i in range(self.quantidade):
+            processo = ProcessoInferencia(i, contexto, self.threads, self.nucleos[i] if self.nucleos else None, self.interop)
+            self.processos.append(processo)
+            self._livres.put(processo)
+        self.ativo = True
+        print(f"{self.quantidade} processo(s) de inferência iniciado(s) ({self.threads} thread(s) cada"
+              + (", com afinidade de núcleos)" if self.nucleos else ")"))
+    
+    def _executar(self, processo, mensagem, timeout):
+        """Envia a mensagem; se o processo morreu ou travou, reinicia-o e tenta mais uma vez"""
+        for tentativa in range(2):
+            try:
+                resposta = processo.chamar(mensagem, timeout)
+                break
+            except (EOFError, OSError, TimeoutError) as e:
+                processo.erros += 1
+                processo.reiniciar(str(e) or type(e).__name__)
+                if tentativa:
+                    raise ErroProcessoInferencia(f"processo de inferência {processo.indice} falhou: {str(e) or type(e).__name__}")
+        if resposta[0] == 'erro':
+            processo.erros += 1
+            raise RuntimeError(resposta[1])
+        return resposta
+    
+    def preparar(self, modelo):
+        """Carrega e aquece o modelo em todos os processos"""
+        chave = (modelo.artefato, getattr(modelo, 'backend_nome', 'torch'))
+        for _ in range(len(self.processos)):
+            processo = self._livres.get()
+            try:
+                _, modelos, _ = self._executar(processo, ('carregar',) + chave, MODEL_LOAD_TIMEOUT_S)
+                processo.modelos = [m for m in processo.modelos if m[0] in modelos and m != chave] + [chave]
+            finally:
+                self._livres.put(processo)
+    
+    def descarregar(self, modelo):
+        """Descarta o modelo dos processos que o mantêm carregado"""
+        chave = (modelo.artefato, getattr(modelo, 'backend_nome', 'torch'))
+        for _ in range(len(self.processos)):
+            processo = self._livres.get()
+            try:
+                if chave in processo.modelos:
+                    _, modelos, _ = self._executar(processo, ('descarregar', modelo.artefato), INFERENCE_TIMEOUT_S)
+                    processo.modelos = [m for m in processo.modelos if m[0] in modelos]
+            finally:
+                self._livres.put(processo)
+    
+    def inferir(self, modelo, sources, conf):
+        chave = (modelo.artefato, getattr(modelo, 'backend_nome', 'torch'))
+        processo = self._livres.get()
+        try:
+            _, deteccoes, duracao = self._executar(processo, ('inferir',) + chave + (conf, sources), INFERENCE_TIMEOUT_S)
+        finally:
+            self._livres.put(processo)
+        if chave not in processo.modelos:
+            processo.modelos = (processo.modelos + [chave])[-MODELOS_POR_PROCESSO:]
+        processo.pedidos += 1
+        processo.imagens += len(sources)
+        processo.latencias.append(duracao)
+        return deteccoes
+    
+    def verificar_saude(self):
+        """Ping nos processos ociosos; processos mortos ou travados são reiniciados"""
+        for _ in range(len(self.processos)):
+            try:
+                processo = self._livres.get_nowait()
+            except queue.Empty:
+                break  # os demais estão ocupados: o próprio pedido detecta uma falha
+            try:
+                if not processo.vivo:
+                    processo.reiniciar(f"processo terminou (código {processo.processo.exitcode})")
+                else:
+                    resposta = processo.chamar(('ping',), HEALTH_CHECK_TIMEOUT_S)
+                    if resposta[0] != 'pong':
+                        raise OSError(f"resposta inesperada: {resposta[0]}")
+            except (EOFError, OSError, TimeoutError) as e:
+                processo.erros += 1
+                processo.reiniciar(f"health check falhou: {str(e) or type(e).__name__}")
+            finally:
+                self._livres.put(processo)
+    
+    async def monitorar(self):
+        while True:
+            await asyncio.sleep(HEALTH_CHECK_INTERVAL_S)
+            try:
+                await asyncio.to_thread(self.verificar_saude)
+            except Exception as e:
+                print(f"Erro no health check dos processos de inferência: {str(e)}")
+
+PROCESSOS_INFERENCIA = PoolProcessos(INFERENCE_PROCESSES, INFERENCE_PROCESS_THREADS) if INFERENCE_PROCESSES > 0 else None
+
+# Configuração do cache de resultados de detecção
+CACHE_MAX_ENTRIES = int(os.getenv('CACHE_MAX_ENTRIES', 256))
+CACHE_MAX_MB = float(os.getenv('CACHE_MAX_MB', 64))
+CACHE_TTL_SECONDS = int(os.getenv('CACHE_TTL_SECONDS', 6 * 3600))
+CACHE_DIR = os.getenv('CACHE_DIR')  # tier em disco opcional (sobrevive a reinícios)
+
+# Chave do cache: conteúdo do anexo + parâmetros que alteram a resposta
+def chave_cache(image_bytes, cfg):
+    h = hashlib.sha256(image_bytes)
+    h.update(f"|{cfg['model_size']}|{cfg['confidence_threshold']}|{cfg['max_objects']}|{cfg['color_analysis']}|{cfg['color_mode']}|{cfg['box_colors']}|{cfg['decode_target']}|{variante_modelo(cfg)}"
+             f"|{cfg['output_format']}|{cfg['output_quality']}|{cfg['preview_max_side']}|{cfg.get('text_only', False)}"
+             f"|{cfg['clip_fps']}|{cfg['clip_scene_threshold']}|{cfg['clip_max_frames']}|{cfg['clip_output']}"
+             f"|{cfg['tiled']}|{cfg['tile_size']}|{cfg['tile_overlap']}|{cfg['tile_max_side']}"
+             # O cabeçalho da mensagem guardada diz se o tamanho veio do modo adaptativo e qual era o configurado
+             f"|{cfg.get('tamanho_configurado', cfg['model_size'])}|{cfg['adaptive_size']}".encode())
+    return h.hexdigest()
+
+class DetectionCache:
+    """Cache LRU com TTL, limitado por número de entradas e bytes totais"""
+
+    def __init__(self, max_entradas, max_bytes, ttl, diretorio=None):
+        self.max_entradas = max_entradas
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.diretorio = diretorio
+        self._entradas = OrderedDict()  # chave -> (expira_em, mensagem, imagem, classes)
+        self._lock = threading.Lock()
+        self.bytes_usados = 0
+        self.hits = 0
+        self.hits_disco = 0
+        self.misses = 0
+        self.evictions = 0
+        if diretorio:
+            os.makedirs(diretorio, exist_ok=True)
+            self._limpar_disco()
+
+    def __len__(self):
+        return len(self._entradas)
+
+    @property
+    def habilitado(self):
+        return self.max_entradas > 0 and self.max_bytes > 0
+
+    @staticmethod
+    def _tamanho(mensagem, imagem):
+        return len(mensagem.encode()) + len(imagem)
+
+    def _obter_memoria(self, chave):
+        with self._lock:
+            entrada = self._entradas.get(chave)
+            if entrada is None:
+                return None
+            expira_em, mensagem, imagem, classes = entrada
+            if expira_em < time.time():
+                self._remover(chave)
+                self.evictions += 1
+                return None
+            self._entradas.move_to_end(chave)
+            return mensagem, imagem, classes
+
+    def _guardar_memoria(self, chave, mensagem, imagem, classes, expira_em):
+        tamanho = self._tamanho(mensagem, imagem)
+        if tamanho > self.max_bytes:
+            return
+        with self._lock:
+            if chave in self._entradas:
+                self._remover(chave)
+            self._entradas[chave] = (expira_em, mensagem, imagem, classes)
+            self.bytes_usados += tamanho
+            # Despejar as entradas menos usadas até caber nos limites
+            while len(self._entradas) > self.max_entradas or self.bytes_usados > self.max_bytes:
+                antiga = next(iter(self._entradas))
+                self._remover(antiga)
+                self.evictions += 1
+
+    def _remover(self, chave):
+        _, mensagem, imagem, _ = self._entradas.pop(chave)
+        self.bytes_usados -= self._tamanho(mensagem, imagem)
+
+    def _limpar_disco(self):
+        # Remover entradas expiradas deixadas por execuções anteriores
+        removidas = 0
+        for nome in os.listdir(self.diretorio):
+            caminho = os.path.join(self.diretorio, nome)
+            try:
+                if os.path.getmtime(caminho) + self.ttl < time.time():
+                    os.remove(caminho)
+                    removidas += 1
+            except OSError:
+                pass
+        if removidas:
+            print(f"Cache em disco: {removidas} arquivo(s) expirado(s) removido(s)")
+
+    def _caminhos(self, chave):
+        base = os.path.join(self.diretorio, chave)
+        return base + '.json', base + '.jpg'
+
+    def _ler_disco(self, chave):
+        caminho_msg, caminho_img = self._caminhos(chave)
+        try:
+            modificado = os.path.getmtime(caminho_msg)
+            if modificado + self.ttl < time.time():
+                os.remove(caminho_msg)
+                os.remove(caminho_img)
+                return None
+            with open(caminho_msg, 'r', encoding='utf-8') as f:
+                dados = json.load(f)
+            with open(caminho_img, 'rb') as f:
+                imagem = f.read()
+            classes = [tuple(c) for c in dados['classes']]
+            return dados['mensagem'], imagem, classes, modificado + self.ttl
+        except (OSError, ValueError, KeyError):
+            return None
+
+    def _gravar_disco(self, chave, mensagem, imagem, classes):
+        caminho_msg, caminho_img = self._caminhos(chave)
+        try:
+            # Gravar a imagem primeiro: a mensagem marca a entrada como completa
+            with open(caminho_img + '.tmp', 'wb') as f:
+                f.write(imagem)
+            os.replace(caminho_img + '.tmp', caminho_img)
+            with open(caminho_msg + '.tmp', 'w', encoding='utf-8') as f:
+                json.dump({'mensagem': mensagem, 'classes': classes}, f, ensure_ascii=False)
+            os.replace(caminho_msg + '.tmp', caminho_msg)
+        except OSError as e:
+            print(f"Erro ao gravar cache em disco: {str(e)}")
+
+    async def obter(self, chave):
+        """Retorna (mensagem, imagem, classes) em cache ou None"""
+        if not self.habilitado:
+            return None
+        valor = self._obter_memoria(chave)
+        if valor is None and self.diretorio:
+            lido = await asyncio.to_thread(self._ler_disco, chave)
+            if lido is not None:
+                mensagem, imagem, classes, expira_em = lido
+                self._guardar_memoria(chave, mensagem, imagem, classes, expira_em)
+                self.hits_disco += 1
+                valor = mensagem, imagem, classes
+        if valor is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return valor
+
+    async def guardar(self, chave, mensagem, imagem, classes):
+        if not self.habilitado:
+            return
+        self._guardar_memoria(chave, mensagem, imagem, classes, time.time() + self.ttl)
+        if self.diretorio:
+            await asyncio.to_thread(self._gravar_disco, chave, mensagem, imagem, classes)
+
+DETECTION_CACHE = DetectionCache(CACHE_MAX_ENTRIES, int(CACHE_MAX_MB * 1024 * 1024), CACHE_TTL_SECONDS, CACHE_DIR)
+
+# Histórico de detecções em SQLite (vazio desativa). A gravação acontece em uma thread própria, em lotes
+HISTORY_DB = os.getenv('HISTORY_DB', 'historico.db')
+HISTORY_BATCH_SIZE = int(os.getenv('HISTORY_BATCH_SIZE', 500))  # registros por transação
+HISTORY_FLUSH_S = float(os.getenv('HISTORY_FLUSH_S', 1.0))  # espera máxima até gravar um lote incompleto
+HISTORY_QUEUE_MAX = int(os.getenv('HISTORY_QUEUE_MAX', 10000))  # acima disto, registros são descartados
+
+ESQUEMA_HISTORICO = """
+CREATE TABLE IF NOT EXISTS pedidos (
+    id INTEGER PRIMARY KEY,
+    ts INTEGER NOT NULL,
+    guild_id INTEGER NOT NULL,
+    canal_id INTEGER NOT NULL,
+    usuario_id INTEGER NOT NULL,
+    modelo TEXT NOT NULL,
+    origem TEXT NOT NULL,
+    objetos INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS objetos (
+    pedido_id INTEGER NOT NULL REFERENCES pedidos(id),
+    ts INTEGER NOT NULL,
+    guild_id INTEGER NOT NULL,
+    canal_id INTEGER NOT NULL,
+    classe TEXT NOT NULL,
+    confianca REAL NOT NULL,
+    regiao TEXT,
+    largura REAL,
+    altura REAL
+);
+CREATE INDEX IF NOT EXISTS idx_pedidos_canal_ts ON pedidos(guild_id, canal_id, ts);
+CREATE INDEX IF NOT EXISTS idx_pedidos_usuario_ts ON pedidos(usuario_id, ts);
+CREATE INDEX IF NOT EXISTS idx_objetos_pedido ON objetos(pedido_id);
+CREATE INDEX IF NOT EXISTS idx_objetos_canal_classe_ts ON objetos(guild_id, canal_id, classe, ts);
+
+-- Agregados por dia (UTC), mantidos na mesma transação que grava os pedidos
+CREATE TABLE IF NOT EXISTS resumo_classes (
+    guild_id INTEGER NOT NULL,
+    canal_id INTEGER NOT NULL,
+    classe TEXT NOT NULL,
+    dia INTEGER NOT NULL,
+    objetos INTEGER NOT NULL,
+    pedidos INTEGER NOT NULL,
+    soma_conf REAL NOT NULL,
+    PRIMARY KEY (guild_id, canal_id, classe, dia)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS idx_resumo_classes_guild_dia ON resumo_classes(guild_id, dia);
+CREATE TABLE IF NOT EXISTS resumo_pedidos (
+    guild_id INTEGER NOT NULL,
+    canal_id INTEGER NOT NULL,
+    dia INTEGER NOT NULL,
+    pedidos INTEGER NOT NULL,
+    objetos INTEGER NOT NULL,
+    PRIMARY KEY (guild_id, canal_id, dia)
+) WITHOUT ROWID;
+"""
+
+class HistoricoDeteccoes:
+    """Registra pedidos e objetos detectados sem bloquear o event loop.
+
+    `registrar` só enfileira; uma thread grava os registros em lotes (uma transação por lote)
+    e atualiza os agregados diários usados por `!historico` e `!top`.
+    """
+
+    def __init__(self, caminho, lote_max, intervalo, fila_max):
+        self.caminho = caminho
+        self.lote_max = lote_max
+        self.intervalo = intervalo
+        self.fila_max = fila_max
+        self._fila = queue.Queue()
+        self._thread = None
+        self.erro_inicio = None  # motivo da desativação quando o banco não pôde ser aberto
+        self.gravados = 0
+        self.lotes = 0
+        self.descartados = 0
+        self.erros = 0
+
+    @property
+    def habilitado(self):
+        """Só depois de `iniciar` abrir o banco (e a thread de gravação estar rodando)"""
+        return bool(self.caminho) and self._thread is not None
+
+    @property
+    def motivo_desativado(self):
+        if not self.caminho:
+            return "HISTORY_DB vazio"
+        return self.erro_inicio or "banco ainda não inicializado"
+
+    @property
+    def pendentes(self):
+        return self._fila.qsize()
+
+    def _conectar(self, somente_leitura=False):
+        if somente_leitura:
+            return sqlite3.connect(f"file:{self.caminho}?mode=ro", uri=True)
+        conexao = sqlite3.connect(self.caminho)
+        # WAL: as consultas dos comandos leem enquanto a thread de gravação escreve
+        conexao.execute("PRAGMA journal_mode=WAL")
+        conexao.execute("PRAGMA synchronous=NORMAL")
+        return conexao
+
+    def iniciar(self):
+        if not self.caminho or self._thread is not None:
+            return
+        try:
+            with self._conectar() as conexao:
+                conexao.executescript(ESQUEMA_HISTORICO)
+        except (sqlite3.Error, OSError) as e:
+            self.erro_inicio = f"erro ao abrir {self.caminho}: {str(e)}"
+            print(f"Histórico de detecções desativado ({self.caminho}): {str(e)}")
+            return
+        self._thread = threading.Thread(target=self._gravador, name='historico', daemon=True)
+        self._thread.start()
+        print(f"Histórico de detecções em {self.caminho}")
+
+    def registrar(self, ctx, cfg, classes, objetos=None, origem='imagem'):
+        """Enfileira um pedido: classes como (nome, contagem, confiança média) e, opcionalmente,
+        uma linha (classe, confiança, região, largura, altura) por objeto"""
+        if self._thread is None:
+            return
+        if self._fila.qsize() >= self.fila_max:
+            self.descartados += 1
+            return
+        guild_id = ctx.guild.id if ctx.guild is not None else 0
+        self._fila.put((int(time.time()), guild_id, ctx.channel.id, ctx.author.id, cfg['model_size'], origem,
+                        list(classes), objetos))
+
+    def _gravador(self):
+        conexao = self._conectar()
+        while True:
+            lote = [self._fila.get()]
+            # Juntar o que chegar em até `intervalo` segundos: uma transação por lote
+            limite = time.monotonic() + self.intervalo
+            while len(lote) < self.lote_max:
+                restante = limite - time.monotonic()
+                if restante <= 0:
+                    break
+                try:
+                    lote.append(self._fila.get(timeout=restante))
+                except queue.Empty:
+                    break
+            try:
+                self._gravar(conexao, lote)
+                self.gravados += len(lote)
+                self.lotes += 1
+            except sqlite3.Error as e:
+                self.erros += 1
+                print(f"Erro ao gravar o histórico ({len(lote)} registro(s) perdidos): {str(e)}")
+
+    @staticmethod
+    def _gravar(conexao, lote):
+        resumo_classes, resumo_pedidos = {}, {}
+        with conexao:
+            for ts, guild_id, canal_id, usuario_id, modelo, origem, classes, objetos in lote:
+                total = sum(count for _, count, _ in classes)
+                cursor = conexao.execute(
+                    "INSERT INTO pedidos (ts, guild_id, canal_id, usuario_id, modelo, origem, objetos) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    (ts, guild_id, canal_id, usuario_id, modelo, origem, total)
+                )
+                if objetos:
+                    conexao.executemany(
+                        "INSERT INTO objetos (pedido_id, ts, guild_id, canal_id, classe, confianca, regiao, largura, altura) "
+                        "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                        [(cursor.lastrowid, ts, guild_id, canal_id, *objeto) for objeto in objetos]
+                    )
+                
+                # Os agregados do lote são somados aqui e aplicados com um upsert por chave
+                dia = ts // 86400
+                pedidos, objetos_dia = resumo_pedidos.get((guild_id, canal_id, dia), (0, 0))
+                resumo_pedidos[(guild_id, canal_id, dia)] = (pedidos + 1, objetos_dia + total)
+                for classe, count, avg_confidence in classes:
+                    chave = (guild_id, canal_id, classe, dia)
+                    objetos_classe, pedidos_classe, soma_conf = resumo_classes.get(chave, (0, 0, 0.0))
+                    resumo_classes[chave] = (objetos_classe + count, pedidos_classe + 1, soma_conf + count * avg_confidence)
+            
+            conexao.executemany(
+                "INSERT INTO resumo_classes (guild_id, canal_id, classe, dia, objetos, pedidos, soma_conf) VALUES (?, ?, ?, ?, ?, ?, ?) "
+                "ON CONFLICT (guild_id, canal_id, classe, dia) DO UPDATE SET objetos = objetos + excluded.objetos, "
+                "pedidos = pedidos + excluded.pedidos, soma_conf = soma_conf + excluded.soma_conf",
+                [(*chave, *valores) for chave, valores in resumo_classes.items()]
+            )
+            conexao.executemany(
+                "INSERT INTO resumo_pedidos (guild_id, canal_id, dia, pedidos, objetos) VALUES (?, ?, ?, ?, ?) "
+                "ON CONFLICT (guild_id, canal_id, dia) DO UPDATE SET pedidos = pedidos + excluded.pedidos, "
+                "objetos = objetos + excluded.objetos",
+                [(*chave, *valores) for chave, valores in resumo_pedidos.items()]
+            )
+
+    def consultar(self, sql, parametros):
+        """Consulta síncrona em uma conexão só de leitura (rodar fora do event loop)"""
+        conexao = self._conectar(somente_leitura=True)
+        try:
+            return conexao.execute(sql, parametros).fetchall()
+        finally:
+            conexao.close()
+
+    def historico_canal(self, guild_id, canal_id, dias, classe=None):
+        desde = int(time.time()) // 86400 - dias + 1
+        totais = self.consultar(
+            "SELECT COALESCE(SUM(pedidos), 0), COALESCE(SUM(objetos), 0) FROM resumo_pedidos "
+            "WHERE guild_id = ? AND canal_id = ? AND dia >= ?", (guild_id, canal_id, desde)
+        )[0]
+        if classe is None:
+            linhas = self.consultar(
+                "SELECT classe, SUM(objetos), SUM(pedidos) FROM resumo_classes WHERE guild_id = ? AND canal_id = ? AND dia >= ? "
+                "GROUP BY classe ORDER BY SUM(objetos) DESC LIMIT 10", (guild_id, canal_id, desde)
+            )
+        else:
+            linhas = self.consultar(
+                "SELECT dia, objetos, pedidos FROM resumo_classes WHERE guild_id = ? AND canal_id = ? AND classe = ? AND dia >= ? "
+                "ORDER BY dia", (guild_id, canal_id, classe, desde)
+            )
+        return totais, linhas
+
+    def top(self, guild_id, tipo, dias):
+        desde = int(time.time()) // 86400 - dias + 1
+        coluna = 'classe' if tipo == 'classes' else 'canal_id'
+        return self.consultar(
+            f"SELECT {coluna}, SUM(objetos), SUM(pedidos), SUM(soma_conf) FROM resumo_classes WHERE guild_id = ? AND dia >= ? "
+            f"GROUP BY {coluna} ORDER BY SUM(objetos) DESC LIMIT 10", (guild_id, desde)
+        )
+
+HISTORICO = HistoricoDeteccoes(HISTORY_DB, HISTORY_BATCH_SIZE, HISTORY_FLUSH_S, HISTORY_QUEUE_MAX)
+
+# Origem dos pesos (pode apontar para um espelho ou servidor local)
+MODEL_BASE_URL = os.getenv('MODEL_BASE_URL', 'https://github.com/ultralytics/assets/releases/download/v0.0.0').rstrip('/')
+
+# SHA-256 esperado de cada modelo (via YOLO_SHA256_N, YOLO_SHA256_S...)
+MODEL_SHA256 = {
+    size: os.getenv(f'YOLO_SHA256_{size.upper()}', '').lower()
+    for size in ['n', 's', 'm', 'l', 'x']
+    if os.getenv(f'YOLO_SHA256_{size.upper()}')
+}
+
+# Checksums fixados no primeiro download (formato do sha256sum); usados quando não há um configurado
+MODEL_SHA256_FILE = os.getenv('MODEL_SHA256_FILE', 'modelos.sha256')
+
+def ler_checksums_fixados(caminho=None):
+    """Lê o arquivo de checksums fixados: {tamanho: sha256}"""
+    caminho = caminho or MODEL_SHA256_FILE
+    fixados = {}
+    try:
+        with open(caminho) as f:
+            for linha in f:
+                partes = linha.split()
+                if len(partes) == 2 and partes[1].startswith('yolov8') and partes[1].endswith('.pt'):
+                    fixados[partes[1][len('yolov8'):-len('.pt')]] = partes[0].lower()
+    except OSError:
+        pass
+    return fixados
+
+def fixar_checksum(size, digest, caminho=None):
+    """Registra o checksum de yolov8{size}.pt para verificar os próximos downloads"""
+    caminho = caminho or MODEL_SHA256_FILE
+    fixados = ler_checksums_fixados(caminho)
+    fixados[size] = digest
+    temporario = caminho + '.tmp'
+    with open(temporario, 'w') as f:
+        for tamanho, valor in sorted(fixados.items()):
+            f.write(f"{valor}  yolov8{tamanho}.pt\n")
+    os.replace(temporario, caminho)
+
+class DownloadError(Exception):
+    """Falha no download ou na verificação de um modelo"""
+
+class ModelDownloader:
+    """Downloads assíncronos de modelos: retomáveis, verificados e sem duplicação"""
+
+    def __init__(self, base_url, tentativas=3, chunk_size=1024 * 1024):
+        self.base_url = base_url
+        self.tentativas = tentativas
+        self.chunk_size = chunk_size
+        self._tarefas = {}  # tamanho -> asyncio.Task
+        self._inscritos = {}  # tamanho -> [asyncio.Queue] recebendo eventos de progresso
+
+    def inscrever(self, size):
+        """Retorna uma fila que recebe os eventos de progresso do download deste tamanho"""
+        fila = asyncio.Queue()
+        self._inscritos.setdefault(size, []).append(fila)
+        return fila
+
+    def cancelar_inscricao(self, size, fila):
+        filas = self._inscritos.get(size, [])
+        if fila in filas:
+            filas.remove(fila)
+
+    def _emitir(self, size, evento):
+        DOWNLOADS_EM_ANDAMENTO[size] = evento
+        for fila in self._inscritos.get(size, []):
+            fila.put_nowait(evento)
+
+    async def baixar(self, size, path):
+        """Baixa yolov8{size}.pt para path; pedidos simultâneos do mesmo tamanho compartilham o download"""
+        task = self._tarefas.get(size)
+        if task is None:
+            task = asyncio.create_task(self._baixar(size, path))
+            self._tarefas[size] = task
+            task.add_done_callback(lambda _: self._tarefas.pop(size, None))
+        return await asyncio.shield(task)
+
+    async def _baixar(self, size, path):
+        url = f"{self.base_url}/yolov8{size}.pt"
+        parcial = path + '.part'
+        print(f"Iniciando download do modelo YOLOv8{size} de {url}...")
+        self._emitir(size, {'percent': 0, 'status': 'starting'})
+        
+        try:
+            timeout = aiohttp.ClientTimeout(total=None, sock_connect=30, sock_read=60)
+            async with aiohttp.ClientSession(timeout=timeout) as session:
+                for tentativa in range(1, self.tentativas + 1):
+                    try:
+                        await self._transferir(session, size, url, parcial)
+                        break
+                    except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                        if tentativa == self.tentativas:
+                            raise DownloadError(f"download interrompido após {tentativa} tentativas: {str(e)}")
+                        print(f"Download do modelo YOLOv8{size} interrompido ({str(e)}), retomando...")
+                        await asyncio.sleep(2 ** tentativa)
+                
+                esperado = (
+                    MODEL_SHA256.get(size)
+                    or ler_checksums_fixados().get(size)
+                    or await self._checksum_publicado(session, url)
+                )
+            
+            obtido = await self._verificar(parcial, esperado)
+            if not esperado:
+                # Nenhum checksum conhecido: fixar o deste download para verificar os próximos
+                print(f"Sem checksum conhecido para YOLOv8{size}; fixando {obtido[:12]}… em {MODEL_SHA256_FILE}")
+                fixar_checksum(size, obtido)
+            os.replace(parcial, path)
+        except Exception as e:
+            print(f"Erro no download do modelo: {str(e)}")
+            self._emitir(size, {'percent': 0, 'status': 'error', 'error': str(e)})
+            raise
+        
+        print(f"Download do modelo YOLOv8{size} concluído!")
+        self._emitir(size, {'percent': 100, 'status': 'completed'})
+
+    async def _transferir(self, session, size, url, parcial):
+        # Retomar de onde um download anterior parou
+        inicio = os.path.getsize(parcial) if os.path.exists(parcial) else 0
+        headers = {'Range': f'bytes={inicio}-'} if inicio else {}
+        
+        async with session.get(url, headers=headers) as resp:
+            if resp.status == 416 and inicio:
+                # O arquivo parcial já está completo
+                return
+            if resp.status == 206:
+                total = int(resp.headers.get('Content-Range', '*/0').rsplit('/', 1)[-1] or 0)
+                modo = 'ab'
+            elif resp.status == 200:
+                # Servidor ignorou o Range: recomeçar do zero
+                inicio = 0
+                total = resp.content_length or 0
+                modo = 'wb'
+            else:
+                raise DownloadError(f"HTTP {resp.status} ao baixar {url}")
+            
+            baixados = inicio
+            ultimo_percent = -1
+            with open(parcial, modo) as f:
+                async for chunk in resp.content.iter_chunked(self.chunk_size):
+                    await asyncio.to_thread(f.write, chunk)
+                    baixados += len(chunk)
+                    percent = int(baixados * 100 / total) if total else 0
+                    if percent != ultimo_percent:
+                        ultimo_percent = percent
+                        self._emitir(size, {
+                            'percent': percent,
+                            'status': 'downloading',
+                            'baixados': baixados,
+                            'total': total
+                        })
+            
+            if total and baixados != total:
+                raise aiohttp.ClientPayloadError(f"recebidos {baixados} de {total} bytes")
+
+    async def _checksum_publicado(self, session, url):
+        # Arquivo .sha256 opcional publicado ao lado dos pesos
+        try:
+            async with session.get(url + '.sha256') as resp:
+                if resp.status == 200:
+                    return (await resp.text()).split()[0].lower()
+        except (aiohttp.ClientError, asyncio.TimeoutError, IndexError):
+            pass
+        return None
+
+    @staticmethod
+    async def _verificar(parcial, esperado):
+        """Calcula o SHA-256 do arquivo baixado e, se houver um esperado, confere"""
+        def calcular():
+            h = hashlib.sha256()
+            with open(parcial, 'rb') as f:
+                for bloco in iter(lambda: f.read(1024 * 1024), b''):
+                    h.update(bloco)
+            return h.hexdigest()
+        
+        obtido = await asyncio.to_thread(calcular)
+        if esperado and obtido != esperado:
+            # Arquivo corrompido: descartar para não retomar a partir dele
+            os.remove(parcial)
+            raise DownloadError(f"checksum inválido (esperado {esperado[:12]}…, obtido {obtido[:12]}…)")
+        return obtido
+
+MODEL_DOWNLOADER = ModelDownloader(MODEL_BASE_URL)
+
+# Atualiza uma mensagem do Discord conforme os eventos de progresso chegam
+async def relatar_progresso(fila, progress_message):
+    editado_em = 0
+    while True:
+        evento = await fila.get()
+        # Descartar eventos intermediários acumulados, ficando com o mais recente
+        while not fila.empty():
+            evento = fila.get_nowait()
+        
+        status = evento['status']
+        if status == 'completed':
+            await progress_message.edit(content=f"✅ Download concluído! Carregando modelo...")
+            return
+        if status == 'error':
+            await progress_message.edit(content=f"❌ Erro no download: {evento.get('error', 'desconhecido')}")
+            return
+        if status == 'downloading' and time.monotonic() - editado_em >= 2:
+            # Limitar as edições para respeitar o rate limit do Discord
+            percent = evento['percent']
+            editado_em = time.monotonic()
+            await progress_message.edit(content=f"Progresso: {percent}% | {'▓' * (percent // 10)}{'░' * (10 - percent // 10)}")
+
+# Carregar modelo YOLO
+async def load_yolo_model(size='n', ctx=None):
+    print(f"Carregando modelo YOLO de tamanho '{size}'...")
+    model_path = f'yolov8{size}.pt'
+    
+    if not os.path.exists(model_path):
+        if ctx:
+            await ctx.send(f"Modelo YOLOv8{size} não encontrado. Iniciando download... (isso pode levar vários minutos para modelos maiores)")
+        print(f"Baixando o modelo YOLOv8{size}...")
+        
+        # Verificar o tamanho do modelo antes de baixar
+        modelo_sizes = {
+            'n': "6 MB",
+            's': "22 MB",
+            'm': "50 MB",
+            'l': "90 MB",
+            'x': "670 MB"
+        }
+        
+        if size in modelo_sizes and ctx:
+            await ctx.send(f"⬇️ Baixando YOLOv8{size} ({modelo_sizes[size]})...")
+        
+        # Se temos um contexto, acompanhar o progresso pelos eventos do downloader
+        relator = None
+        fila = None
+        if ctx:
+            fila = MODEL_DOWNLOADER.inscrever(size)
+            progress_message = await ctx.send("Progresso: 0%")
+            relator = asyncio.create_task(relatar_progresso(fila, progress_message))
+        
+        try:
+            await MODEL_DOWNLOADER.baixar(size, model_path)
+        except Exception as e:
+            raise Exception(f"Erro no download do modelo: {str(e)}")
+        finally:
+            if relator:
+                try:
+                    await asyncio.wait_for(relator, timeout=10)
+                except Exception:
+                    relator.cancel()
+                MODEL_DOWNLOADER.cancelar_inscricao(size, fila)
+    
+    # Com processos de inferência, cada processo carrega a sua cópia: aqui fica só a referência
+    if PROCESSOS_INFERENCIA is not None:
+        print(f"YOLOv8{size} será carregado pelos processos de inferência")
+        return ModeloRemoto(model_path)
+    
+    # Importar torch/ultralytics (na primeira vez) e construir o modelo fora do event loop
+    try:
+        model = await asyncio.to_thread(construir_yolo, model_path)
+        print(f"Modelo YOLOv8{size} carregado com sucesso!")
+        return model
+    except Exception as e2:
+        print(f"Erro ao carregar o modelo YOLOv8{size}: {str(e2)}")
+        print("Verifique se o arquivo de pesos está íntegro e se PyTorch e Ultralytics estão instalados")
+        if ctx:
+            await ctx.send(f"❌ Erro ao carregar o modelo: {str(e2)}")
+        raise e2
+
+# torch.load com weights_only=False apenas na thread que pediu (ver weights_only_desativado)
+_CARREGAMENTO_LOCAL = threading.local()
+_TORCH_LOAD_LOCK = threading.Lock()
+
+def _envolver_torch_load():
+    """Troca torch.load uma única vez por um wrapper que só altera as chamadas da thread marcada"""
+    import torch
+    with _TORCH_LOAD_LOCK:
+        if getattr(torch.load, '_yolobot', False):
+            return
+        orig_load = torch.load
+        def load_escopado(f, *args, **kwargs):
+            if getattr(_CARREGAMENTO_LOCAL, 'sem_weights_only', False):
+                kwargs['weights_only'] = False
+            return orig_load(f, *args, **kwargs)
+        load_escopado._yolobot = True
+        torch.load = load_escopado
+
+@contextmanager
+def weights_only_desativado():
+    """Força weights_only=False nos torch.load desta thread; carregamentos simultâneos em
+    outras threads (outro tamanho, processo de inferência, exportação) não são afetados"""
+    _envolver_torch_load()
+    _CARREGAMENTO_LOCAL.sem_weights_only = True
+    try:
+        yield
+    finally:
+        _CARREGAMENTO_LOCAL.sem_weights_only = False
+
+def construir_yolo(model_path):
+    """Instancia o YOLO a partir do .pt (no bot ou em um processo de inferência)"""
+    registrar_classes_seguras()
+    from ultralytics import YOLO
+    
+    # Carregar modelo com opção weights_only=False
+    try:
+        model = YOLO(model_path)
+    except Exception as e1:
+        print(f"Erro ao carregar o modelo normalmente: {str(e1)}")
+        print("Tentando com método alternativo...")
+        
+        # Método alternativo forçando weights_only=False, só nesta thread
+        with weights_only_desativado():
+            model = YOLO(model_path)
+        print(f"Modelo {model_path} carregado com sucesso usando método alternativo!")
+    model.artefato = model_path
+    return model
+
+class ModeloRemoto:
+    """Modelo servido pelos processos de inferência: o processo principal guarda só o artefato.
+
+    A cópia local é construída no primeiro uso que precise do modelo de verdade neste processo
+    (inferência local quando um processo falha, exportação, medições) e não antes.
+    """
+
+    def __init__(self, artefato, backend='torch'):
+        self.artefato = artefato
+        self.backend_nome = backend
+        self._local = None
+        self._lock_local = threading.Lock()
+
+    @property
+    def carregado_localmente(self):
+        return self._local is not None
+
+    def local(self):
+        with self._lock_local:
+            if self._local is None:
+                print(f"Carregando uma cópia local de {self.artefato} no processo principal")
+                if self.backend_nome == 'torch':
+                    self._local = construir_yolo(self.artefato)
+                else:
+                    self._local = carregar_exportado(self.artefato, self.backend_nome)
+            return self._local
+
+    def __call__(self, *args, **kwargs):
+        return self.local()(*args, **kwargs)
+
+    def __getattr__(self, nome):
+        # Atributos privados (travas, caches) nunca disparam o carregamento
+        if nome.startswith('_'):
+            raise AttributeError(nome)
+        return getattr(self.local(), nome)
+
+# Tamanhos de modelo suportados
+TAMANHOS_VALIDOS = ['n', 's', 'm', 'l', 'x']
+
+# Orçamento de memória para os modelos mantidos carregados ao mesmo tempo
+MODEL_RAM_BUDGET_MB = float(os.getenv('MODEL_RAM_BUDGET_MB', 1024))
+
+# Backends de inferência: formato de exportação do ultralytics e artefato gerado ao lado dos pesos
+BACKENDS = {
+    'torch': None,
+    'onnx': {'format': 'onnx', 'artefato': 'yolov8{size}.onnx', 'dynamic': True, 'runtime': 'onnxruntime'},
+    'openvino': {'format': 'openvino', 'artefato': 'yolov8{size}_openvino_model', 'dynamic': True, 'runtime': 'openvino'},
+    'torchscript': {'format': 'torchscript', 'artefato': 'yolov8{size}.torchscript', 'dynamic': False, 'runtime': 'torch'}
+}
+
+# Backends exportados com batch fixo em 1: imagens de um lote são inferidas uma a uma
+BACKENDS_SEM_LOTE = {'torchscript'}
+
+# Verifica se o runtime de um backend está instalado
+def backend_disponivel(backend):
+    import importlib.util
+    spec = BACKENDS.get(backend)
+    return spec is None or importlib.util.find_spec(spec['runtime']) is not None
+
+# Exporta (uma única vez) o modelo torch carregado para o formato do backend
+def exportar_modelo(modelo_torch, size, backend):
+    spec = BACKENDS[backend]
+    artefato = spec['artefato'].format(size=size)
+    if os.path.exists(artefato):
+        return artefato
+    
+    print(f"Exportando YOLOv8{size} para {backend}...")
+    exportado = modelo_torch.export(format=spec['format'], dynamic=spec['dynamic'])
+    print(f"YOLOv8{size} exportado para {backend}: {exportado}")
+    return artefato if os.path.exists(artefato) else str(exportado)
+
+# Carrega o artefato exportado com o runtime correspondente (mesma API do YOLO)
+def carregar_exportado(artefato, backend):
+    from ultralytics import YOLO
+    modelo = YOLO(artefato, task='detect')
+    modelo.backend_nome = backend
+    modelo.artefato = artefato
+    return modelo
+
+# Variantes quantizadas em INT8 (executadas pelo ONNX Runtime) e o método de quantização
+QUANTIZACOES = {
+    'int8': 'estatica',  # pesos e ativações em INT8, calibrado com imagens
+    'int8-dinamico': 'dinamica'  # pesos em INT8, ativações quantizadas em tempo de execução
+}
+PRECISOES = ['fp32'] + list(QUANTIZACOES)
+
+# Imagens usadas na calibração e na comparação FP32 x INT8
+CALIBRACAO_DIR = os.getenv('CALIBRACAO_DIR', 'calibracao')
+
+def imagens_locais(diretorio=CALIBRACAO_DIR, limite=32):
+    """Imagens do diretório local ou, na falta dele, as imagens de exemplo que acompanham o ultralytics"""
+    caminhos = []
+    if os.path.isdir(diretorio):
+        caminhos = sorted(
+            os.path.join(diretorio, nome) for nome in os.listdir(diretorio)
+            if nome.lower().endswith(('.png', '.jpg', '.jpeg', '.webp', '.bmp'))
+        )
+    if not caminhos:
+        from ultralytics.utils import ASSETS
+        caminhos = sorted(str(p) for p in ASSETS.glob('*.jpg'))
+    imagens = []
+    for caminho in caminhos[:limite]:
+        with Image.open(caminho) as img:
+            imagens.append(np.ascontiguousarray(np.asarray(img.convert('RGB'))[:, :, ::-1]))
+    return imagens
+
+# Pré-processamento idêntico ao do ultralytics para modelos exportados (letterbox 640, RGB, NCHW, 0-1)
+def preprocessar_calibracao(imagem_bgr, imgsz=640):
+    from ultralytics.data.augment import LetterBox
+    img = LetterBox((imgsz, imgsz), auto=False)(image=imagem_bgr)
+    img = img[:, :, ::-1].transpose(2, 0, 1)
+    return np.ascontiguousarray(img[None], dtype=np.float32) / 255.0
+
+# Quantiza (uma única vez) o ONNX exportado do modelo, guardando o resultado ao lado dos pesos
+def quantizar_modelo(modelo_torch, size, precisao):
+    import onnx
+    from onnxruntime.quantization import (CalibrationDataReader, QuantFormat, QuantType,
+                                          quantize_dynamic, quantize_static)
+    
+    artefato = f'yolov8{size}.{precisao}.onnx'
+    if os.path.exists(artefato):
+        return artefato
+    
+    onnx_fp32 = exportar_modelo(modelo_torch, size, 'onnx')
+    modelo_onnx = onnx.load(onnx_fp32)
+    temporario = artefato + '.tmp'
+    print(f"Quantizando YOLOv8{size} em INT8 ({QUANTIZACOES[precisao]})...")
+    
+    if QUANTIZACOES[precisao] == 'dinamica':
+        quantize_dynamic(onnx_fp32, temporario, weight_type=QuantType.QUInt8)
+    else:
+        entrada = modelo_onnx.graph.input[0].name
+        
+        class LeitorCalibracao(CalibrationDataReader):
+            def __init__(self, imagens):
+                self._amostras = iter(imagens)
+            
+            def get_next(self):
+                imagem = next(self._amostras, None)
+                return None if imagem is None else {entrada: preprocessar_calibracao(imagem)}
+        
+        # Imagens locais em três escalas para cobrir melhor a faixa das ativações
+        imagens = []
+        for imagem in imagens_locais():
+            for escala in (1.0, 0.75, 0.5):
+                h, w = imagem.shape[:2]
+                reduzida = Image.fromarray(imagem).resize((max(1, int(w * escala)), max(1, int(h * escala))))
+                imagens.append(np.asarray(reduzida))
+        
+        # A cabeça de detecção (DFL/concat das caixas) é sensível à quantização: mantê-la em FP32
+        cabeca = [n.name for n in modelo_onnx.graph.node if 'model.22' in n.name or 'dfl' in n.name.lower()]
+        quantize_static(
+            onnx_fp32, temporario, LeitorCalibracao(imagens),
+            quant_format=QuantFormat.QDQ,
+            op_types_to_quantize=['Conv'],
+            per_channel=True,
+            activation_type=QuantType.QUInt8,
+            weight_type=QuantType.QInt8,
+            nodes_to_exclude=cabeca
+        )
+    
+    # Preservar os metadados (classes, stride, imgsz) que o ultralytics lê do ONNX
+    quantizado = onnx.load(temporario)
+    del quantizado.metadata_props[:]
+    quantizado.metadata_props.extend(modelo_onnx.metadata_props)
+    onnx.save(quantizado, temporario)
+    os.replace(temporario, artefato)
+    print(f"YOLOv8{size} quantizado: {artefato}")
+    return artefato
+
+# Backend/variante que atende uma configuração (as variantes INT8 têm precedência)
+def variante_modelo(cfg):
+    if cfg.get('precision', 'fp32') in QUANTIZACOES:
+        return cfg['precision']
+    return cfg['backend']
+
+# Memória ocupada pelos pesos e buffers de um modelo carregado
+def memoria_modelo(modelo, artefato=None):
+    if isinstance(modelo, ModeloRemoto) and not modelo.carregado_localmente:
+        # Só a cópia de cada processo de inferência: o tamanho do artefato é a estimativa
+        artefato = modelo.artefato
+    if artefato:
+        # Modelos exportados vivem no runtime externo: usar o tamanho do artefato como estimativa
+        if os.path.isdir(artefato):
+            return sum(os.path.getsize(os.path.join(raiz, nome))
+                       for raiz, _, nomes in os.walk(artefato) for nome in nomes)
+        return os.path.getsize(artefato)
+    try:
+        tensores = list(modelo.model.parameters()) + list(modelo.model.buffers())
+        return sum(t.numel() * t.element_size() for t in tensores)
+    except Exception:
+        return 0
+
+class ModelPool:
+    """Mantém vários tamanhos de YOLOv8 carregados, limitados por um orçamento de RAM (LRU).
+    
+    Pedidos seguram o modelo com `emprestimo`: um modelo despejado enquanto há pedidos
+    usando-o fica drenando. A referência de cada pedido já mantém o objeto vivo; o que o
+    contador decide é quando liberar de fato (ver `_liberar`): só depois do último pedido
+    os processos de inferência descartam suas cópias e a memória é recolhida.
+    """
+
+    def __init__(self, orcamento_bytes):
+        self.orcamento_bytes = orcamento_bytes
+        self._modelos = OrderedDict()  # (tamanho, backend) -> {'modelo', 'bytes', 'carregado_em', 'em_uso'}
+        self._drenando = {}  # (tamanho, backend) -> entrada despejada com pedidos em andamento
+        self._carregando = {}  # (tamanho, backend) -> asyncio.Task (carregamentos simultâneos são unificados)
+        self.falhas_backend = {}  # (tamanho, backend) -> erro da exportação (usa torch no lugar)
+        self.carregamentos = 0
+        self.evictions = 0
+
+    def carregado(self, size, backend=None):
+        chave = self._resolver(size, backend)
+        return chave in self._modelos or chave in self._drenando
+
+    @property
+    def bytes_usados(self):
+        return sum(entrada['bytes'] for entrada in self._modelos.values())
+
+    @property
+    def bytes_drenando(self):
+        return sum(entrada['bytes'] for entrada in self._drenando.values())
+
+    @property
+    def em_uso(self):
+        return sum(entrada['em_uso'] for entrada in list(self._modelos.values()) + list(self._drenando.values()))
+
+    def residentes(self):
+        """Lista (tamanho, backend, bytes) do menos para o mais recentemente usado"""
+        return [(size, backend, entrada['bytes']) for (size, backend), entrada in self._modelos.items()]
+
+    def _resolver(self, size, backend):
+        chave = (size, backend or variante_modelo(CONFIG))
+        # Backends cuja exportação falhou caem para torch
+        if chave in self.falhas_backend:
+            return (size, 'torch')
+        return chave
+
+    async def obter(self, size, ctx=None, backend=None):
+        """Retorna o modelo do tamanho pedido, carregando-o se necessário"""
+        chave = self._resolver(size, backend)
+        entrada = self._modelos.get(chave)
+        if entrada is not None:
+            self._modelos.move_to_end(chave)
+            return entrada['modelo']
+        
+        # Despejado mas ainda drenando: volta a ser residente em vez de carregar de novo
+        entrada = self._drenando.pop(chave, None)
+        if entrada is not None:
+            self._modelos[chave] = entrada
+            self._ajustar_orcamento(chave)
+            return entrada['modelo']
+        
+        task = self._carregando.get(chave)
+        if task is None:
+            task = asyncio.create_task(self._carregar(chave, ctx))
+            self._carregando[chave] = task
+            task.add_done_callback(lambda _: self._carregando.pop(chave, None))
+        return await asyncio.shield(task)
+
+    async def _carregar(self, chave, ctx):
+        size, backend = chave
+        if backend == 'torch':
+            modelo = await load_yolo_model(size, ctx)
+            modelo.backend_nome = 'torch'
+            self._registrar(chave, modelo)
+            return modelo
+        
+        # Backends otimizados partem do modelo torch (baixado/carregado se preciso)
+        modelo_torch = await self.obter(size, ctx, 'torch')
+        try:
+            if backend in QUANTIZACOES:
+                if not backend_disponivel('onnx'):
+                    raise RuntimeError("runtime onnxruntime não instalado")
+                if ctx:
+                    await ctx.send(f"⚙️ Preparando YOLOv8{size} quantizado ({backend})... isso acontece só uma vez.")
+                artefato = await asyncio.to_thread(quantizar_modelo, modelo_torch, size, backend)
+            else:
+                if not backend_disponivel(backend):
+                    raise RuntimeError(f"runtime {BACKENDS[backend]['runtime']} não instalado")
+                artefato = await asyncio.to_thread(exportar_modelo, modelo_torch, size, backend)
+            if PROCESSOS_INFERENCIA is not None:
+                modelo = ModeloRemoto(artefato, backend)
+            else:
+                modelo = await asyncio.to_thread(carregar_exportado, artefato, backend)
+        except Exception as e:
+            print(f"Erro ao usar o backend {backend} para YOLOv8{size}: {str(e)}. Usando torch.")
+            self.falhas_backend[chave] = str(e)
+            if ctx:
+                await ctx.send(f"⚠️ Não foi possível usar o backend {backend} ({str(e)}). Usando torch.")
+            return modelo_torch
+        self._registrar(chave, modelo, artefato)
+        return modelo
+
+    @contextmanager
+    def emprestimo(self, modelo):
+        """Marca o modelo como em uso durante o bloco (pedidos em andamento terminam nele mesmo após uma troca)"""
+        entrada = next((e for e in list(self._modelos.values()) + list(self._drenando.values()) if e['modelo'] is modelo), None)
+        if entrada is None:
+            # Backend que caiu para torch fora do pool: a referência do pedido mantém o modelo vivo
+            yield modelo
+            return
+        entrada['em_uso'] += 1
+        try:
+            yield modelo
+        finally:
+            entrada['em_uso'] -= 1
+            chave = entrada['chave']
+            if entrada['em_uso'] == 0 and self._drenando.get(chave) is entrada:
+                del self._drenando[chave]
+                print(f"Modelo YOLOv8{chave[0]} ({chave[1]}) drenado e descarregado, liberando {entrada['bytes'] / (1024**2):.0f}MB")
+                self._liberar(entrada)
+
+    def _liberar(self, entrada):
+        """Solta a última referência do pool e libera as cópias nos processos de inferência, fora do event loop"""
+        modelo = entrada.pop('modelo')
+        def liberar():
+            if processos_ativos(modelo):
+                PROCESSOS_INFERENCIA.descarregar(modelo)
+            gc.collect()
+        try:
+            asyncio.get_running_loop().create_task(asyncio.to_thread(liberar))
+        except RuntimeError:
+            liberar()
+
+    def usar_processos(self):
+        """Processos de inferência criados depois do carregamento (perfil de runtime): as cópias
+        locais ociosas viram referências ao artefato e são liberadas deste processo"""
+        for entrada in self._modelos.values():
+            modelo = entrada['modelo']
+            if isinstance(modelo, ModeloRemoto) or not hasattr(modelo, 'artefato') or entrada['em_uso']:
+                continue
+            entrada['modelo'] = ModeloRemoto(modelo.artefato, getattr(modelo, 'backend_nome', 'torch'))
+            entrada['bytes'] = memoria_modelo(entrada['modelo'])
+
+    def _registrar(self, chave, modelo, artefato=None):
+        self._modelos[chave] = {'modelo': modelo, 'bytes': memoria_modelo(modelo, artefato), 'carregado_em': time.time(),
+                                'em_uso': 0, 'chave': chave}
+        self.carregamentos += 1
+        self._ajustar_orcamento(chave)
+
+    def _ajustar_orcamento(self, chave):
+        # Despejar os modelos menos usados até caber no orçamento (o recém-carregado sempre fica),
+        # preferindo os ociosos; os que têm pedidos em andamento passam a drenar
+        while self.bytes_usados > self.orcamento_bytes and len(self._modelos) > 1:
+            antiga = next((c for c, e in self._modelos.items() if not e['em_uso'] and c != chave), next(iter(self._modelos)))
+            entrada = self._modelos.pop(antiga)
+            self.evictions += 1
+            if entrada['em_uso']:
+                self._drenando[antiga] = entrada
+                print(f"Modelo YOLOv8{antiga[0]} ({antiga[1]}) despejado; será descarregado após {entrada['em_uso']} pedido(s) em andamento")
+            else:
+                print(f"Modelo YOLOv8{antiga[0]} ({antiga[1]}) descarregado para liberar {entrada['bytes'] / (1024**2):.0f}MB")
+                self._liberar(entrada)
+        if self.bytes_usados > self.orcamento_bytes:
+            print(f"Aviso: YOLOv8{chave[0]} sozinho excede o orçamento de {self.orcamento_bytes / (1024**2):.0f}MB")
+
+MODEL_POOL = ModelPool(int(MODEL_RAM_BUDGET_MB * 1024 * 1024))
+
+# Relatório de latência por backend medido na inicialização, antes de aceitar pedidos (opcional:
+# exporta cada backend instalado para o disco e atrasa o ponto de pronto; ative com BACKEND_REPORT=1)
+BACKEND_REPORT = os.getenv('BACKEND_REPORT', '0').lower() in ('1', 'true', 'sim', 'yes')
+BACKEND_LATENCIA = {}  # backend -> latência mediana (ms) ou mensagem de erro
+
+# Latência mediana de uma inferência sobre uma imagem sintética (trava só o modelo medido)
+def medir_latencia(modelo, repeticoes=5):
+    imagem = np.random.default_rng(0).integers(0, 256, size=(480, 640, 3), dtype=np.uint8)
+    with trava_modelo(modelo):
+        modelo(imagem, verbose=False)  # aquecimento
+        tempos = []
+        for _ in range(repeticoes):
+            inicio = time.perf_counter()
+            modelo(imagem, verbose=False)
+            tempos.append(time.perf_counter() - inicio)
+    return sorted(tempos)[len(tempos) // 2] * 1000
+
+async def relatorio_backends(size):
+    print(f"Medindo a latência de cada backend para YOLOv8{size}...")
+    modelo_torch = await MODEL_POOL.obter(size, backend='torch')
+    for backend in BACKENDS:
+        if not backend_disponivel(backend):
+            BACKEND_LATENCIA[backend] = 'runtime não instalado'
+            continue
+        try:
+            if backend == 'torch':
+                modelo = modelo_torch
+            else:
+                artefato = await asyncio.to_thread(exportar_modelo, modelo_torch, size, backend)
+                modelo = await asyncio.to_thread(carregar_exportado, artefato, backend)
+            BACKEND_LATENCIA[backend] = await asyncio.to_thread(medir_latencia, modelo)
+        except Exception as e:
+            BACKEND_LATENCIA[backend] = f"erro: {str(e)}"
+    
+    print(f"Latência por backend (YOLOv8{size}, 640x480, CPU):")
+    for backend, latencia in BACKEND_LATENCIA.items():
+        print(f"- {backend}: {f'{latencia:.1f}ms' if isinstance(latencia, float) else latencia}")
+
+# Tamanho de modelo escolhido por cada servidor (guild_id -> tamanho)
+GUILD_MODEL_SIZE = {}
+
+# Precisão escolhida por cada servidor junto com o tamanho (guild_id -> fp32/int8...)
+GUILD_PRECISAO = {}
+
+# Precisão que atende o contexto (servidor ou padrão global)
+def precisao_modelo(ctx):
+    if ctx.guild is not None and ctx.guild.id in GUILD_PRECISAO:
+        return GUILD_PRECISAO[ctx.guild.id]
+    return CONFIG['precision']
+
+# Tamanho de modelo que atende o contexto (servidor ou padrão global)
+def tamanho_modelo(ctx):
+    if ctx.guild is not None and ctx.guild.id in GUILD_MODEL_SIZE:
+        return GUILD_MODEL_SIZE[ctx.guild.id]
+    return CONFIG['model_size']
+
+# Define o tamanho (e opcionalmente a precisão) do modelo para o servidor do contexto (ou o padrão global em DMs)
+def definir_tamanho_modelo(ctx, tamanho, precisao=None):
+    if ctx.guild is not None:
+        GUILD_MODEL_SIZE[ctx.guild.id] = tamanho
+        if precisao:
+            GUILD_PRECISAO[ctx.guild.id] = precisao
+    else:
+        CONFIG['model_size'] = tamanho
+        if precisao:
+            CONFIG['precision'] = precisao
+
+# Modo adaptativo: desce x→l→m→s→n quando o p95 da inferência estoura o SLO (ou a fila enche)
+# e volta a subir quando há folga. O tamanho configurado de cada servidor é o teto.
+ADAPTIVE_MIN_AMOSTRAS = int(os.getenv('ADAPTIVE_MIN_AMOSTRAS', '10'))
+ADAPTIVE_COOLDOWN_S = float(os.getenv('ADAPTIVE_COOLDOWN_S', '30'))
+ADAPTIVE_FOLGA = float(os.getenv('ADAPTIVE_FOLGA', '0.5'))  # sobe quando p95 < SLO * folga
+
+class ControladorAdaptativo:
+    """Degrau atual de cada combinação (tamanho configurado, variante).
+
+    Cada combinação tem a própria janela de latências e a própria redução: latências de
+    um servidor no x não mexem no tamanho de quem configurou n, e cada redução é sempre
+    contada a partir do tamanho configurado em que foi medida.
+    """
+
+    def __init__(self):
+        self._estados = {}  # (tamanho configurado, variante) -> {'reducao', 'latencias', 'ultima_mudanca', 'mudando'}
+        self.mudancas = 0
+
+    def _estado(self, base, variante):
+        chave = (base, variante or variante_modelo(CONFIG))
+        estado = self._estados.get(chave)
+        if estado is None:
+            estado = self._estados[chave] = {
+                'reducao': 0,  # degraus abaixo do tamanho configurado
+                'latencias': deque(maxlen=100),
+                'ultima_mudanca': 0.0,
+                'mudando': None  # troca de degrau aguardando o modelo novo
+            }
+        return estado
+
+    def reducao(self, base, variante=None):
+        if not CONFIG['adaptive_size']:
+            return 0
+        return self._estado(base, variante)['reducao']
+
+    def tamanho(self, base, variante=None):
+        return TAMANHOS_VALIDOS[max(0, TAMANHOS_VALIDOS.index(base) - self.reducao(base, variante))]
+
+    def p95(self, base, variante=None):
+        latencias = sorted(self._estado(base, variante)['latencias'])
+        if not latencias:
+            return None
+        return latencias[min(len(latencias) - 1, int(len(latencias) * 0.95))]
+
+    def registrar(self, segundos, base, variante=None):
+        """Registra a latência de uma inferência e, se preciso, muda de degrau"""
+        if not CONFIG['adaptive_size']:
+            return
+        estado = self._estado(base, variante)
+        estado['latencias'].append(segundos)
+        agora = time.monotonic()
+        if (len(estado['latencias']) < ADAPTIVE_MIN_AMOSTRAS or agora - estado['ultima_mudanca'] < ADAPTIVE_COOLDOWN_S
+                or estado['mudando'] is not None):
+            return
+        
+        p95 = self.p95(base, variante)
+        anterior = self.tamanho(base, variante)
+        slo = CONFIG['latency_slo_ms'] / 1000
+        fila = INFERENCE_EXECUTOR.profundidade
+        if (p95 > slo or fila >= INFERENCE_EXECUTOR.max_fila // 2) and estado['reducao'] < TAMANHOS_VALIDOS.index(base):
+            reducao = estado['reducao'] + 1
+            motivo = f"p95 {p95 * 1000:.0f}ms > SLO {CONFIG['latency_slo_ms']}ms" if p95 > slo else f"fila com {fila} tarefas"
+        elif p95 < slo * ADAPTIVE_FOLGA and fila == 0 and estado['reducao'] > 0:
+            reducao = estado['reducao'] - 1
+            motivo = f"p95 {p95 * 1000:.0f}ms com folga"
+        else:
+            return
+        
+        # Nova janela: as latências antigas são de outro tamanho de modelo
+        estado['latencias'].clear()
+        estado['ultima_mudanca'] = agora
+        novo = TAMANHOS_VALIDOS[max(0, TAMANHOS_VALIDOS.index(base) - reducao)]
+        # O degrau só muda quando o modelo do novo degrau estiver carregado e aquecido; até lá, segue o atual
+        estado['mudando'] = asyncio.get_running_loop().create_task(
+            self._mudar(estado, reducao, anterior, novo, variante or variante_modelo(CONFIG), motivo)
+        )
+    
+    async def _mudar(self, estado, reducao, anterior, novo, variante, motivo):
+        try:
+            # Aquecer a variante (precisão/backend) que vai atender, não só a torch
+            aquecido = MODEL_POOL.carregado(novo, variante)
+            modelo = await MODEL_POOL.obter(novo, None, variante)
+            if not aquecido:
+                with MODEL_POOL.emprestimo(modelo):
+                    await preparar_em_segundo_plano(modelo)
+        except Exception as e:
+            print(f"Modo adaptativo: falha ao preparar YOLOv8{novo} ({variante}) ({str(e)}); mantendo YOLOv8{anterior}")
+            return
+        finally:
+            estado['mudando'] = None
+        estado['reducao'] = reducao
+        self.mudancas += 1
+        estado['latencias'].clear()
+        estado['ultima_mudanca'] = time.monotonic()
+        print(f"Modo adaptativo: YOLOv8{anterior} → YOLOv8{novo} ({variante}; {motivo})")
+
+ADAPTATIVO = ControladorAdaptativo()
+
+def titulo_modelo(cfg):
+    titulo = f"YOLOv8{cfg['model_size']}"
+    if cfg.get('tamanho_configurado', cfg['model_size']) != cfg['model_size']:
+        titulo += f" (adaptativo; configurado: YOLOv8{cfg['tamanho_configurado']})"
+    return titulo
+
+def gauges_metricas():
+    gauges = {
+        'fila_inferencia': INFERENCE_EXECUTOR.profundidade,
+        'inferencias_em_execucao': INFERENCE_EXECUTOR.executando,
+        'cache_entradas': len(DETECTION_CACHE),
+        'modelos_carregados': len(MODEL_POOL.residentes()),
+        'modelos_bytes': MODEL_POOL.bytes_usados,
+        'modelos_drenando_bytes': MODEL_POOL.bytes_drenando
+    }
+    if PROCESSOS_INFERENCIA is not None and PROCESSOS_INFERENCIA.ativo:
+        for p in PROCESSOS_INFERENCIA.processos:
+            gauges[f'processo_{p.indice}_vivo'] = int(p.vivo)
+            gauges[f'processo_{p.indice}_lotes'] = p.pedidos
+            gauges[f'processo_{p.indice}_imagens'] = p.imagens
+            gauges[f'processo_{p.indice}_erros'] = p.erros
+            gauges[f'processo_{p.indice}_reinicios'] = p.reinicios
+    return gauges
+
+METRICS_SERVER = None
+
+async def iniciar_servidor_metricas():
+    """Endpoint HTTP local no formato de exposição do Prometheus (GET /metrics)"""
+    global METRICS_SERVER
+    if METRICS_SERVER is not None or not METRICS_PORT or not METRICAS.habilitado:
+        return
+    
+    async def handler(request):
+        return web.Response(text=METRICAS.formato_prometheus(gauges_metricas()),
+                            content_type='text/plain', charset='utf-8')
+    
+    app = web.Application()
+    app.router.add_get('/metrics', handler)
+    METRICS_SERVER = web.AppRunner(app, access_log=None)
+    await METRICS_SERVER.setup()
+    await web.TCPSite(METRICS_SERVER, METRICS_HOST, METRICS_PORT).start()
+    print(f"Métricas disponíveis em http://{METRICS_HOST}:{METRICS_PORT}/metrics")
+
+# Inferências de aquecimento na inicialização
+WARMUP_ITERACOES = int(os.getenv('WARMUP_ITERACOES', '3'))
+
+# Estado da inicialização: o detect só é aceito depois que o modelo padrão está carregado e aquecido
+INICIALIZACAO = {
+    'pronto': False,
+    'etapa': 'iniciando',
+    'erro': None,
+    'tempo_modelo': None,
+    'tempo_aquecimento': None,
+    'tempo_ate_pronto': None
+}
+
+def lotes_aquecimento(modelo, iteracoes=WARMUP_ITERACOES):
+    """Lotes de imagens sintéticas para que o primeiro pedido real não pague o aquecimento do runtime"""
+    rng = np.random.default_rng(0)
+    formatos = [(480, 640), (640, 480), (640, 640)]  # paisagem, retrato e quadrada geram letterboxes diferentes
+    imagem = None
+    for i in range(iteracoes):
+        altura, largura = formatos[i % len(formatos)]
+        imagem = rng.integers(0, 256, size=(altura, largura, 3), dtype=np.uint8)
+        yield [imagem]
+    # Um lote de duas imagens aquece também o caminho do micro-batching
+    if imagem is not None and getattr(modelo, 'backend_nome', 'torch') not in BACKENDS_SEM_LOTE:
+        yield [imagem, imagem]
+
+def aquecer_modelo(modelo, iteracoes=WARMUP_ITERACOES):
+    for lote in lotes_aquecimento(modelo, iteracoes):
+        inferir_lote(modelo, lote, CONFIG['confidence_threshold'])
+
+def processos_ativos(modelo):
+    return PROCESSOS_INFERENCIA is not None and PROCESSOS_INFERENCIA.ativo and hasattr(modelo, 'artefato')
+
+def preparar_modelo(modelo):
+    """Carrega e aquece o modelo onde a inferência roda: nos processos de inferência ou neste processo"""
+    if processos_ativos(modelo):
+        PROCESSOS_INFERENCIA.preparar(modelo)
+    else:
+        aquecer_modelo(modelo)
+
+async def preparar_em_segundo_plano(modelo):
+    """Como preparar_modelo, para trocas com o bot atendendo: cada inferência de aquecimento é uma
+    tarefa de prioridade mínima no executor, que só roda quando nenhum pedido está aguardando"""
+    token = _CHAVE_PRIORIDADE.set(CHAVE_SEGUNDO_PLANO)
+    try:
+        if processos_ativos(modelo):
+            await INFERENCE_EXECUTOR.executar(PROCESSOS_INFERENCIA.preparar, modelo)
+            return
+        for lote in lotes_aquecimento(modelo):
+            await INFERENCE_EXECUTOR.executar(inferir_lote, modelo, lote, CONFIG['confidence_threshold'])
+    finally:
+        _CHAVE_PRIORIDADE.reset(token)
+
+# Perfil de runtime da CPU: threads intra/inter-op do torch, número de processos de inferência e
+# afinidade de núcleos, medidos uma vez por máquina e modelo e salvos para os próximos reinícios
+RUNTIME_PROFILE = os.getenv('RUNTIME_PROFILE', 'perfil_runtime.json')  # vazio: não lê nem salva perfis
+AUTOTUNE = os.getenv('AUTOTUNE', 'false').lower()  # true: ajusta se não houver perfil; refazer: sempre ajusta
+CPU_AFFINITY = os.getenv('CPU_AFFINITY', 'false').lower() in ['true', '1', 'sim', 'yes']
+CPU_RESERVED_CORES = int(os.getenv('CPU_RESERVED_CORES', max(1, (os.cpu_count() or 1) // 8)))  # gateway, downloads e PIL
+AUTOTUNE_ITERACOES = int(os.getenv('AUTOTUNE_ITERACOES', '12'))  # inferências medidas por processo em cada candidato
+AUTOTUNE_INTEROP = [2, 4]  # testados só na melhor combinação de processos x threads
+
+# Perfil aplicado nesta execução (para o !status)
+PERFIL_RUNTIME = None
+
+def chave_perfil_runtime(modelo):
+    import torch
+    import platform
+    return (f"{os.cpu_count()}cpu-{platform.machine()}-torch{torch.__version__}-"
+            f"{os.path.basename(modelo.artefato)}-{getattr(modelo, 'backend_nome', 'torch')}")
+
+def ler_perfis_runtime():
+    if not RUNTIME_PROFILE or not os.path.exists(RUNTIME_PROFILE):
+        return {}
+    try:
+        with open(RUNTIME_PROFILE, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError) as e:
+        print(f"Perfil de runtime ilegível ({RUNTIME_PROFILE}): {str(e)}")
+        return {}
+
+def salvar_perfis_runtime(perfis):
+    if not RUNTIME_PROFILE:
+        return
+    try:
+        with open(RUNTIME_PROFILE + '.tmp', 'w', encoding='utf-8') as f:
+            json.dump(perfis, f, indent=2, ensure_ascii=False)
+        os.replace(RUNTIME_PROFILE + '.tmp', RUNTIME_PROFILE)
+    except OSError as e:
+        print(f"Erro ao salvar o perfil de runtime: {str(e)}")
+
+def nucleos_processos(processos, threads, afinidade):
+    """Núcleos disjuntos para cada processo, deixando os primeiros para o processo principal"""
+    if not afinidade or not hasattr(os, 'sched_getaffinity'):
+        return None
+    disponiveis = sorted(os.sched_getaffinity(0))
+    reservados = min(CPU_RESERVED_CORES, len(disponiveis) - 1)
+    livres = disponiveis[reservados:]
+    if processos * threads > len(livres):
+        return None
+    return [livres[i * threads:(i + 1) * threads] for i in range(processos)]
+
+def candidatos_runtime(cpus, afinidade):
+    """Combinações (processos, threads por processo) que cabem nos núcleos disponíveis.
+
+    1 processo significa inferência no próprio bot (sem IPC); com afinidade, os núcleos
+    reservados ao processo principal ficam de fora da conta.
+    """
+    disponiveis = max(1, cpus - (CPU_RESERVED_CORES if afinidade else 0))
+    candidatos = []
+    processos = 1
+    while processos <= disponiveis:
+        threads = disponiveis // processos
+        candidatos.append((processos, threads))
+        # Metade das threads: menos disputa de memória por processo
+        if processos == 1 and threads >= 4:
+            candidatos.append((processos, threads // 2))
+        processos *= 2
+    return candidatos
+
+def _medir_runtime(artefato, backend, threads, interop, nucleos, iteracoes, barreira, resultados):
+    """Processo do ajuste: aplica a configuração, carrega o modelo e mede a inferência"""
+    try:
+        configurar_threads(threads, interop, nucleos)
+        modelo = construir_yolo(artefato) if backend == 'torch' else carregar_exportado(artefato, backend)
+        aquecer_modelo(modelo, iteracoes=2)
+        imagem = np.random.default_rng(1).integers(0, 256, size=(480, 640, 3), dtype=np.uint8)
+    except Exception as e:
+        barreira.abort()
+        resultados.put(('erro', f"{type(e).__name__}: {str(e)}"))
+        return
+    # Todos os processos do candidato começam juntos, como sob carga real
+    barreira.wait()
+    latencias = []
+    inicio = time.monotonic()
+    for _ in range(iteracoes):
+        t = time.perf_counter()
+        inferir_lote(modelo, [imagem], CONFIG['confidence_threshold'])
+        latencias.append(time.perf_counter() - t)
+    resultados.put(('ok', inicio, time.monotonic(), latencias))
+
+def medir_candidato(modelo, processos, threads, interop, afinidade):
+    contexto = multiprocessing.get_context('spawn')
+    nucleos = nucleos_processos(processos, threads, afinidade)
+    barreira = contexto.Barrier(processos + 1)
+    resultados = contexto.Queue()
+    filhos = [
+        contexto.Process(
+            target=_medir_runtime, daemon=True, name=f'yolo-autotune-{i}',
+            args=(modelo.artefato, getattr(modelo, 'backend_nome', 'torch'), threads, interop,
+                  nucleos[i] if nucleos else None, AUTOTUNE_ITERACOES, barreira, resultados)
+        )
+        for i in range(processos)
+    ]
+    for filho in filhos:
+        filho.start()
+    try:
+        barreira.wait(timeout=MODEL_LOAD_TIMEOUT_S)
+        medidas = [resultados.get(timeout=INFERENCE_TIMEOUT_S * AUTOTUNE_ITERACOES) for _ in filhos]
+    except Exception:
+        erros = []
+        while not resultados.empty():
+            erros.append(resultados.get()[1])
+        raise RuntimeError(erros[0] if erros else "processo de medição não respondeu")
+    finally:
+        for filho in filhos:
+            filho.join(timeout=10)
+            if filho.is_alive():
+                filho.kill()
+    
+    latencias = np.concatenate([m[3] for m in medidas]) * 1000
+    duracao = max(m[2] for m in medidas) - min(m[1] for m in medidas)
+    return {
+        'processos': processos,
+        'threads': threads,
+        'interop': interop,
+        'afinidade': nucleos is not None,
+        'imagens_por_s': round(len(latencias) / duracao, 2),
+        'p50_ms': round(float(np.percentile(latencias, 50)), 1),
+        'p95_ms': round(float(np.percentile(latencias, 95)), 1)
+    }
+
+def escolher_candidato(medidas):
+    """Maior vazão dentro do SLO de latência; empates (5%) ficam com a menor latência"""
+    dentro_slo = [m for m in medidas if m['p95_ms'] <= CONFIG['latency_slo_ms']] or medidas
+    melhor_vazao = max(m['imagens_por_s'] for m in dentro_slo)
+    return min((m for m in dentro_slo if m['imagens_por_s'] >= melhor_vazao * 0.95), key=lambda m: m['p50_ms'])
+
+def ajustar_runtime(modelo):
+    """Mede cada candidato em processos novos (as threads do torch só valem antes do primeiro uso)"""
+    cpus = len(os.sched_getaffinity(0)) if hasattr(os, 'sched_getaffinity') else (os.cpu_count() or 1)
+    print(f"Ajustando o runtime para {os.path.basename(modelo.artefato)} em {cpus} núcleo(s)...")
+    inicio = time.time()
+    
+    def medir(processos, threads, interop):
+        try:
+            medida = medir_candidato(modelo, processos, threads, interop, CPU_AFFINITY)
+        except Exception as e:
+            print(f"- {processos} processo(s) x {threads} thread(s), interop {interop}: falhou ({str(e)})")
+            return None
+        print(f"- {processos} processo(s) x {threads} thread(s), interop {interop}: {medida['imagens_por_s']:.1f} img/s, "
+              f"p50 {medida['p50_ms']:.0f}ms, p95 {medida['p95_ms']:.0f}ms")
+        return medida
+    
+    medidas = [m for m in (medir(p, t, 1) for p, t in candidatos_runtime(cpus, CPU_AFFINITY)) if m]
+    if not medidas:
+        raise RuntimeError("nenhuma configuração pôde ser medida")
+    melhor = escolher_candidato(medidas)
+    # Threads inter-op só ajudam modelos com ramos paralelos: testadas só na melhor combinação
+    medidas += [m for m in (medir(melhor['processos'], melhor['threads'], i) for i in AUTOTUNE_INTEROP if i <= melhor['threads']) if m]
+    melhor = escolher_candidato(medidas)
+    
+    perfil = dict(melhor, data=datetime.now().strftime("%Y-%m-%d %H:%M:%S"), duracao_ajuste_s=round(time.time() - inicio, 1),
+                  candidatos=medidas)
+    print(f"Runtime escolhido: {melhor['processos']} processo(s) x {melhor['threads']} thread(s), interop {melhor['interop']} "
+          f"({melhor['imagens_por_s']:.1f} img/s) em {perfil['duracao_ajuste_s']:.0f}s")
+    return perfil
+
+def aplicar_perfil_runtime(perfil):
+    global PROCESSOS_INFERENCIA
+    if perfil['processos'] <= 1:
+        # Inferência no próprio bot, com todas as threads do perfil
+        configurar_threads(perfil['threads'], perfil['interop'])
+        return
+    nucleos = nucleos_processos(perfil['processos'], perfil['threads'], perfil['afinidade'])
+    if PROCESSOS_INFERENCIA is None or not PROCESSOS_INFERENCIA.ativo:
+        PROCESSOS_INFERENCIA = PoolProcessos(perfil['processos'], perfil['threads'], nucleos, perfil['interop'])
+    principal = nucleos_principal(nucleos)
+    if principal:
+        # O processo principal (gateway, downloads, PIL) fica com os núcleos que sobraram; os
+        # processos filhos definem a própria afinidade e as threads do torch ao iniciar. Aqui só
+        # a afinidade: configurar o torch importaria torch no processo que não faz inferência
+        fixar_afinidade(principal)
+    elif nucleos:
+        print("Nenhum núcleo sobrou para o processo principal (CPU_RESERVED_CORES=0); afinidade dele mantida")
+
+def nucleos_principal(nucleos):
+    """Núcleos que sobram para o processo principal depois dos processos de inferência"""
+    if not nucleos or not hasattr(os, 'sched_getaffinity'):
+        return []
+    ocupados = {n for lista in nucleos for n in lista}
+    return sorted(set(os.sched_getaffinity(0)) - ocupados)
+
+def configurar_runtime(modelo):
+    """Aplica o perfil salvo para esta máquina e modelo ou, com AUTOTUNE, mede e salva um novo"""
+    global PERFIL_RUNTIME
+    if 'INFERENCE_PROCESSES' in os.environ or 'INFERENCE_PROCESS_THREADS' in os.environ:
+        print("Processos/threads de inferência definidos pelo ambiente; perfil de runtime ignorado")
+        return
+    chave = chave_perfil_runtime(modelo)
+    perfis = ler_perfis_runtime()
+    perfil = None if AUTOTUNE == 'refazer' else perfis.get(chave)
+    origem = 'salvo'
+    if perfil is None:
+        if AUTOTUNE not in ['true', '1', 'sim', 'yes', 'refazer']:
+            return
+        perfil = ajustar_runtime(modelo)
+        perfis[chave] = perfil
+        salvar_perfis_runtime(perfis)
+        origem = 'ajustado agora'
+    else:
+        print(f"Perfil de runtime carregado de {RUNTIME_PROFILE} ({perfil['processos']} processo(s) x "
+              f"{perfil['threads']} thread(s), interop {perfil['interop']}, medido em {perfil['data']})")
+    aplicar_perfil_runtime(perfil)
+    PERFIL_RUNTIME = dict(perfil, chave=chave, origem=origem)
+
+async def inicializar_modelo():
+    """Carrega e aquece o modelo padrão; roda em paralelo com a conexão ao gateway"""
+    inicio = time.time()
+    try:
+        INICIALIZACAO['etapa'] = 'carregando o modelo'
+        modelo = await MODEL_POOL.obter(CONFIG['model_size'])
+        INICIALIZACAO['tempo_modelo'] = time.time() - inicio
+        print(f"Modelo inicial YOLOv8{CONFIG['model_size']} carregado com sucesso!")
+        
+        # Antes do aquecimento: as threads inter-op do torch só podem ser definidas antes do primeiro uso
+        if hasattr(modelo, 'artefato'):
+            INICIALIZACAO['etapa'] = 'ajustando o runtime' if AUTOTUNE != 'false' else 'configurando o runtime'
+            try:
+                await asyncio.to_thread(configurar_runtime, modelo)
+            except Exception as e:
+                print(f"Erro no ajuste do runtime (mantendo a configuração padrão): {str(e)}")
+        
+        INICIALIZACAO['etapa'] = 'aquecendo o modelo'
+        inicio_aquecimento = time.time()
+        if PROCESSOS_INFERENCIA is not None and not PROCESSOS_INFERENCIA.ativo:
+            # Cada processo de inferência carrega e aquece a sua cópia do modelo
+            await asyncio.to_thread(PROCESSOS_INFERENCIA.iniciar)
+            asyncio.create_task(PROCESSOS_INFERENCIA.monitorar())
+            MODEL_POOL.usar_processos()
+            modelo = await MODEL_POOL.obter(CONFIG['model_size'])
+            gc.collect()
+        await asyncio.to_thread(preparar_modelo, modelo)
+        INICIALIZACAO['tempo_aquecimento'] = time.time() - inicio_aquecimento
+        print(f"Modelo aquecido com {WARMUP_ITERACOES} inferência(s) em {INICIALIZACAO['tempo_aquecimento']:.1f}s")
+        
+        # Ainda sem tráfego: as medições não disputam a CPU nem o modelo com pedidos reais
+        if BACKEND_REPORT and not BACKEND_LATENCIA:
+            INICIALIZACAO['etapa'] = 'medindo os backends'
+            try:
+                await relatorio_backends(CONFIG['model_size'])
+            except Exception as e:
+                print(f"Erro no relatório de backends: {str(e)}")
+    except Exception as e:
+        # Os pedidos ainda podem carregar o modelo sob demanda pelo pool
+        print(f"Erro ao carregar modelo inicial: {str(e)}")
+        INICIALIZACAO['erro'] = str(e)
+    
+    INICIALIZACAO['pronto'] = True
+    INICIALIZACAO['etapa'] = 'pronto'
+    INICIALIZACAO['tempo_ate_pronto'] = time.time() - INICIO_PROCESSO
+    print(f"Bot pronto para detecções {INICIALIZACAO['tempo_ate_pronto']:.1f}s após o início do processo")
+
+@bot.event
+async def setup_hook():
+    # Chamado após o login e antes da conexão ao gateway: o modelo carrega enquanto o bot conecta
+    bot.tarefa_inicializacao = asyncio.create_task(inicializar_modelo())
+    await asyncio.to_thread(HISTORICO.iniciar)
+
+# Armazenar hora de início
+@bot.event
+async def on_ready():
+    bot.start_time = time.time()
+    
+    print(f'{bot.user.name} está online!')
+    print(f'ID do Bot: {bot.user.id}')
+    print('------')
+    
+    try:
+        await iniciar_servidor_metricas()
+    except OSError as e:
+        print(f"Erro ao iniciar o endpoint de métricas: {str(e)}")
+    
+    if not INICIALIZACAO['pronto']:
+        print(f"Conectado ao Discord; inicialização do modelo em andamento ({INICIALIZACAO['etapa']})")
+
+@bot.event
+async def on_message(message):
+    # Ignorar mensagens do próprio bot
+    if message.author == bot.user:
+        return
+    
+    # Verificar se a mensagem começa com 'detect' sem o prefixo
+    if message.content.lower().startswith('detect') and message.attachments:
+        print(f"Comando 'detect' sem prefixo detectado de {message.author.name}")
+        ctx = await bot.get_context(message)
+        # 'detect texto' e 'detect blocos' também valem sem o prefixo
+        await detect(ctx, *message.content.split()[1:3])
+    # Verificar se a mensagem é apenas '!detect' sem anexos, mas há anexos na mensagem
+    elif message.content.lower() in ['!detect', 'detect'] and message.attachments:
+        print(f"Comando detect com anexos detectado de {message.author.name}")
+        ctx = await bot.get_context(message)
+        await detect(ctx)
+    else:
+        # Processamento normal de comandos
+        await bot.process_commands(message)
+
+@bot.command()
+async def modelo(ctx, tamanho=None, precisao=None):
+    """Altera o tamanho (e a precisão: fp32/int8) do modelo YOLO deste servidor"""
+    if not tamanho:
+        carregados = ', '.join(f"YOLOv8{size} ({backend})" for size, backend, _ in MODEL_POOL.residentes()) or 'nenhum'
+        await ctx.send(f"**Tamanho atual do modelo:** YOLOv8{tamanho_modelo(ctx)} ({precisao_modelo(ctx)})\n" + 
+                       f"Tamanhos disponíveis: {', '.join(['n (nano)', 's (small)', 'm (medium)', 'l (large)', 'x (xlarge)'])}\n" +
+                       f"Precisões disponíveis: {', '.join(PRECISOES)}\n" +
+                       f"Modelos carregados: {carregados}\n" +
+                       "Use `!modelo <tamanho> [precisão]` para mudar. Exemplo: `!modelo s` ou `!modelo m int8`")
+        return
+    
+    if tamanho not in TAMANHOS_VALIDOS:
+        await ctx.send(f"Tamanho inválido! Use um dos seguintes: {', '.join(TAMANHOS_VALIDOS)}")
+        return
+    
+    if precisao is not None and precisao not in PRECISOES:
+        await ctx.send(f"Precisão inválida! Use uma das seguintes: {', '.join(PRECISOES)}")
+        return
+    
+    if tamanho in ['l', 'x']:
+        await ctx.send(f"⚠️ Aviso: O modelo YOLOv8{tamanho} é muito grande e pode levar vários minutos para baixar. Tem certeza que deseja continuar? Digite `!confirmar modelo {tamanho}{' ' + precisao if precisao else ''}` para confirmar.")
+        return
+    
+    await trocar_modelo(ctx, tamanho, precisao)
+
+# Carrega o modelo pedido e passa a usá-lo neste servidor
+# Última troca de modelo pedida por servidor (None = padrão global): uma troca lenta não sobrescreve uma mais nova
+TROCAS_MODELO = {}
+
+async def trocar_modelo(ctx, tamanho, precisao=None):
+    """Carrega e aquece o novo modelo em segundo plano; os pedidos seguem no modelo atual
+    até a troca, que é só a atribuição do tamanho do servidor (atômica no event loop)"""
+    variante = variante_modelo({'backend': CONFIG['backend'], 'precision': precisao or precisao_modelo(ctx)})
+    chave = ctx.guild.id if ctx.guild is not None else None
+    troca = TROCAS_MODELO[chave] = TROCAS_MODELO.get(chave, 0) + 1
+    if not MODEL_POOL.carregado(tamanho, variante):
+        await ctx.send(f"Carregando modelo YOLOv8{tamanho}... Isso pode levar alguns segundos. "
+                       "As detecções continuam no modelo atual até a troca.")
+    
+    try:
+        modelo = await MODEL_POOL.obter(tamanho, ctx, variante)
+        with MODEL_POOL.emprestimo(modelo):
+            await preparar_em_segundo_plano(modelo)
+    except Exception as e:
+        await ctx.send(f"❌ Erro ao carregar o modelo: {str(e)}")
+        return
+    
+    if TROCAS_MODELO.get(chave) != troca:
+        await ctx.send(f"ℹ️ YOLOv8{tamanho} carregado, mas outra troca de modelo foi pedida depois; mantendo a mais recente.")
+        return
+    definir_tamanho_modelo(ctx, tamanho, precisao)
+    await ctx.send(f"✅ Modelo YOLOv8{tamanho} carregado com sucesso!")
+
+@bot.command()
+async def confirmar(ctx, tipo=None, tamanho=None, precisao=None):
+    """Confirma operações potencialmente demoradas"""
+    if tipo == 'modelo' and tamanho in TAMANHOS_VALIDOS and (precisao is None or precisao in PRECISOES):
+        await ctx.send(f"Confirmado! Carregando modelo YOLOv8{tamanho}... Este processo pode levar vários minutos.")
+        await trocar_modelo(ctx, tamanho, precisao)
+    else:
+        await ctx.send("Comando inválido. Use `!confirmar modelo <tamanho> [precisão]` para confirmar a alteração do modelo.")
+
+# Caixas de duas detecções que coincidem (mesma classe e IoU >= limiar), por casamento guloso
+def concordancia_caixas(ref, outra, limiar_iou=0.5):
+    if len(ref['cls']) == 0 and len(outra['cls']) == 0:
+        return 1.0, 1.0
+    if len(ref['cls']) == 0 or len(outra['cls']) == 0:
+        return 0.0, 0.0
+    a, b = ref['xyxy'], outra['xyxy']
+    x1 = np.maximum(a[:, None, 0], b[None, :, 0])
+    y1 = np.maximum(a[:, None, 1], b[None, :, 1])
+    x2 = np.minimum(a[:, None, 2], b[None, :, 2])
+    y2 = np.minimum(a[:, None, 3], b[None, :, 3])
+    inter = np.clip(x2 - x1, 0, None) * np.clip(y2 - y1, 0, None)
+    area_a = (a[:, 2] - a[:, 0]) * (a[:, 3] - a[:, 1])
+    area_b = (b[:, 2] - b[:, 0]) * (b[:, 3] - b[:, 1])
+    iou = inter / np.maximum(area_a[:, None] + area_b[None, :] - inter, 1e-9)
+    iou[ref['cls'][:, None] != outra['cls'][None, :]] = 0
+    
+    casados = []
+    while iou.size and iou.max() >= limiar_iou:
+        i, j = np.unravel_index(np.argmax(iou), iou.shape)
+        casados.append(iou[i, j])
+        iou[i, :] = 0
+        iou[:, j] = 0
+    # F1 entre os dois conjuntos de caixas e IoU médio dos pares casados
+    f1 = 2 * len(casados) / (len(ref['cls']) + len(outra['cls']))
+    return f1, float(np.mean(casados)) if casados else 0.0
+
+# Mede latência e concordância das caixas entre o modelo FP32 e o INT8 nas imagens locais
+def comparar_quantizacao(modelo_fp32, modelo_int8, conf, repeticoes=3):
+    imagens = imagens_locais()
+    tempos_fp32, tempos_int8, f1s, ious = [], [], [], []
+    for imagem in imagens:
+        deteccoes = []
+        for modelo, tempos in ((modelo_fp32, tempos_fp32), (modelo_int8, tempos_int8)):
+            with trava_modelo(modelo):
+                resultado = modelo(imagem, conf=conf, verbose=False)[0]  # aquecimento
+                for _ in range(repeticoes):
+                    inicio = time.perf_counter()
+                    modelo(imagem, conf=conf, verbose=False)
+                    tempos.append(time.perf_counter() - inicio)
+            deteccoes.append(extrair_deteccoes(resultado))
+        f1, iou = concordancia_caixas(*deteccoes)
+        f1s.append(f1)
+        ious.append(iou)
+    return {
+        'imagens': len(imagens),
+        'fp32_ms': float(np.median(tempos_fp32)) * 1000,
+        'int8_ms': float(np.median(tempos_int8)) * 1000,
+        'concordancia': float(np.mean(f1s)),
+        'iou_medio': float(np.mean(ious))
+    }
+
+@bot.command()
+async def comparar_int8(ctx, tamanho=None, precisao='int8'):
+    """Compara velocidade e detecções do modelo INT8 com o FP32 nas imagens locais"""
+    tamanho = tamanho or tamanho_modelo(ctx)
+    if tamanho not in TAMANHOS_VALIDOS or precisao not in QUANTIZACOES:
+        await ctx.send(f"Uso: `!comparar_int8 [tamanho] [{'|'.join(QUANTIZACOES)}]`")
+        return
+    
+    await ctx.send(f"Comparando YOLOv8{tamanho} FP32 x {precisao}... Isso pode levar alguns minutos.")
+    try:
+        modelo_fp32 = await MODEL_POOL.obter(tamanho, ctx, 'torch')
+        modelo_int8 = await MODEL_POOL.obter(tamanho, ctx, precisao)
+        if modelo_int8 is modelo_fp32:
+            await ctx.send(f"❌ A variante {precisao} não está disponível (veja os avisos acima).")
+            return
+        with MODEL_POOL.emprestimo(modelo_fp32), MODEL_POOL.emprestimo(modelo_int8):
+            r = await asyncio.to_thread(comparar_quantizacao, modelo_fp32, modelo_int8, CONFIG['confidence_threshold'])
+    except Exception as e:
+        await ctx.send(f"❌ Erro na comparação: {str(e)}")
+        return
+    
+    await ctx.send(
+        f"**Comparação YOLOv8{tamanho}: FP32 x {precisao}** ({r['imagens']} imagens, conf {CONFIG['confidence_threshold']})\n"
+        f"- Latência FP32: {r['fp32_ms']:.1f}ms\n"
+        f"- Latência {precisao}: {r['int8_ms']:.1f}ms\n"
+        f"- Aceleração: {r['fp32_ms'] / r['int8_ms']:.2f}x\n"
+        f"- Concordância das caixas (F1, IoU≥0.5, mesma classe): {r['concordancia']:.1%}\n"
+        f"- IoU médio das caixas correspondentes: {r['iou_medio']:.2f}"
+    )
+
+@bot.command()
+async def config(ctx, param=None, valor=None):
+    """Altera configurações do bot de detecção"""
+    global CONFIG
+    
+    if not param:
+        # Mostrar configurações atuais
+        config_msg = "**Configurações Atuais:**\n"
+        for key, value in CONFIG.items():
+            config_msg += f"- **{key}**: {value}\n"
+        config_msg += "\nPara alterar: `!config <parametro> <valor>`"
+        await ctx.send(config_msg)
+        return
+    
+    # Verificar se o parâmetro existe
+    if param not in CONFIG:
+        await ctx.send(f"Parâmetro desconhecido: {param}. Parâmetros disponíveis: {', '.join(CONFIG.keys())}")
+        return
+    
+    if not valor:
+        await ctx.send(f"Valor atual de **{param}**: {CONFIG[param]}")
+        return
+    
+    # Converter o valor para o tipo adequado
+    try:
+        if param == 'confidence_threshold':
+            valor = float(valor)
+            if not (0 <= valor <= 1):
+                await ctx.send("Valor de confiança deve estar entre 0 e 1")
+                return
+        elif param == 'model_size':
+            if valor not in TAMANHOS_VALIDOS:
+                await ctx.send(f"Tamanho inválido! Use um dos seguintes: {', '.join(TAMANHOS_VALIDOS)}")
+                return
+        elif param == 'backend':
+            valor = valor.lower()
+            if valor not in BACKENDS:
+                await ctx.send(f"Backend inválido! Use um dos seguintes: {', '.join(BACKENDS)}")
+                return
+            if not backend_disponivel(valor):
+                await ctx.send(f"⚠️ O runtime de {valor} não está instalado; as detecções continuarão usando torch.")
+        elif param == 'precision':
+            valor = valor.lower()
+            if valor not in PRECISOES:
+                await ctx.send(f"Precisão inválida! Use uma das seguintes: {', '.join(PRECISOES)}")
+                return
+        elif param == 'max_objects':
+            valor = int(valor)
+            if valor < 1:
+                await ctx.send("Número máximo de objetos deve ser pelo menos 1")
+                return
+        elif param in ('color_analysis', 'box_colors', 'adaptive_size', 'tiled'):
+            valor = valor.lower() in ['true', 'yes', 'sim', '1', 'on', 'ativado']
+        elif param == 'color_mode':
+            valor = valor.lower()
+            if valor not in COLOR_MODES:
+                await ctx.send(f"Modo de cores inválido! Use um dos seguintes: {', '.join(COLOR_MODES)}")
+                return
+        elif param == 'batch_window_ms':
+            valor = int(valor)
+            if not (0 <= valor <= 1000):
+                await ctx.send("A janela de agrupamento deve estar entre 0 e 1000 ms")
+                return
+        elif param == 'max_batch_size':
+            valor = int(valor)
+            if valor < 1:
+                await ctx.send("O tamanho máximo do lote deve ser pelo menos 1")
+                return
+        elif param in ('user_rate_per_min', 'guild_rate_per_min'):
+            valor = float(valor)
+            if valor < 0:
+                await ctx.send("O limite por minuto não pode ser negativo (use 0 para desativar)")
+                return
+        elif param == 'latency_slo_ms':
+            valor = int(valor)
+            if valor < 50:
+                await ctx.send("O SLO de latência deve ser de pelo menos 50 ms")
+                return
+        elif param == 'decode_target':
+            valor = int(valor)
+            if not (320 <= valor <= 4096):
+                await ctx.send("O lado alvo da decodificação deve estar entre 320 e 4096 pixels")
+                return
+        elif param == 'max_megapixels':
+            valor = float(valor)
+            if valor <= 0:
+                await ctx.send("O limite de megapixels deve ser positivo")
+                return
+        elif param == 'output_format':
+            valor = valor.lower()
+            if valor not in FORMATOS_SAIDA:
+                await ctx.send(f"Formato inválido! Use um dos seguintes: {', '.join(FORMATOS_SAIDA)}")
+                return
+        elif param == 'output_quality':
+            valor = int(valor)
+            if not (1 <= valor <= 95):
+                await ctx.send("A qualidade deve estar entre 1 e 95")
+                return
+        elif param == 'preview_max_side':
+            valor = int(valor)
+            if valor != 0 and valor < 128:
+                await ctx.send("O lado máximo da prévia deve ser 0 (desativado) ou pelo menos 128 pixels")
+                return
+        elif param == 'clip_fps':
+            valor = float(valor)
+            if not (0.1 <= valor <= 10):
+                await ctx.send("A taxa de amostragem dos clipes deve estar entre 0.1 e 10 quadros por segundo")
+                return
+        elif param == 'clip_scene_threshold':
+            valor = float(valor)
+            if not (0 <= valor <= 255):
+                await ctx.send("O limiar de mudança de cena deve estar entre 0 (desativado) e 255")
+                return
+        elif param == 'clip_max_frames':
+            valor = int(valor)
+            if not (1 <= valor <= 600):
+                await ctx.send("O máximo de quadros por clipe deve estar entre 1 e 600")
+                return
+        elif param == 'clip_output':
+            valor = valor.lower()
+            if valor not in SAIDAS_CLIPE:
+                await ctx.send(f"Saída inválida! Use uma das seguintes: {', '.join(SAIDAS_CLIPE)}")
+                return
+        elif param == 'tile_size':
+            valor = int(valor)
+            if not (320 <= valor <= 1280):
+                await ctx.send("O lado dos blocos deve estar entre 320 e 1280 pixels")
+                return
+        elif param == 'tile_overlap':
+            valor = float(valor)
+            if not (0 <= valor <= 0.5):
+                await ctx.send("A sobreposição dos blocos deve estar entre 0 e 0.5")
+                return
+        elif param == 'tile_max_side':
+            valor = int(valor)
+            if not (640 <= valor <= 8192):
+                await ctx.send("O lado máximo no modo em blocos deve estar entre 640 e 8192 pixels")
+                return
+        elif param in ('user_burst', 'guild_burst'):
+            valor = int(valor)
+            if valor < 1:
+                await ctx.send("A rajada deve ser de pelo menos 1 imagem")
+                return
+        
+        # Atualizar configuração
+        CONFIG[param] = valor
+        await ctx.send(f"✅ **{param}** atualizado para: **{valor}**")
+    except ValueError:
+        await ctx.send(f"Valor inválido para {param}. Verifique o tipo de dado.")
+
+# Modos de análise de cores disponíveis
+COLOR_MODES = ['quantizado', 'kmeans', 'mediancut']
+
+def rgb_to_hex(rgb):
+    return '#{:02x}{:02x}{:02x}'.format(rgb[0], rgb[1], rgb[2])
+
+def _formatar_cores(rgbs, counts, total_pixels):
+    return [{
+        'rgb': tuple(int(c) for c in rgb),
+        'hex': rgb_to_hex(rgb),
+        'percentage': int(count) / total_pixels * 100
+    } for rgb, count in zip(rgbs, counts)]
+
+# Cores mais frequentes após quantizar cada canal em 8 níveis (passo de 32)
+def _cores_quantizadas(pixels, num_colors):
+    # Empacotar os três canais quantizados (3 bits cada) em um único inteiro
+    q = (pixels >> 5).astype(np.int32)
+    packed = (q[:, 0] << 6) | (q[:, 1] << 3) | q[:, 2]
+    
+    valores, primeiro_indice, counts = np.unique(packed, return_index=True, return_counts=True)
+    # Ordenar por frequência; empates pela primeira ocorrência (mesma ordem do Counter.most_common)
+    ordem = np.lexsort((primeiro_indice, -counts))[:num_colors]
+    valores = valores[ordem]
+    
+    rgbs = np.stack([(valores >> 6) & 7, (valores >> 3) & 7, valores & 7], axis=1) * 32
+    return _formatar_cores(rgbs, counts[ordem], len(packed))
+
+# Paleta por k-means (k-means++ determinístico), mais fiel que a quantização fixa
+def _cores_kmeans(pixels, num_colors, iteracoes=10):
+    dados = pixels.astype(np.float32)
+    k = min(num_colors, len(np.unique(pixels, axis=0)))
+    rng = np.random.default_rng(0)
+    
+    centros = [dados[rng.integers(len(dados))]]
+    for _ in range(1, k):
+        dist = np.min(((dados[:, None, :] - np.array(centros)[None, :, :]) ** 2).sum(axis=2), axis=1)
+        centros.append(dados[rng.choice(len(dados), p=dist / dist.sum())])
+    centros = np.array(centros)
+    
+    for _ in range(iteracoes):
+        rotulos = ((dados[:, None, :] - centros[None, :, :]) ** 2).sum(axis=2).argmin(axis=1)
+        novos = np.array([dados[rotulos == i].mean(axis=0) if np.any(rotulos == i) else centros[i] for i in range(k)])
+        if np.allclose(novos, centros):
+            break
+        centros = novos
+    
+    counts = np.bincount(rotulos, minlength=k)
+    ordem = np.argsort(-counts, kind='stable')
+    rgbs = np.clip(np.rint(centros[ordem]), 0, 255).astype(np.int32)
+    return _formatar_cores(rgbs, counts[ordem], len(dados))
+
+# Paleta por median cut (implementação nativa do PIL)
+def _cores_mediancut(img_small, num_colors):
+    paletizada = img_small.quantize(colors=num_colors, method=Image.Quantize.MEDIANCUT)
+    paleta = paletizada.getpalette()
+    ocorrencias = sorted(paletizada.getcolors(), key=lambda c: c[0], reverse=True)
+    total_pixels = img_small.width * img_small.height
+    rgbs = [paleta[i * 3:i * 3 + 3] for _, i in ocorrencias]
+    counts = [count for count, _ in ocorrencias]
+    return _formatar_cores(rgbs, counts, total_pixels)
+
+# Função para analisar cores predominantes na imagem
+# Mesmas dimensões do Image.thumbnail, mas sem copiar a imagem inteira antes de reduzir
+def miniatura(image, size):
+    def round_aspect(number, key):
+        return max(min(math.floor(number), math.ceil(number), key=key), 1)
+    
+    x, y = size
+    if x >= image.width and y >= image.height:
+        return image
+    aspect = image.width / image.height
+    if x / y >= aspect:
+        x = round_aspect(y * aspect, key=lambda n: abs(aspect - n / y))
+    else:
+        y = round_aspect(x / aspect, key=lambda n: 0 if n == 0 else abs(aspect - x / n))
+    if (x, y) == image.size:
+        return image
+    return image.resize((x, y), Image.Resampling.BICUBIC, reducing_gap=2.0)
+
+def analyze_colors(image, num_colors=5, modo='quantizado'):
+    # Redimensionar imagem para processamento mais rápido
+    img_small = miniatura(image, (100, 100))
+    
+    # Converter para RGB se necessário
+    if img_small.mode != 'RGB':
+        img_small = img_small.convert('RGB')
+    
+    if modo == 'mediancut':
+        return _cores_mediancut(img_small, num_colors)
+    
+    # Obter pixels
+    pixels = np.asarray(img_small).reshape(-1, 3)
+    
+    if modo == 'kmeans':
+        return _cores_kmeans(pixels, num_colors)
+    return _cores_quantizadas(pixels, num_colors)
+
+# Cor dominante dentro de cada bounding box (x1, y1, x2, y2)
+def analyze_box_colors(image, boxes, modo='quantizado'):
+    colors = []
+    for x1, y1, x2, y2 in boxes:
+        recorte = image.crop((int(x1), int(y1), max(int(x2), int(x1) + 1), max(int(y2), int(y1) + 1)))
+        dominante = analyze_colors(recorte, num_colors=1, modo=modo)
+        colors.append(dominante[0] if dominante else None)
+    return colors
+
+# Etapas síncronas do detect, executadas no INFERENCE_EXECUTOR
+
+class ImagemMuitoGrandeError(Exception):
+    """A imagem excede o limite de megapixels configurado"""
+
+def verificar_megapixels(tamanho, max_megapixels):
+    megapixels = tamanho[0] * tamanho[1] / 1e6
+    if megapixels > max_megapixels:
+        raise ImagemMuitoGrandeError(
+            f"imagem de {tamanho[0]}x{tamanho[1]} ({megapixels:.0f} MP) excede o limite de {max_megapixels} MP"
+        )
+
+def preparar_imagem(image_bytes, lado_alvo=640, max_megapixels=80):
+    """Decodifica a imagem já reduzida para perto da resolução do modelo.
+
+    Devolve (imagem RGB reduzida, array BGR para o YOLO, tamanho original). A redução
+    acontece no próprio decoder (draft do JPEG) ou por fatores inteiros (Image.reduce),
+    sem nunca materializar a imagem inteira em RGB quando não é preciso.
+    """
+    with medir_etapa('decode'):
+        try:
+            image = Image.open(io.BytesIO(image_bytes))
+        except Image.DecompressionBombError as e:
+            raise ImagemMuitoGrandeError(str(e)) from e
+        
+        # Só o cabeçalho foi lido até aqui: recusar antes de alocar os pixels
+        tamanho_original = image.size
+        verificar_megapixels(tamanho_original, max_megapixels)
+        
+        # JPEG: o decoder reduz por 1/2, 1/4 ou 1/8 mantendo o maior lado >= lado_alvo
+        escala = lado_alvo / max(image.size)
+        if image.format == 'JPEG' and escala < 1:
+            image.draft('RGB', (math.ceil(image.width * escala), math.ceil(image.height * escala)))
+        
+        # Converter para RGB (RGBA, paleta, tons de cinza...) para o modelo e para salvar como JPEG
+        if image.mode not in ('RGB', 'RGBA', 'L', 'LA'):
+            image = image.convert('RGB')
+        # Demais formatos: redução por fator inteiro (média de blocos), ainda >= lado_alvo
+        fator = max(image.size) // lado_alvo
+        if fator >= 2:
+            image = image.reduce(fator)
+        if image.mode != 'RGB':
+            image = image.convert('RGB')
+        if image.size != tamanho_original:
+            print(f"Imagem {tamanho_original[0]}x{tamanho_original[1]} decodificada em {image.width}x{image.height}")
+        
+        # O YOLO espera arrays numpy em BGR (convenção do OpenCV)
+        image_array = np.ascontiguousarray(np.asarray(image)[:, :, ::-1])
+    return image, image_array, tamanho_original
+
+def montar_info_cores(image, modo='quantizado'):
+    try:
+        print("Analisando cores predominantes...")
+        with medir_etapa('cores'):
+            colors = analyze_colors(image, modo=modo)
+        color_info = "\n**Cores Predominantes:**\n"
+        for i, color in enumerate(colors):
+            color_info += f"{i+1}. {color['hex']} ({color['percentage']:.1f}%)\n"
+        return color_info
+    except Exception as ce:
+        print(f"Erro na análise de cores: {str(ce)}")
+        return ""
+
+# Regiões da imagem (linha x coluna de uma grade 3x3)
+REGIOES = np.array([
+    f"{linha} {coluna}"
+    for linha in ("superior", "centro", "inferior")
+    for coluna in ("esquerdo", "central", "direito")
+])
+
+# Extrair as detecções de um Result em arrays numpy (uma cópia por tensor, não por caixa)
+def extrair_deteccoes(result):
+    boxes = result.boxes
+    return {
+        'xyxy': boxes.xyxy.cpu().numpy().astype(np.float64).reshape(-1, 4),
+        'conf': boxes.conf.cpu().numpy().astype(np.float64),
+        'cls': boxes.cls.cpu().numpy().astype(np.int64),
+        'names': result.names
+    }
+
+# Caixas em coordenadas da imagem original, com largura, altura, área e região de cada uma
+def geometria_deteccoes(xyxy, img_size, tamanho_original=None):
+    # Caixas detectadas na imagem reduzida voltam para as dimensões originais no relatório
+    escala = (1.0, 1.0)
+    if tamanho_original is not None and tamanho_original != tuple(img_size):
+        escala = (tamanho_original[0] / img_size[0], tamanho_original[1] / img_size[1])
+        xyxy = xyxy * np.array([escala[0], escala[1], escala[0], escala[1]])
+        img_size = tamanho_original
+    img_width, img_height = img_size
+    
+    x1, y1, x2, y2 = xyxy.T
+    width = x2 - x1
+    height = y2 - y1
+    
+    # Calcular posição relativa na imagem e a região correspondente
+    position_x = (x1 + x2) / 2 / img_width
+    position_y = (y1 + y2) / 2 / img_height
+    linha = np.where(position_y < 0.33, 0, np.where(position_y > 0.66, 2, 1))
+    coluna = np.where(position_x < 0.33, 0, np.where(position_x > 0.66, 2, 1))
+    return xyxy, tuple(img_size), escala, width, height, REGIOES[linha * 3 + coluna]
+
+# Contagens e confiança média por classe, na ordem em que cada classe aparece: [(nome, contagem, conf média)]
+def classes_deteccoes(deteccoes):
+    conf, cls, names = deteccoes['conf'], deteccoes['cls'], deteccoes['names']
+    classes, primeiro_indice, inverso, counts = np.unique(cls, return_index=True, return_inverse=True, return_counts=True)
+    soma_conf = np.bincount(inverso.reshape(-1), weights=conf, minlength=len(classes))
+    return [
+        (names[int(classes[i])], int(counts[i]), float(soma_conf[i] / counts[i]))
+        for i in np.argsort(primeiro_indice)
+    ]
+
+# Geometria, regiões e estatísticas por classe calculadas de forma vetorizada
+def resumir_deteccoes(deteccoes, img_size, max_objects, tamanho_original=None):
+    conf, cls = deteccoes['conf'], deteccoes['cls']
+    names = deteccoes['names']
+    xyxy, img_size, escala, width, height, regioes = geometria_deteccoes(deteccoes['xyxy'], img_size, tamanho_original)
+    area = width * height
+    por_classe = classes_deteccoes(deteccoes)
+    
+    # Ordenar objetos por tamanho (estável, como o sort do Python)
+    ordem = np.argsort(-area, kind='stable')
+    
+    def objeto(i):
+        return {
+            "class": names[int(cls[i])],
+            "confidence": float(conf[i]),
+            "width": float(width[i]),
+            "height": float(height[i]),
+            "area": float(area[i]),
+            "region": str(regioes[i]),
+            "box": tuple(float(v) for v in xyxy[i])
+        }
+    
+    resumo = {
+        'total': len(cls),
+        'tamanho': img_size,
+        'escala': escala,
+        'blocos': deteccoes.get('blocos', 0),
+        'classes': por_classe,
+        'objetos': [objeto(i) for i in ordem[:max_objects]],
+        'maior_confianca': None,
+        'maior_objeto': None
+    }
+    if len(cls):
+        resumo['maior_confianca'] = objeto(ordem[np.argmax(conf[ordem])])
+        resumo['maior_objeto'] = objeto(ordem[0])
+    return resumo
+
+# Uma linha (classe, confiança, região, largura, altura) por objeto, para o histórico
+def objetos_historico(deteccoes, img_size, tamanho_original=None):
+    _, _, _, width, height, regioes = geometria_deteccoes(deteccoes['xyxy'], img_size, tamanho_original)
+    names = deteccoes['names']
+    return [
+        (names[int(c)], float(p), str(r), round(float(w), 1), round(float(h), 1))
+        for c, p, r, w, h in zip(deteccoes['cls'], deteccoes['conf'], regioes, width, height)
+    ]
+
+def montar_mensagem_deteccao(resumo, image, cfg, color_info, timestamp):
+    # Criar mensagem de detecção
+    detection_message = f"**Análise com {titulo_modelo(cfg)} (conf: {cfg['confidence_threshold']}):**\n\n"
+    detection_message += "**Objetos Detectados:**\n"
+    
+    # Adicionar resumo por classe
+    for class_name, count, avg_confidence in resumo['classes']:
+        detection_message += f"- {class_name}: {count} (confiança média: {avg_confidence:.2%})\n"
+    
+    # Adicionar detalhes de cada objeto (limitado pelo max_objects da configuração)
+    shown_objects = resumo['objetos']
+    if shown_objects:
+        detection_message += "\n**Detalhes dos Objetos:**\n"
+        box_colors = [None] * len(shown_objects)
+        if cfg['box_colors']:
+            try:
+                # As caixas do relatório estão nas dimensões originais; as cores vêm da imagem reduzida
+                sx, sy = resumo['escala']
+                boxes = [(x1 / sx, y1 / sy, x2 / sx, y2 / sy) for x1, y1, x2, y2 in (obj['box'] for obj in shown_objects)]
+                box_colors = analyze_box_colors(image, boxes, cfg['color_mode'])
+            except Exception as ce:
+                print(f"Erro na análise de cores por objeto: {str(ce)}")
+        for i, (obj, box_color) in enumerate(zip(shown_objects, box_colors)):
+            detection_message += f"{i+1}. {obj['class']}: confiança {obj['confidence']:.2%}, tamanho {obj['width']:.1f}x{obj['height']:.1f} pixels, {obj['region']}"
+            if box_color:
+                detection_message += f", cor {box_color['hex']}"
+            detection_message += "\n"
+    
+    # Adicionar estatísticas gerais
+    detection_message += "\n**Estatísticas:**\n"
+    detection_message += f"- Total de objetos: {resumo['total']}\n"
+    detection_message += f"- Classes detectadas: {len(resumo['classes'])}\n"
+    if resumo['tamanho'] != image.size:
+        detection_message += f"- Resolução: {resumo['tamanho'][0]}x{resumo['tamanho'][1]} (analisada em {image.width}x{image.height})\n"
+    if resumo['blocos']:
+        detection_message += f"- Inferência em blocos: {resumo['blocos']} blocos de {cfg['tile_size']}px + imagem inteira\n"
+    if resumo['total']:
+        max_obj = resumo['maior_confianca']
+        detection_message += f"- Objeto com maior confiança: {max_obj['class']} ({max_obj['confidence']:.2%})\n"
+        largest_obj = resumo['maior_objeto']
+        detection_message += f"- Maior objeto: {largest_obj['class']} ({largest_obj['width']:.1f}x{largest_obj['height']:.1f} pixels)\n"
+    
+    # Adicionar análise de cores
+    detection_message += color_info
+    
+    # Adicionar timestamp
+    detection_message += f"\n*Processado em: {timestamp}*"
+    return detection_message
+
+# Formatos de saída da imagem anotada: formato do PIL e extensão do arquivo
+FORMATOS_SAIDA = {'jpeg': ('JPEG', '.jpg'), 'webp': ('WEBP', '.webp'), 'png': ('PNG', '.png')}
+
+# Fontes carregadas uma única vez por tamanho (arial.ttf não existe na maioria dos Linux)
+FONTES_CANDIDATAS = ['arial.ttf', 'DejaVuSans.ttf', '/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf']
+_FONTES = {}
+_FONTES_LOCK = threading.Lock()
+
+def carregar_fonte(tamanho):
+    with _FONTES_LOCK:
+        fonte = _FONTES.get(tamanho)
+        if fonte is None:
+            for caminho in FONTES_CANDIDATAS:
+                try:
+                    fonte = ImageFont.truetype(caminho, tamanho)
+                    break
+                except OSError:
+                    continue
+            else:
+                # Fonte embutida do Pillow, escalável
+                fonte = ImageFont.load_default(tamanho)
+            _FONTES[tamanho] = fonte
+        return fonte
+
+# Paleta de 20 cores do Ultralytics (ultralytics.utils.plotting.Colors), copiada para que
+# desenhar não importe ultralytics nem torch no processo do bot
+PALETA_CAIXAS = tuple(
+    (int(h[0:2], 16), int(h[2:4], 16), int(h[4:6], 16))
+    for h in ('FF3838', 'FF9D97', 'FF701F', 'FFB21D', 'CFD231', '48F90A', '92CC17', '3DDB86', '1A9334', '00D4BB',
+              '2C99A8', '00C2FF', '344593', '6473FF', '0018EC', '8438FF', '520085', 'CB38FF', 'FF95C8', 'FF37C7')
+)
+
+def desenhar_deteccoes(image, deteccoes):
+    """Desenha caixas e rótulos direto no buffer decodificado, no estilo do result.plot()"""
+    draw = ImageDraw.Draw(image)
+    espessura = max(round(sum(image.size) / 2 * 0.003), 2)
+    fonte = carregar_fonte(max(round(sum(image.size) / 2 * 0.025), 12))
+    names = deteccoes['names']
+    for (x1, y1, x2, y2), conf, cls in zip(deteccoes['xyxy'], deteccoes['conf'], deteccoes['cls']):
+        cor = PALETA_CAIXAS[int(cls) % len(PALETA_CAIXAS)]
+        draw.rectangle((x1, y1, x2, y2), outline=cor, width=espessura)
+        
+        rotulo = f"{names[int(cls)]} {conf:.2f}"
+        esquerda, topo_texto, direita, base = draw.textbbox((0, 0), rotulo, font=fonte)
+        altura = base - topo_texto + 2 * espessura
+        # Rótulo acima da caixa, ou dentro dela quando encosta na borda superior
+        topo = y1 - altura if y1 - altura >= 0 else y1
+        draw.rectangle((x1, topo, x1 + direita - esquerda + 2 * espessura, topo + altura), fill=cor)
+        draw.text((x1 + espessura, topo + espessura - topo_texto), rotulo, fill=(255, 255, 255), font=fonte)
+
+def codificar_imagem(image, cfg):
+    formato, _ = FORMATOS_SAIDA[cfg['output_format']]
+    if cfg['preview_max_side'] and max(image.size) > cfg['preview_max_side']:
+        image = miniatura(image, (cfg['preview_max_side'], cfg['preview_max_side']))
+    buffer = io.BytesIO()
+    if formato == 'PNG':
+        image.save(buffer, format=formato, optimize=True)
+    else:
+        image.save(buffer, format=formato, quality=cfg['output_quality'])
+    return buffer.getvalue()
+
+def renderizar_deteccao(deteccoes, image, cfg, color_info, tamanho_original=None):
+    timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    
+    with medir_etapa('resumo'):
+        # Processar as caixas em bloco
+        resumo = resumir_deteccoes(deteccoes, image.size, cfg['max_objects'], tamanho_original)
+        print(f"Objetos detectados: {resumo['total']} " +
+              f"({', '.join(f'{nome}: {count}' for nome, count, _ in resumo['classes'])})")
+        
+        # Antes de desenhar: as cores por objeto são lidas da imagem ainda sem as caixas
+        detection_message = montar_mensagem_deteccao(resumo, image, cfg, color_info, timestamp)
+    
+    # Modo somente texto: nada de desenho nem de imagem para enviar
+    if cfg.get('text_only'):
+        return detection_message, b'', resumo['classes']
+    
+    with medir_etapa('plot'):
+        desenhar_deteccoes(image, deteccoes)
+    
+    with medir_etapa('texto'):
+        # Adicionar marca d'água
+        draw = ImageDraw.Draw(image)
+        draw.text((10, 10), f"YOLOv8{cfg['model_size']} - {timestamp}", fill=(255, 255, 255), font=carregar_fonte(20))
+    
+    with medir_etapa('encode'):
+        # Codificar a imagem com as detecções em memória
+        output_bytes = codificar_imagem(image, cfg)
+    print(f"Imagem com detecções codificada ({len(output_bytes) / 1024:.0f} KB, {cfg['output_format']})")
+    return detection_message, output_bytes, resumo['classes']
+
+# Formatos de imagem aceitos pelo detect
+VALID_EXTENSIONS = ['.png', '.jpg', '.jpeg', '.webp', '.bmp', '.gif']
+
+class ErroInferencia(Exception):
+    """Falha do modelo YOLO ao processar uma imagem"""
+
+# Inferência em blocos: imagens grandes viram blocos sobrepostos do tamanho de entrada do modelo
+LIMIAR_FUSAO_IOU = 0.5  # duplicatas do mesmo objeto vistas por dois blocos (ou pela passada global)
+LIMIAR_FUSAO_IOS = 0.6  # pedaço de objeto cortado na borda de um bloco, contido na caixa inteira
+MARGEM_BORDA_BLOCO = 2  # pixels até a borda interna de um bloco para a caixa contar como cortada
+
+def posicoes_blocos(comprimento, tamanho, sobreposicao):
+    """Inícios dos blocos ao longo de um eixo, distribuídos por igual e cobrindo tudo"""
+    if comprimento <= tamanho:
+        return [0]
+    passo = tamanho * (1 - sobreposicao)
+    n = math.ceil((comprimento - tamanho) / passo) + 1
+    return [int(round(p)) for p in np.linspace(0, comprimento - tamanho, n)]
+
+def precisa_blocos(tamanho_imagem, tamanho, sobreposicao):
+    """Imagens que cabem em um bloco (com folga da sobreposição) vão direto ao modelo"""
+    return max(tamanho_imagem) > tamanho * (1 + sobreposicao)
+
+def cortar_blocos(image_array, tamanho, sobreposicao):
+    """Devolve os recortes BGR e a posição (x0, y0, x1, y1) de cada um na imagem"""
+    altura, largura = image_array.shape[:2]
+    recortes, posicoes = [], []
+    for y0 in posicoes_blocos(altura, tamanho, sobreposicao):
+        for x0 in posicoes_blocos(largura, tamanho, sobreposicao):
+            x1, y1 = min(x0 + tamanho, largura), min(y0 + tamanho, altura)
+            recortes.append(np.ascontiguousarray(image_array[y0:y1, x0:x1]))
+            posicoes.append((x0, y0, x1, y1))
+    return recortes, posicoes
+
+def fundir_blocos(resultados, posicoes, tamanho_imagem):
+    """Junta as detecções dos blocos (e da passada global, sem posição) em coordenadas da imagem.
+
+    Fusão gulosa por classe, da maior confiança para a menor: duplicatas (IoU alto) são descartadas e
+    pedaços cortados na borda interna de um bloco (IoS alto) são unidos à caixa que os contém.
+    """
+    largura, altura = tamanho_imagem
+    caixas, confs, classes, cortadas = [], [], [], []
+    for deteccoes, posicao in zip(resultados, posicoes):
+        xyxy = deteccoes['xyxy']
+        cortada = np.zeros(len(xyxy), dtype=bool)
+        if posicao is not None:
+            x0, y0, x1, y1 = posicao
+            xyxy = xyxy + np.array([x0, y0, x0, y0])
+            # Só as bordas do bloco que ficam dentro da imagem cortam objetos
+            m = MARGEM_BORDA_BLOCO
+            cortada = (((xyxy[:, 0] <= x0 + m) & (x0 > 0)) | ((xyxy[:, 1] <= y0 + m) & (y0 > 0)) |
+                       ((xyxy[:, 2] >= x1 - m) & (x1 < largura)) | ((xyxy[:, 3] >= y1 - m) & (y1 < altura)))
+        caixas.append(xyxy)
+        confs.append(deteccoes['conf'])
+        classes.append(deteccoes['cls'])
+        cortadas.append(cortada)
+    xyxy, conf, cls, cortada = (np.concatenate(caixas).reshape(-1, 4), np.concatenate(confs),
+                                np.concatenate(classes), np.concatenate(cortadas))
+    
+    ordem = np.argsort(-conf, kind='stable')
+    xyxy, conf, cls, cortada = xyxy[ordem].copy(), conf[ordem], cls[ordem], cortada[ordem]
+    iou = iou_matriz(xyxy, xyxy)
+    area = (xyxy[:, 2] - xyxy[:, 0]) * (xyxy[:, 3] - xyxy[:, 1])
+    intersecao = iou * (area[:, None] + area[None, :]) / (1 + iou)
+    ios = intersecao / (np.minimum(area[:, None], area[None, :]) + 1e-9)
+    mesma_classe = cls[:, None] == cls[None, :]
+    duplicata = mesma_classe & (iou >= LIMIAR_FUSAO_IOU)
+    pedaco = mesma_classe & (ios >= LIMIAR_FUSAO_IOS) & (cortada[:, None] | cortada[None, :])
+    
+    manter = np.ones(len(conf), dtype=bool)
+    for i in range(len(conf)):
+        if not manter[i]:
+            continue
+        absorvidas = np.flatnonzero(manter & (duplicata[i] | pedaco[i]))
+        absorvidas = absorvidas[absorvidas > i]
+        for j in absorvidas[pedaco[i, absorvidas]]:
+            xyxy[i, :2] = np.minimum(xyxy[i, :2], xyxy[j, :2])
+            xyxy[i, 2:] = np.maximum(xyxy[i, 2:], xyxy[j, 2:])
+        manter[absorvidas] = False
+    
+    return {
+        'xyxy': xyxy[manter],
+        'conf': conf[manter],
+        'cls': cls[manter],
+        'names': resultados[0]['names']
+    }
+
+async def inferir_blocos(modelo, cfg, image_array):
+    """Blocos sobrepostos + a imagem inteira (para objetos grandes), todos pelo micro-batcher.
+
+    Os blocos entram juntos nos lotes e, com processos de inferência, lotes diferentes
+    rodam em paralelo em processos diferentes.
+    """
+    recortes, posicoes = cortar_blocos(image_array, cfg['tile_size'], cfg['tile_overlap'])
+    fontes = recortes + [image_array]
+    resultados = await asyncio.gather(*(
+        MICRO_BATCHER.inferir(modelo, cfg['model_size'], cfg['confidence_threshold'], fonte) for fonte in fontes
+    ))
+    altura, largura = image_array.shape[:2]
+    deteccoes = fundir_blocos(resultados, posicoes + [None], (largura, altura))
+    deteccoes['blocos'] = len(recortes)
+    print(f"Inferência em {len(recortes)} bloco(s) de {cfg['tile_size']}px: "
+          f"{sum(len(r['cls']) for r in resultados)} caixa(s) antes da fusão, {len(deteccoes['cls'])} depois")
+    return deteccoes
+
+# Processa um anexo já baixado: cache, decodificação, cores, inferência e renderização.
+# `ao_inferir` recebe as classes detectadas assim que a inferência termina, antes da renderização
+async def processar_anexo(ctx, image_bytes, cfg, cache_key, ao_inferir=None):
+    # Em blocos, a imagem é decodificada maior para que os objetos pequenos sobrevivam
+    lado_alvo = max(cfg['decode_target'], cfg['tile_max_side']) if cfg['tiled'] else cfg['decode_target']
+    image, image_array, tamanho_original = await INFERENCE_EXECUTOR.executar(
+        preparar_imagem, image_bytes, lado_alvo, cfg['max_megapixels']
+    )
+    
+    # Analisar cores predominantes se configurado, em paralelo com a inferência (só lê a imagem)
+    cores = None
+    if cfg['color_analysis']:
+        cores = asyncio.ensure_future(INFERENCE_EXECUTOR.executar(montar_info_cores, image, cfg['color_mode']))
+        cores.add_done_callback(lambda f: f.cancelled() or f.exception())  # se a inferência falhar, ninguém aguarda
+    
+    # Realizar a detecção
+    try:
+        # Modelo já carregado (quente) do tamanho escolhido por este servidor
+        modelo_atual = await MODEL_POOL.obter(cfg['model_size'], ctx, variante_modelo(cfg))
+        # Usar threshold de confiança da configuração; anexos simultâneos entram no mesmo lote
+        inicio = time.perf_counter()
+        with medir_etapa('inferencia'), MODEL_POOL.emprestimo(modelo_atual):
+            if cfg['tiled'] and precisa_blocos(image.size, cfg['tile_size'], cfg['tile_overlap']):
+                deteccoes = await inferir_blocos(modelo_atual, cfg, image_array)
+            else:
+                deteccoes = await MICRO_BATCHER.inferir(
+                    modelo_atual, cfg['model_size'], cfg['confidence_threshold'], image_array
+                )
+        # Vários blocos por imagem distorceriam o p95 usado pelo modo adaptativo
+        if 'blocos' not in deteccoes:
+            ADAPTATIVO.registrar(time.perf_counter() - inicio, cfg.get('tamanho_configurado', cfg['model_size']),
+                                 variante_modelo(cfg))
+    except FilaCheiaError:
+        if cores is not None:
+            cores.cancel()
+        raise
+    except Exception as yolo_error:
+        if cores is not None:
+            cores.cancel()
+        raise ErroInferencia(str(yolo_error)) from yolo_error
+    
+    if ao_inferir is not None:
+        ao_inferir(classes_deteccoes(deteccoes))
+    color_info = await cores if cores is not None else ""
+    
+    # Processar resultados
+    detection_message, output_bytes, classes = await INFERENCE_EXECUTOR.executar(
+        renderizar_deteccao, deteccoes, image, cfg, color_info, tamanho_original
+    )
+    await DETECTION_CACHE.guardar(cache_key, detection_message, output_bytes, classes)
+    if HISTORICO.habilitado:
+        HISTORICO.registrar(ctx, cfg, classes, objetos_historico(deteccoes, image.size, tamanho_original))
+    return detection_message, output_bytes, classes
+
+# Soma as classes de várias imagens: {nome: (contagem, soma das confianças)}
+def somar_classes(listas_classes):
+    totais = {}
+    for classes in listas_classes:
+        for class_name, count, avg_confidence in classes:
+            total, soma_conf = totais.get(class_name, (0, 0.0))
+            totais[class_name] = (total + count, soma_conf + count * avg_confidence)
+    return totais
+
+def linhas_classes(totais):
+    return "".join(
+        f"- {class_name}: {total} (confiança média: {soma_conf / total:.2%})\n"
+        for class_name, (total, soma_conf) in sorted(totais.items(), key=lambda item: item[1][0], reverse=True)
+    )
+
+# Resumo agregado das classes detectadas em todas as imagens de uma mensagem
+def montar_mensagem_agregada(nomes, resultados, cfg):
+    totais = somar_classes(resultado[2] for resultado in resultados if not isinstance(resultado, Exception))
+    
+    mensagem = f"**Análise com {titulo_modelo(cfg)} (conf: {cfg['confidence_threshold']}) de {len(nomes)} imagens:**\n\n"
+    mensagem += "**Objetos Detectados (todas as imagens):**\n"
+    mensagem += linhas_classes(totais)
+    
+    mensagem += "\n**Por Imagem:**\n"
+    for i, (nome, resultado) in enumerate(zip(nomes, resultados)):
+        if isinstance(resultado, FilaCheiaError):
+            mensagem += f"{i+1}. {nome}: ⏳ não processada (bot ocupado)\n"
+        elif isinstance(resultado, Exception):
+            mensagem += f"{i+1}. {nome}: ❌ erro ({str(resultado)})\n"
+        else:
+            classes = resultado[2]
+            detalhes = ', '.join(f"{class_name}: {count}" for class_name, count, _ in classes)
+            mensagem += f"{i+1}. {nome}: {sum(count for _, count, _ in classes)} objeto(s)" + (f" ({detalhes})" if detalhes else "") + "\n"
+    
+    mensagem += f"\n*Processado em: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}*"
+    if len(mensagem) > MAX_MESSAGE_LENGTH:
+        mensagem = mensagem[:MAX_MESSAGE_LENGTH - 1] + "…"
+    return mensagem
+
+class RespostaProgressiva:
+    """Primeira fase da resposta do detect: assim que a inferência de todas as imagens pendentes
+    termina, a mensagem "Processando..." é editada com o resumo por classe. A imagem anotada e os
+    detalhes por objeto chegam depois, na resposta final.
+    """
+
+    def __init__(self, cfg, pendentes, classes_cache=(), inicio=None):
+        self.aviso = None  # mensagem "Processando...", enviada depois pelo detect
+        self.cfg = cfg
+        self.pendentes = set(pendentes)
+        self.imagens = len(self.pendentes) + len(classes_cache)
+        self.classes = list(classes_cache)  # resultados do cache entram no mesmo resumo
+        self.inicio = inicio if inicio is not None else time.perf_counter()
+        self.respondido = False
+        self._edicao = None
+    
+    def inferida(self, indice, classes=None):
+        """Chamada quando a inferência da imagem termina (classes) ou quando ela falha (None)"""
+        if indice not in self.pendentes:
+            return
+        self.pendentes.discard(indice)
+        if classes is not None:
+            self.classes.append(classes)
+        if not self.pendentes and self.classes and self._edicao is None:
+            # Não atrasa a renderização: a edição segue em paralelo
+            self._edicao = asyncio.ensure_future(self._editar())
+    
+    def montar(self):
+        alvo = "da imagem" if self.imagens == 1 else f"de {self.imagens} imagens"
+        mensagem = f"**{titulo_modelo(self.cfg)}** (conf: {self.cfg['confidence_threshold']}) — resumo {alvo}:\n"
+        totais = somar_classes(self.classes)
+        mensagem += linhas_classes(totais) if totais else "Nenhum objeto detectado.\n"
+        if len(mensagem) > MAX_MESSAGE_LENGTH - 60:
+            mensagem = mensagem[:MAX_MESSAGE_LENGTH - 61] + "…\n"
+        if self.cfg.get('text_only'):
+            return mensagem + "\n*Gerando os detalhes...*"
+        return mensagem + ("\n*Gerando a imagem anotada e os detalhes...*" if self.imagens == 1
+                           else "\n*Gerando as imagens anotadas e os detalhes...*")
+    
+    async def _editar(self):
+        try:
+            await self.aviso.edit(content=self.montar())
+        except discord.HTTPException as e:
+            print(f"Não foi possível editar a mensagem de progresso: {str(e)}")
+            return
+        self.registrar_primeira_resposta()
+    
+    def registrar_primeira_resposta(self):
+        """Tempo até o usuário ver a primeira resposta útil (o resumo ou, sem ele, o resultado final)"""
+        if not self.respondido:
+            self.respondido = True
+            METRICAS.observar('primeira_resposta', time.perf_counter() - self.inicio)
+    
+    async def aguardar(self):
+        """Garante que o resumo apareça antes da resposta final"""
+        if self._edicao is not None:
+            await self._edicao
+
+# Divide textos longos (ajuda, status) em mensagens dentro do limite do Discord, quebrando entre linhas
+def dividir_mensagem(texto, limite=MAX_MESSAGE_LENGTH):
+    partes, atual = [], ""
+    for linha in texto.splitlines(keepends=True):
+        # Linhas maiores que o limite seguem em pedaços por várias mensagens
+        for inicio in range(0, len(linha), limite):
+            pedaco = linha[inicio:inicio + limite]
+            if atual and len(atual) + len(pedaco) > limite:
+                partes.append(atual)
+                atual = ""
+            atual += pedaco
+    if atual.strip():
+        partes.append(atual)
+    return partes
+
+# Divide os arquivos em grupos que respeitam os limites de anexos por mensagem
+def agrupar_arquivos(arquivos, limite_bytes):
+    grupos, atual, bytes_atual = [], [], 0
+    for nome, dados in arquivos:
+        if len(dados) > limite_bytes:
+            print(f"Arquivo {nome} excede o limite de upload e não será enviado")
+            continue
+        if atual and (len(atual) >= MAX_FILES_PER_MESSAGE or bytes_atual + len(dados) > limite_bytes):
+            grupos.append(atual)
+            atual, bytes_atual = [], 0
+        atual.append((nome, dados))
+        bytes_atual += len(dados)
+    if atual:
+        grupos.append(atual)
+    return grupos
+
+# Clipes: GIFs/WebP/APNG animados e vídeos, analisados quadro a quadro
+EXTENSOES_VIDEO = ['.mp4', '.mov', '.webm', '.mkv', '.avi']
+EXTENSOES_ANIMADAS = ['.gif', '.webp', '.png']
+SAIDAS_CLIPE = ['gif', 'contato']
+
+CLIPE_VERIFICACOES_POR_AMOSTRA = 4  # quadros inspecionados (mudança de cena) entre duas amostras
+CLIPE_INTERVALO_MIN_CENA = 0.25  # segundos mínimos entre amostras extras por mudança de cena
+CLIPE_LADO_SAIDA = 320  # maior lado dos quadros do GIF anotado / folha de contato
+CLIPE_QUADROS_SAIDA = 40  # quadros guardados para o GIF anotado
+CLIPE_QUADROS_CONTATO = 12
+CLIPE_INTERVALOS = 8  # colunas da linha do tempo no relatório
+RASTREIO_IOU = 0.3  # IoU mínimo para ligar uma detecção a um objeto já visto
+RASTREIO_MAX_AUSENCIA = 2  # amostras sem ver o objeto até considerá-lo fora de cena
+
+def eh_clipe(nome, dados):
+    """Vídeos e imagens animadas vão para o modo de clipe; GIFs estáticos seguem como imagem"""
+    extensao = os.path.splitext(nome.lower())[1]
+    if extensao in EXTENSOES_VIDEO:
+        return True
+    if extensao in EXTENSOES_ANIMADAS:
+        try:
+            return getattr(Image.open(io.BytesIO(dados)), 'is_animated', False)
+        except Exception:
+            return False
+    return False
+
+class ClipeAnimado:
+    """GIF/WebP/APNG animado, decodificado um quadro por vez"""
+
+    def __init__(self, dados, max_megapixels):
+        self.image = Image.open(io.BytesIO(dados))
+        self.tamanho = self.image.size
+        verificar_megapixels(self.tamanho, max_megapixels)
+        self.total_quadros = getattr(self.image, 'n_frames', 1)
+        self.fps = 1000 / self._duracao_quadro()
+        self.duracao = self.total_quadros / self.fps
+
+    def _duracao_quadro(self):
+        # Como os navegadores: durações abaixo de 20 ms viram 100 ms
+        duracao = self.image.info.get('duration') or 100
+        return duracao if duracao >= 20 else 100
+
+    def quadros(self, intervalo, lado_alvo):
+        """Gera (tempo em s, quadro RGB reduzido), pulando a conversão dos quadros a menos de `intervalo` do anterior"""
+        tempo, proximo = 0.0, 0.0
+        for quadro in ImageSequence.Iterator(self.image):
+            if tempo + 1e-6 >= proximo:
+                proximo = tempo + intervalo
+                yield tempo, miniatura(quadro.convert('RGB'), (lado_alvo, lado_alvo))
+            tempo += self._duracao_quadro() / 1000
+
+    def fechar(self):
+        self.image.close()
+
+class ClipeVideo:
+    """Vídeo lido pelo OpenCV; só os quadros usados são decodificados (grab/retrieve)"""
+
+    def __init__(self, dados, extensao, max_megapixels):
+        import cv2
+        
+        # O VideoCapture só lê de arquivos
+        with tempfile.NamedTemporaryFile(suffix=extensao, delete=False) as arquivo:
+            arquivo.write(dados)
+        self.caminho = arquivo.name
+        self.captura = cv2.VideoCapture(self.caminho)
+        self.tamanho = (int(self.captura.get(cv2.CAP_PROP_FRAME_WIDTH)), int(self.captura.get(cv2.CAP_PROP_FRAME_HEIGHT)))
+        try:
+            if not self.captura.isOpened():
+                raise ValueError("não foi possível abrir o vídeo")
+            verificar_megapixels(self.tamanho, max_megapixels)
+        except Exception:
+            self.fechar()
+            raise
+        fps = self.captura.get(cv2.CAP_PROP_FPS)
+        self.fps = fps if 0 < fps <= 240 else 25.0
+        self.total_quadros = max(int(self.captura.get(cv2.CAP_PROP_FRAME_COUNT)), 0)
+        self.duracao = self.total_quadros / self.fps
+
+    def quadros(self, intervalo, lado_alvo):
+        """Gera (tempo em s, quadro RGB reduzido); os quadros pulados são só avançados, sem decodificar a imagem"""
+        import cv2
+        
+        indice, proximo = 0, 0.0
+        while self.captura.grab():
+            tempo = indice / self.fps
+            indice += 1
+            if tempo + 1e-6 < proximo:
+                continue
+            ok, bgr = self.captura.retrieve()
+            if not ok:
+                break
+            proximo = tempo + intervalo
+            escala = lado_alvo / max(bgr.shape[:2])
+            if escala < 1:
+                bgr = cv2.resize(bgr, (max(round(bgr.shape[1] * escala), 1), max(round(bgr.shape[0] * escala), 1)),
+                                 interpolation=cv2.INTER_AREA)
+            yield tempo, Image.fromarray(bgr[:, :, ::-1])
+        self.total_quadros = max(self.total_quadros, indice)
+
+    def fechar(self):
+        if getattr(self, 'captura', None) is not None:
+            self.captura.release()
+        try:
+            os.remove(self.caminho)
+        except OSError:
+            pass
+
+def abrir_clipe(nome, dados, max_megapixels):
+    extensao = os.path.splitext(nome.lower())[1]
+    if extensao in EXTENSOES_VIDEO:
+        return ClipeVideo(dados, extensao, max_megapixels)
+    try:
+        return ClipeAnimado(dados, max_megapixels)
+    except Image.DecompressionBombError as e:
+        raise ImagemMuitoGrandeError(str(e)) from e
+
+def amostrar_quadros(clipe, fps, limiar_cena, max_quadros, lado_alvo):
+    """Gera (tempo, quadro, mudou de cena) só para os quadros que vão ao modelo.
+
+    Amostra a `fps` quadros por segundo e, entre uma amostra e outra, inspeciona alguns quadros
+    para pegar cortes de cena. Nunca devolve mais que `max_quadros`.
+    """
+    intervalo = 1 / fps
+    verificacao = intervalo / CLIPE_VERIFICACOES_POR_AMOSTRA if limiar_cena > 0 else intervalo
+    ultimo, assinatura_anterior, amostrados = None, None, 0
+    for tempo, quadro in clipe.quadros(verificacao, lado_alvo):
+        corte = False
+        if limiar_cena > 0:
+            # Assinatura 32x32 em tons de cinza: barata e insensível a ruído de compressão
+            assinatura = np.asarray(quadro.convert('L').resize((32, 32), Image.Resampling.BILINEAR), dtype=np.int16)
+            corte = assinatura_anterior is not None and np.abs(assinatura - assinatura_anterior).mean() >= limiar_cena
+            assinatura_anterior = assinatura
+        if ultimo is None or tempo - ultimo >= intervalo - 1e-6 or (corte and tempo - ultimo >= CLIPE_INTERVALO_MIN_CENA):
+            yield tempo, quadro, corte
+            ultimo = tempo
+            amostrados += 1
+            if amostrados >= max_quadros:
+                return
+
+def proximo_lote(amostras, tamanho):
+    lote = []
+    with medir_etapa('decode'):
+        for tempo, quadro, corte in amostras:
+            lote.append((tempo, quadro, corte, np.ascontiguousarray(np.asarray(quadro)[:, :, ::-1])))
+            if len(lote) >= tamanho:
+                break
+    return lote
+
+def iou_matriz(a, b):
+    """IoU entre cada caixa de `a` (N, 4) e cada caixa de `b` (M, 4), em xyxy"""
+    x1 = np.maximum(a[:, None, 0], b[None, :, 0])
+    y1 = np.maximum(a[:, None, 1], b[None, :, 1])
+    x2 = np.minimum(a[:, None, 2], b[None, :, 2])
+    y2 = np.minimum(a[:, None, 3], b[None, :, 3])
+    intersecao = np.clip(x2 - x1, 0, None) * np.clip(y2 - y1, 0, None)
+    area_a = (a[:, 2] - a[:, 0]) * (a[:, 3] - a[:, 1])
+    area_b = (b[:, 2] - b[:, 0]) * (b[:, 3] - b[:, 1])
+    return intersecao / (area_a[:, None] + area_b[None, :] - intersecao + 1e-9)
+
+class RastreadorIoU:
+    """Liga detecções da mesma classe entre amostras consecutivas pela sobreposição das caixas.
+
+    Cada objeto novo é contado uma única vez, mesmo aparecendo em várias amostras. Só os objetos
+    ainda em cena ficam em memória.
+    """
+
+    def __init__(self, limiar_iou=RASTREIO_IOU, max_ausencia=RASTREIO_MAX_AUSENCIA):
+        self.limiar_iou = limiar_iou
+        self.max_ausencia = max_ausencia
+        self.ativos = []  # {'cls', 'box', 'ultimo'}
+        self.unicos = {}  # classe -> objetos distintos
+        self.soma_conf = {}  # classe -> (soma das confianças, detecções)
+
+    def encerrar(self):
+        """Mudança de cena: nada do que estava em cena continua"""
+        self.ativos = []
+
+    def atualizar(self, indice, xyxy, conf, cls):
+        self.ativos = [obj for obj in self.ativos if indice - obj['ultimo'] <= self.max_ausencia]
+        
+        ligadas = set()
+        if self.ativos and len(cls):
+            caixas = np.array([obj['box'] for obj in self.ativos])
+            classes = np.array([obj['cls'] for obj in self.ativos])
+            iou = iou_matriz(xyxy, caixas)
+            iou[cls[:, None] != classes[None, :]] = 0
+            # Associação gulosa: pares com maior sobreposição primeiro
+            usados = set()
+            for i, j in zip(*np.unravel_index(np.argsort(-iou, axis=None), iou.shape)):
+                if iou[i, j] < self.limiar_iou:
+                    break
+                if i in ligadas or j in usados:
+                    continue
+                ligadas.add(i)
+                usados.add(j)
+                self.ativos[j]['box'] = xyxy[i]
+                self.ativos[j]['ultimo'] = indice
+        
+        for i in range(len(cls)):
+            classe = int(cls[i])
+            soma, total = self.soma_conf.get(classe, (0.0, 0))
+            self.soma_conf[classe] = (soma + float(conf[i]), total + 1)
+            if i not in ligadas:
+                self.ativos.append({'cls': classe, 'box': xyxy[i], 'ultimo': indice})
+                self.unicos[classe] = self.unicos.get(classe, 0) + 1
+
+class AnaliseClipe:
+    """Acumula rastreamento, linha do tempo e quadros de saída de um clipe com memória limitada"""
+
+    def __init__(self, gerar_saida):
+        self.rastreador = RastreadorIoU()
+        self.gerar_saida = gerar_saida
+        self.linha_tempo = []  # (tempo, {classe: objetos visíveis}) por amostra
+        self.saida = []  # (tempo, miniatura anotada); metade é descartada quando enche
+        self.passo_saida = 1
+        self.amostrados = 0
+        self.cortes = 0
+        self.names = {}
+        self.tamanho_analisado = None
+
+    def registrar(self, lote, deteccoes):
+        for (tempo, quadro, corte, _), det in zip(lote, deteccoes):
+            if corte:
+                self.cortes += 1
+                self.rastreador.encerrar()
+            self.rastreador.atualizar(self.amostrados, det['xyxy'], det['conf'], det['cls'])
+            self.names = det['names']
+            self.tamanho_analisado = quadro.size
+            classes, counts = np.unique(det['cls'], return_counts=True)
+            self.linha_tempo.append((tempo, dict(zip(classes.tolist(), counts.tolist()))))
+            
+            if self.gerar_saida and self.amostrados % self.passo_saida == 0:
+                with medir_etapa('plot'):
+                    desenhar_deteccoes(quadro, det)
+                    reduzido = miniatura(quadro, (CLIPE_LADO_SAIDA, CLIPE_LADO_SAIDA))
+                    ImageDraw.Draw(reduzido).text((4, reduzido.height - 16), f"{tempo:.1f}s", fill=(255, 255, 255), font=carregar_fonte(12))
+                self.saida.append((tempo, reduzido))
+                if len(self.saida) > CLIPE_QUADROS_SAIDA:
+                    self.saida = self.saida[::2]
+                    self.passo_saida *= 2
+            self.amostrados += 1
+
+    def classes(self):
+        """Objetos distintos por classe no formato (nome, contagem, confiança média)"""
+        unicos = self.rastreador.unicos
+        return [
+            (self.names[classe], total, self.rastreador.soma_conf[classe][0] / self.rastreador.soma_conf[classe][1])
+            for classe, total in sorted(unicos.items(), key=lambda item: item[1], reverse=True)
+        ]
+
+    def tabela_tempo(self, classes):
+        """Máximo de objetos visíveis ao mesmo tempo por classe em cada intervalo do clipe"""
+        fim = self.linha_tempo[-1][0]
+        colunas = min(CLIPE_INTERVALOS, len(self.linha_tempo))
+        passo = fim / colunas if fim > 0 else 1
+        inicios = [passo * c for c in range(colunas)]
+        maximos = {classe: [0] * colunas for classe in classes}
+        for tempo, contagens in self.linha_tempo:
+            coluna = min(int(tempo / passo), colunas - 1)
+            for classe in classes:
+                maximos[classe][coluna] = max(maximos[classe][coluna], contagens.get(classe, 0))
+        
+        rotulos = [f"{round(inicio, 1):g}s" for inicio in inicios]
+        largura = max(len(r) for r in rotulos) + 1
+        nome_largura = max([6] + [len(self.names[c]) for c in classes]) + 1
+        linhas = [f"{'classe':<{nome_largura}}" + "".join(f"{r:>{largura}}" for r in rotulos)]
+        for classe in classes:
+            linhas.append(f"{self.names[classe]:<{nome_largura}}" + "".join(f"{v:>{largura}}" for v in maximos[classe]))
+        return "\n".join(linhas)
+
+    def codificar_saida(self, cfg):
+        if not self.saida:
+            return b''
+        buffer = io.BytesIO()
+        if cfg['clip_output'] == 'gif':
+            tempos = [tempo for tempo, _ in self.saida]
+            quadros = [quadro for _, quadro in self.saida]
+            # Cada quadro fica na tela pelo tempo real até o próximo (entre 0,1 e 2 s)
+            duracoes = [min(max(round((b - a) * 1000), 100), 2000) for a, b in zip(tempos, tempos[1:])]
+            duracoes.append(duracoes[-1] if duracoes else 1000)
+            quadros[0].save(buffer, format='GIF', save_all=True, append_images=quadros[1:], duration=duracoes, loop=0)
+            return buffer.getvalue()
+        
+        # Folha de contato: amostras espaçadas igualmente ao longo do clipe
+        indices = np.unique(np.linspace(0, len(self.saida) - 1, min(CLIPE_QUADROS_CONTATO, len(self.saida))).round().astype(int))
+        quadros = [self.saida[i][1] for i in indices]
+        colunas = min(4, len(quadros))
+        linhas = math.ceil(len(quadros) / colunas)
+        largura = max(q.width for q in quadros)
+        altura = max(q.height for q in quadros)
+        folha = Image.new('RGB', (colunas * largura, linhas * altura))
+        for n, quadro in enumerate(quadros):
+            linha, coluna = divmod(n, colunas)
+            folha.paste(quadro, (coluna * largura + (largura - quadro.width) // 2, linha * altura + (altura - quadro.height) // 2))
+        return codificar_imagem(folha, cfg)
+
+    def montar_mensagem(self, clipe, cfg, fps, truncado):
+        mensagem = f"**Análise de clipe com {titulo_modelo(cfg)} (conf: {cfg['confidence_threshold']}):**\n\n"
+        classes = self.classes()
+        if classes:
+            mensagem += "**Objetos distintos (rastreados entre quadros):**\n"
+            for class_name, count, avg_confidence in classes[:cfg['max_objects']]:
+                mensagem += f"- {class_name}: {count} (confiança média: {avg_confidence:.2%})\n"
+            
+            ids = sorted(self.rastreador.unicos, key=self.rastreador.unicos.get, reverse=True)[:CLIPE_INTERVALOS]
+            mensagem += "\n**Objetos visíveis ao longo do tempo** (máximo simultâneo por intervalo):\n"
+            mensagem += "```\n" + self.tabela_tempo(ids) + "\n```\n"
+        else:
+            mensagem += "Nenhum objeto detectado.\n"
+        
+        mensagem += "\n**Estatísticas:**\n"
+        mensagem += f"- Duração: {clipe.duracao:.1f} s ({clipe.total_quadros} quadros, {clipe.fps:.1f} fps)\n"
+        mensagem += f"- Quadros analisados: {self.amostrados} ({fps:.2g} por segundo"
+        mensagem += f" + {self.cortes} mudança(s) de cena)\n" if self.cortes else ")\n"
+        if self.tamanho_analisado is not None and self.tamanho_analisado != clipe.tamanho:
+            mensagem += (f"- Resolução: {clipe.tamanho[0]}x{clipe.tamanho[1]} "
+                         f"(analisada em {self.tamanho_analisado[0]}x{self.tamanho_analisado[1]})\n")
+        if truncado:
+            mensagem += f"- ⚠️ Limite de {cfg['clip_max_frames']} quadros atingido: analisados só os primeiros {self.linha_tempo[-1][0]:.1f} s\n"
+        
+        mensagem += f"\n*Processado em: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}*"
+        if len(mensagem) > MAX_MESSAGE_LENGTH:
+            mensagem = mensagem[:MAX_MESSAGE_LENGTH - 1] + "…"
+        return mensagem
+
+# Analisa um clipe já baixado: quadros amostrados sob demanda, em lotes, pela mesma fila da inferência
+async def processar_clipe(ctx, nome, dados, cfg):
+    clipe = await INFERENCE_EXECUTOR.executar(abrir_clipe, nome, dados, cfg['max_megapixels'])
+    try:
+        # Clipes longos são amostrados mais espaçados para caber no limite de quadros
+        fps = cfg['clip_fps']
+        if clipe.duracao > 0:
+            fps = min(fps, cfg['clip_max_frames'] / clipe.duracao)
+        amostras = amostrar_quadros(clipe, fps, cfg['clip_scene_threshold'], cfg['clip_max_frames'], cfg['decode_target'])
+        analise = AnaliseClipe(gerar_saida=not cfg.get('text_only'))
+        
+        try:
+            modelo_atual = await MODEL_POOL.obter(cfg['model_size'], ctx, variante_modelo(cfg))
+        except Exception as yolo_error:
+            raise ErroInferencia(str(yolo_error)) from yolo_error
+        
+        # Um lote por vez: só max_batch_size quadros decodificados em memória.
+        # O clipe inteiro roda no mesmo modelo, mesmo que o servidor troque de modelo no meio
+        with MODEL_POOL.emprestimo(modelo_atual):
+            while True:
+                lote = await INFERENCE_EXECUTOR.executar(proximo_lote, amostras, max(1, cfg['max_batch_size']))
+                if not lote:
+                    break
+                try:
+                    with medir_etapa('inferencia'):
+                        deteccoes = await INFERENCE_EXECUTOR.executar(
+                            inferir_lote, modelo_atual, [bgr for _, _, _, bgr in lote], cfg['confidence_threshold']
+                        )
+                except FilaCheiaError:
+                    raise
+                except Exception as yolo_error:
+                    raise ErroInferencia(str(yolo_error)) from yolo_error
+                await INFERENCE_EXECUTOR.executar(analise.registrar, lote, deteccoes)
+        METRICAS.incrementar('quadros_clipe', analise.amostrados)
+        
+        if not analise.amostrados:
+            raise ValueError("nenhum quadro pôde ser decodificado")
+        truncado = analise.amostrados >= cfg['clip_max_frames'] and analise.linha_tempo[-1][0] < clipe.duracao - 1 / fps
+        print(f"Clipe {nome}: {analise.amostrados} quadro(s) analisado(s), {analise.cortes} mudança(s) de cena, " +
+              f"objetos distintos: {', '.join(f'{n}: {c}' for n, c, _ in analise.classes()) or 'nenhum'}")
+        
+        mensagem = analise.montar_mensagem(clipe, cfg, fps, truncado)
+        with medir_etapa('encode'):
+            output_bytes = await INFERENCE_EXECUTOR.executar(analise.codificar_saida, cfg)
+        return mensagem, output_bytes, analise.classes()
+    finally:
+        clipe.fechar()
+
+def extensao_clipe(cfg):
+    return '.gif' if cfg['clip_output'] == 'gif' else FORMATOS_SAIDA[cfg['output_format']][1]
+
+# Responde a um clipe com sua própria mensagem (resumo por classe + GIF anotado ou folha de contato)
+async def responder_clipe(ctx, nome, dados, cfg):
+    cache_key = chave_cache(dados, cfg)
+    resultado = await DETECTION_CACHE.obter(cache_key)
+    METRICAS.incrementar('cache_hits' if resultado is not None else 'cache_misses')
+    try:
+        if resultado is None:
+            await ctx.send(f"Processando o clipe {nome}... Isso pode levar alguns segundos.")
+            resultado = await processar_clipe(ctx, nome, dados, cfg)
+            await DETECTION_CACHE.guardar(cache_key, *resultado)
+        mensagem, output_bytes, classes = resultado
+        # Clipes entram com os objetos distintos por classe, sem linhas por objeto
+        HISTORICO.registrar(ctx, cfg, classes, origem='clipe')
+        
+        limite_bytes = ctx.guild.filesize_limit if ctx.guild is not None else 25 * 1024 * 1024
+        with medir_etapa('envio'):
+            if output_bytes and len(output_bytes) <= limite_bytes:
+                arquivo = f"clipe_{os.path.splitext(nome)[0]}{extensao_clipe(cfg)}"
+                await ctx.send(mensagem, file=discord.File(io.BytesIO(output_bytes), filename=arquivo))
+            else:
+                await ctx.send(mensagem)
+    except FilaCheiaError as fe:
+        print(f"Clipe rejeitado: {str(fe)}")
+        METRICAS.incrementar('rejeitados')
+        await ctx.send(f"⏳ O bot está ocupado processando outras imagens. Tente novamente em {math.ceil(INFERENCE_EXECUTOR.estimar_espera())} s.")
+    except ImagemMuitoGrandeError as ge:
+        print(f"Clipe recusado: {str(ge)}")
+        await ctx.send(f"O clipe {nome} é grande demais para ser processado: {str(ge)}.")
+    except Exception as e:
+        print(f"ERRO no clipe {nome}: {str(e)}")
+        METRICAS.incrementar('erros_imagem')
+        await ctx.send(f"Erro ao processar o clipe {nome}: {str(e)}")
+
+# Modos do `!detect`, combináveis (ex.: `!detect blocos texto`)
+MODOS_TEXTO = ['texto', 'text']
+MODOS_BLOCOS = ['blocos', 'tiles']
+
+@bot.command()
+async def detect(ctx, *modos):
+    """Comando para detectar objetos nas imagens anexadas utilizando YOLO (`!detect texto` para só o relatório, `!detect blocos` para imagens grandes)"""
+    print(f"Comando detect recebido de {ctx.author.name}")
+    
+    # Antes do modelo estar carregado e aquecido, responder sem enfileirar nada
+    if not INICIALIZACAO['pronto']:
+        await ctx.send(f"🔥 O bot ainda está aquecendo ({INICIALIZACAO['etapa']}). Tente novamente em alguns segundos.")
+        return
+    
+    if not ctx.message.attachments:
+        print("Nenhum anexo encontrado na mensagem")
+        await ctx.send("Por favor, anexe uma imagem junto com o comando.")
+        return
+    
+    # Considerar todas as imagens (e vídeos) anexados
+    extensoes = VALID_EXTENSIONS + EXTENSOES_VIDEO
+    attachments = [a for a in ctx.message.attachments if any(a.filename.lower().endswith(ext) for ext in extensoes)]
+    print(f"Anexos encontrados: {', '.join(a.filename for a in ctx.message.attachments)}")
+    if not attachments:
+        print("Nenhum anexo de imagem válido")
+        await ctx.send(f"Por favor, anexe um arquivo de imagem ou vídeo válido. Formatos suportados: {', '.join(extensoes)}")
+        return
+    
+    # Fotografar a configuração e o modelo para que uma troca no meio não afete este pedido
+    cfg = dict(CONFIG)
+    cfg['tamanho_configurado'] = tamanho_modelo(ctx)
+    cfg['precision'] = precisao_modelo(ctx)
+    cfg['model_size'] = ADAPTATIVO.tamanho(cfg['tamanho_configurado'], variante_modelo(cfg))
+    modos = [modo.lower() for modo in modos]
+    cfg['text_only'] = any(modo in MODOS_TEXTO for modo in modos)
+    cfg['tiled'] = cfg['tiled'] or any(modo in MODOS_BLOCOS for modo in modos)
+    
+    # Cada imagem paga uma ficha: mensagens com mais anexos que a rajada são cortadas
+    maximo = RATE_LIMITER.maximo_por_mensagem(ctx)
+    if maximo is not None and len(attachments) > maximo:
+        ignorados = attachments[maximo:]
+        attachments = attachments[:maximo]
+        await ctx.send(f"⚠️ No máximo {maximo} imagem(ns) por mensagem com os limites atuais; processando as primeiras "
+                       f"{maximo} e ignorando: {', '.join(a.filename for a in ignorados)}. Envie as demais em outra mensagem.")
+    
+    METRICAS.incrementar('pedidos')
+    METRICAS.incrementar('imagens', len(attachments))
+    
+    # Rejeitar cedo, antes de baixar os anexos; a fila cheia é vista antes de cobrar as fichas
+    if INFERENCE_EXECUTOR.cheia:
+        print("Pedido rejeitado: fila de inferência cheia")
+        INFERENCE_EXECUTOR.rejeitadas += 1
+        METRICAS.incrementar('rejeitados')
+        await ctx.send(f"⏳ O bot está ocupado processando outras imagens. Tente novamente em {math.ceil(INFERENCE_EXECUTOR.estimar_espera())} s.")
+        return
+    espera = RATE_LIMITER.verificar(ctx, len(attachments))
+    if espera > 0:
+        print(f"Pedido de {ctx.author.name} limitado (tente em {espera:.1f}s)")
+        METRICAS.incrementar('limitados')
+        await ctx.send(f"⏳ Muitos pedidos seguidos. Tente novamente em {math.ceil(espera)} s.")
+        return
+    
+    # Fila justa entre servidores (ou usuários, em mensagens diretas)
+    _CHAVE_PRIORIDADE.set(('guild', ctx.guild.id) if ctx.guild is not None else ('user', ctx.author.id))
+    inicio_pedido = time.perf_counter()
+    try:
+        print(f"Baixando {len(attachments)} imagem(ns)...")
+        # Baixar as imagens em paralelo
+        with medir_etapa('download'):
+            todos_bytes = await asyncio.gather(*(a.read() for a in attachments))
+        
+        # GIFs animados e vídeos seguem pelo modo de clipe, cada um com sua própria resposta
+        clipes = await asyncio.gather(*(asyncio.to_thread(eh_clipe, a.filename, dados) for a, dados in zip(attachments, todos_bytes)))
+        if any(clipes):
+            for a, dados, clipe in zip(attachments, todos_bytes, clipes):
+                if clipe:
+                    await responder_clipe(ctx, a.filename, dados, cfg)
+            attachments = [a for a, clipe in zip(attachments, clipes) if not clipe]
+            todos_bytes = [dados for dados, clipe in zip(todos_bytes, clipes) if not clipe]
+            if not attachments:
+                return
+        
+        # Reposts da mesma imagem com os mesmos parâmetros saem direto do cache
+        cache_keys = [chave_cache(image_bytes, cfg) for image_bytes in todos_bytes]
+        resultados = list(await asyncio.gather(*(DETECTION_CACHE.obter(key) for key in cache_keys)))
+        pendentes = [i for i, resultado in enumerate(resultados) if resultado is None]
+        METRICAS.incrementar('cache_hits', len(resultados) - len(pendentes))
+        METRICAS.incrementar('cache_misses', len(pendentes))
+        if len(pendentes) < len(resultados):
+            print(f"{len(resultados) - len(pendentes)} resultado(s) encontrado(s) no cache")
+            # Reposts entram nos totais do histórico; as linhas por objeto já foram gravadas na primeira vez
+            for resultado in resultados:
+                if resultado is not None:
+                    HISTORICO.registrar(ctx, cfg, resultado[2])
+        
+        progresso = RespostaProgressiva(cfg, pendentes, [r[2] for r in resultados if r is not None], inicio_pedido)
+        if pendentes:
+            # Mensagem enquanto processa; vira o resumo por classe assim que a inferência terminar
+            if len(attachments) == 1:
+                progresso.aviso = await ctx.send("Processando imagem... Aguarde um momento.")
+            else:
+                progresso.aviso = await ctx.send(f"Processando {len(pendentes)} imagens... Aguarde um momento.")
+            
+            async def processar(i):
+                try:
+                    return await processar_anexo(ctx, todos_bytes[i], cfg, cache_keys[i],
+                                                 lambda classes: progresso.inferida(i, classes))
+                finally:
+                    progresso.inferida(i)  # falhas também contam para liberar o resumo das demais
+            
+            # Decodificar, inferir (em um único lote) e renderizar as imagens em paralelo
+            print("Iniciando detecção com YOLO...")
+            processados = await asyncio.gather(*(processar(i) for i in pendentes), return_exceptions=True)
+            print("Detecção concluída. Processando resultados...")
+            for i, processado in zip(pendentes, processados):
+                resultados[i] = processado
+            METRICAS.incrementar('erros_imagem', sum(isinstance(r, Exception) for r in processados))
+            await progresso.aguardar()
+        
+        if len(attachments) == 1:
+            resultado = resultados[0]
+            if isinstance(resultado, Exception):
+                raise resultado
+            detection_message, output_bytes, _ = resultado
+            
+            # Enviar resultado direto da memória
+            print("Enviando resultado para o Discord...")
+            with medir_etapa('envio'):
+                if output_bytes:
+                    extensao = FORMATOS_SAIDA[cfg['output_format']][1]
+                    await ctx.send(detection_message, file=discord.File(io.BytesIO(output_bytes), filename=f"detection_result{extensao}"))
+                else:
+                    await ctx.send(detection_message)
+            progresso.registrar_primeira_resposta()
+            print("Resultado enviado com sucesso!")
+            return
+        
+        if all(isinstance(r, FilaCheiaError) for r in resultados):
+            raise resultados[0]
+        # Imagens recusadas pela fila não gastam a cota de quem pediu
+        RATE_LIMITER.devolver(ctx, sum(isinstance(r, FilaCheiaError) for r in resultados))
+        
+        # Uma única resposta com o resumo agregado e um arquivo anotado por imagem
+        nomes = [a.filename for a in attachments]
+        mensagem = montar_mensagem_agregada(nomes, resultados, cfg)
+        arquivos = [
+            (f"deteccao_{i+1}_{os.path.splitext(nome)[0]}{FORMATOS_SAIDA[cfg['output_format']][1]}", resultado[1])
+            for i, (nome, resultado) in enumerate(zip(nomes, resultados))
+            if not isinstance(resultado, Exception) and resultado[1]
+        ]
+        limite_bytes = ctx.guild.filesize_limit if ctx.guild is not None else 25 * 1024 * 1024
+        grupos = agrupar_arquivos(arquivos, limite_bytes) or [[]]
+        
+        print("Enviando resultado para o Discord...")
+        with medir_etapa('envio'):
+            for n, grupo in enumerate(grupos):
+                files = [discord.File(io.BytesIO(dados), filename=nome) for nome, dados in grupo]
+                await ctx.send(mensagem if n == 0 else None, files=files or None)
+                progresso.registrar_primeira_resposta()
+        print("Resultado enviado com sucesso!")
+        
+    except FilaCheiaError as fe:
+        print(f"Pedido rejeitado: {str(fe)}")
+        METRICAS.incrementar('rejeitados')
+        # Nenhuma imagem foi processada: devolver as fichas para que a nova tentativa não seja limitada
+        RATE_LIMITER.devolver(ctx, len(attachments))
+        await ctx.send(f"⏳ O bot está ocupado processando outras imagens. Tente novamente em {math.ceil(INFERENCE_EXECUTOR.estimar_espera())} s.")
+    except ImagemMuitoGrandeError as ge:
+        print(f"Imagem recusada: {str(ge)}")
+        await ctx.send(f"A imagem é grande demais para ser processada: {str(ge)}.")
+    except ErroInferencia as yolo_error:
+        print(f"ERRO na detecção YOLO: {str(yolo_error)}")
+        METRICAS.incrementar('erros')
+        await ctx.send(f"Erro ao processar a imagem com YOLO: {str(yolo_error)}")
+    except Exception as e:
+        print(f"ERRO na detecção: {str(e)}")
+        METRICAS.incrementar('erros')
+        await ctx.send(f"Ocorreu um erro ao processar a imagem: {str(e)}")
+    finally:
+        METRICAS.observar('total', time.perf_counter() - inicio_pedido)
+
+ORDEM_ETAPAS = ['download', 'espera_fila', 'decode', 'cores', 'inferencia', 'plot', 'texto', 'encode', 'resumo', 'envio',
+                'primeira_resposta', 'total']
+
+@bot.command()
+async def metrics(ctx):
+    """Mostra os histogramas de latência por etapa e os contadores do bot"""
+    if not METRICAS.habilitado:
+        await ctx.send("As métricas estão desativadas (METRICS_ENABLED=false).")
+        return
+    
+    with METRICAS._lock:
+        histogramas = {etapa: (h.total, h.soma, h.percentil(0.5), h.percentil(0.95), h.percentil(0.99))
+                       for etapa, h in METRICAS.histogramas.items()}
+        contadores = dict(METRICAS.contadores)
+    
+    linhas = [f"{'etapa':<12}{'n':>7}{'média':>9}{'p50':>9}{'p95':>9}{'p99':>9}"]
+    etapas = sorted(histogramas, key=lambda e: (ORDEM_ETAPAS.index(e) if e in ORDEM_ETAPAS else len(ORDEM_ETAPAS), e))
+    for etapa in etapas:
+        total, soma, p50, p95, p99 = histogramas[etapa]
+        linhas.append(f"{etapa:<12}{total:>7}{soma / total * 1000:>7.0f}ms{p50 * 1000:>7.0f}ms{p95 * 1000:>7.0f}ms{p99 * 1000:>7.0f}ms")
+    
+    msg = "**Métricas do Bot de Detecção YOLO**\n\n"
+    if etapas:
+        msg += "**Latência por etapa** (percentis aproximados pelos buckets):\n```\n" + "\n".join(linhas) + "\n```\n"
+    else:
+        msg += "Nenhuma detecção registrada ainda.\n\n"
+    
+    msg += "**Contadores:**\n"
+    for nome in ['pedidos', 'imagens', 'erros', 'erros_imagem', 'rejeitados', 'cache_hits', 'cache_misses']:
+        msg += f"- {nome}: {contadores.get(nome, 0)}\n"
+    consultas = contadores.get('cache_hits', 0) + contadores.get('cache_misses', 0)
+    if consultas:
+        msg += f"- Taxa de acerto do cache: {contadores.get('cache_hits', 0) / consultas * 100:.1f}%\n"
+    if METRICS_SERVER is not None:
+        msg += f"\nEndpoint Prometheus: http://{METRICS_HOST}:{METRICS_PORT}/metrics\n"
+    
+    await ctx.send(msg)
+
+HISTORICO_MAX_DIAS = 365
+
+def _dias_historico(valor, padrao=7):
+    dias = int(valor) if valor is not None else padrao
+    if not (1 <= dias <= HISTORICO_MAX_DIAS):
+        raise ValueError(f"o período deve estar entre 1 e {HISTORICO_MAX_DIAS} dias")
+    return dias
+
+@bot.command()
+async def historico(ctx, *args):
+    """Mostra o histórico de detecções deste canal (`!historico [classe] [dias]`)"""
+    if not HISTORICO.habilitado:
+        await ctx.send(f"O histórico de detecções está desativado ({HISTORICO.motivo_desativado}).")
+        return
+    
+    # Argumentos em qualquer ordem: número é o período, o resto é o nome da classe
+    numeros = [a for a in args if a.isdigit()]
+    classe = " ".join(a for a in args if not a.isdigit()).lower() or None
+    try:
+        dias = _dias_historico(numeros[0] if numeros else None)
+    except ValueError as e:
+        await ctx.send(f"Valor inválido: {str(e)}.")
+        return
+    
+    guild_id = ctx.guild.id if ctx.guild is not None else 0
+    inicio = time.perf_counter()
+    try:
+        (pedidos, objetos), linhas = await asyncio.to_thread(HISTORICO.historico_canal, guild_id, ctx.channel.id, dias, classe)
+    except sqlite3.Error as e:
+        print(f"Erro na consulta do histórico: {str(e)}")
+        await ctx.send(f"❌ Não foi possível consultar o histórico: {str(e)}")
+        return
+    duracao_ms = (time.perf_counter() - inicio) * 1000
+    
+    periodo = "hoje" if dias == 1 else f"últimos {dias} dias"
+    if classe is None:
+        msg = f"**Histórico deste canal ({periodo}):**\n"
+        msg += f"- Pedidos: {pedidos}\n"
+        msg += f"- Objetos detectados: {objetos}\n"
+        if linhas:
+            msg += "\n**Classes mais detectadas:**\n"
+            for i, (nome, total, em_pedidos) in enumerate(linhas):
+                msg += f"{i+1}. {nome}: {total} (em {em_pedidos} pedido(s))\n"
+    else:
+        total = sum(objetos_dia for _, objetos_dia, _ in linhas)
+        em_pedidos = sum(pedidos_dia for _, _, pedidos_dia in linhas)
+        msg = f"**{classe} neste canal ({periodo}):** {total} objeto(s) em {em_pedidos} de {pedidos} pedido(s)\n"
+        if linhas:
+            msg += "\n**Por dia:**\n"
+            for dia, objetos_dia, pedidos_dia in linhas:
+                msg += f"- {time.strftime('%Y-%m-%d', time.gmtime(dia * 86400))}: {objetos_dia} ({pedidos_dia} pedido(s))\n"
+    msg += f"\n*Consulta em {duracao_ms:.1f} ms*"
+    await ctx.send(msg)
+
+@bot.command()
+async def top(ctx, tipo='classes', dias=None):
+    """Ranking das classes (ou canais) mais detectadas neste servidor (`!top classes [dias]`, `!top canais [dias]`)"""
+    if not HISTORICO.habilitado:
+        await ctx.send(f"O histórico de detecções está desativado ({HISTORICO.motivo_desativado}).")
+        return
+    
+    tipo = tipo.lower()
+    if tipo not in ['classes', 'canais']:
+        await ctx.send("Tipo inválido! Use `!top classes [dias]` ou `!top canais [dias]`.")
+        return
+    try:
+        dias = _dias_historico(dias)
+    except ValueError as e:
+        await ctx.send(f"Valor inválido: {str(e)}.")
+        return
+    
+    guild_id = ctx.guild.id if ctx.guild is not None else 0
+    inicio = time.perf_counter()
+    try:
+        linhas = await asyncio.to_thread(HISTORICO.top, guild_id, tipo, dias)
+    except sqlite3.Error as e:
+        print(f"Erro na consulta do histórico: {str(e)}")
+        await ctx.send(f"❌ Não foi possível consultar o histórico: {str(e)}")
+        return
+    duracao_ms = (time.perf_counter() - inicio) * 1000
+    
+    periodo = "hoje" if dias == 1 else f"últimos {dias} dias"
+    onde = "neste servidor" if ctx.guild is not None else "nas mensagens diretas"
+    if tipo == 'classes':
+        msg = f"**Classes mais detectadas {onde} ({periodo}):**\n"
+        for i, (nome, total, em_pedidos, soma_conf) in enumerate(linhas):
+            msg += f"{i+1}. {nome}: {total} (em {em_pedidos} pedido(s), confiança média: {soma_conf / total:.2%})\n"
+    else:
+        msg = f"**Canais com mais objetos detectados {onde} ({periodo}):**\n"
+        for i, (canal_id, total, em_pedidos, _) in enumerate(linhas):
+            msg += f"{i+1}. <#{canal_id}>: {total} objeto(s)\n"
+    if not linhas:
+        msg += "Nenhuma detecção registrada no período.\n"
+    msg += f"\n*Consulta em {duracao_ms:.1f} ms*"
+    await ctx.send(msg)
+
+@bot.command()
+async def ajuda(ctx):
+    """Exibe informações de ajuda sobre o bot"""
+    help_text = """
+**Teste Bot de Detecção YOLO**
+
+**Comandos disponíveis:**
+`!detect` - Anexe uma ou mais imagens com este comando para detectar objetos nelas
+`!detect texto` - Igual ao `!detect`, mas responde só com o relatório, sem a imagem anotada
+`!detect blocos` - Analisa imagens grandes em blocos sobrepostos (acha objetos pequenos em mapas, multidões, scans)
+GIFs animados e vídeos (mp4, mov, webm, mkv, avi) são analisados quadro a quadro, com contagem por classe ao longo do tempo
+`!modelo [tamanho] [precisão]` - Verifica ou altera o tamanho (n, s, m, l, x) e a precisão (fp32, int8) do modelo deste servidor
+`!config [param] [valor]` - Verifica ou altera configurações de detecção
+`!comparar_int8 [tamanho]` - Compara velocidade e detecções do modelo INT8 com o FP32
+`!metrics` - Mostra latência por etapa e contadores de pedidos, erros e cache
+`!historico [classe] [dias]` - Pedidos e objetos detectados neste canal (ex.: `!historico car 7`)
+`!top classes [dias]` / `!top canais [dias]` - Classes e canais com mais detecções neste servidor
+`!ajuda` - Exibe esta mensagem de ajuda
+
+**Exemplos de uso:**
+1. `!detect` - Anexe uma imagem para detectar objetos
+2. `!modelo s` - Muda para o modelo small (mais preciso, mais lento)
+3. `!config confidence_threshold 0.3` - Reduz o limite de confiança para 0.3 (30%)
+4. `!config color_analysis false` - Desativa a análise de cores
+
+**Tamanhos de modelo disponíveis:**
+- `n` (nano): Mais rápido, menos preciso
+- `s` (small): Bom equilíbrio entre velocidade e precisão
+- `m` (medium): Médio porte, mais preciso
+- `l` (large): Grande, alta precisão
+- `x` (xlarge): Muito grande, precisão máxima, mais lento
+
+**Configurações disponíveis:**
+- `confidence_threshold`: Limite de confiança (0.0-1.0)
+- `max_objects`: Número máximo de objetos a mostrar nos detalhes
+- `color_analysis`: Análise de cores predominantes (true/false)
+- `color_mode`: Método da análise de cores (quantizado, kmeans, mediancut)
+- `box_colors`: Mostra a cor dominante de cada objeto detectado (true/false)
+- `batch_window_ms`: Janela (ms) para agrupar pedidos simultâneos em um lote
+- `max_batch_size`: Número máximo de imagens por lote de inferência
+- `backend`: Runtime de inferência em CPU (torch, onnx, openvino, torchscript)
+- `precision`: Precisão do modelo (fp32, int8, int8-dinamico)
+- `adaptive_size`: Reduz o tamanho do modelo automaticamente em horários de pico (true/false)
+- `latency_slo_ms`: Meta de latência (p95, ms) usada pelo modo adaptativo
+- `decode_target`: Maior lado (px) em que as imagens são decodificadas e anotadas
+- `max_megapixels`: Tamanho máximo aceito das imagens, em megapixels
+- `output_format` / `output_quality`: Formato (jpeg, webp, png) e qualidade da imagem anotada
+- `preview_max_side`: Envia uma prévia reduzida a este maior lado (0 desativa)
+- `user_rate_per_min` / `user_burst`: Imagens por minuto e rajada máxima por usuário (0 desativa)
+- `guild_rate_per_min` / `guild_burst`: Imagens por minuto e rajada máxima por servidor (0 desativa)
+- `clip_fps`: Quadros por segundo analisados em GIFs animados e vídeos
+- `clip_scene_threshold`: Sensibilidade à mudança de cena (0-255, 0 desativa)
+- `clip_max_frames`: Máximo de quadros analisados por clipe
+- `clip_output`: Resposta dos clipes (gif anotado ou folha de contato)
+- `tiled`: Usa sempre a inferência em blocos (true/false)
+- `tile_size` / `tile_overlap`: Lado dos blocos (px) e fração de sobreposição entre eles
+- `tile_max_side`: Maior lado (px) em que as imagens são decodificadas no modo em blocos
+    """
+    for parte in dividir_mensagem(help_text):
+        await ctx.send(parte)
+
+@bot.command()
+async def status(ctx):
+    """Mostra o status atual do bot e downloads em andamento"""
+    global DOWNLOADS_EM_ANDAMENTO, CONFIG
+    
+    status_msg = "**Status do Bot de Detecção YOLO**\n\n"
+    
+    # Informações do modelo
+    status_msg += f"**Modelo Atual:** YOLOv8{tamanho_modelo(ctx)}\n"
+    if CONFIG['adaptive_size']:
+        base = tamanho_modelo(ctx)
+        variante = variante_modelo({'backend': CONFIG['backend'], 'precision': precisao_modelo(ctx)})
+        p95 = ADAPTATIVO.p95(base, variante)
+        p95_texto = f"{p95 * 1000:.0f}ms" if p95 is not None else "-"
+        status_msg += (f"**Modo Adaptativo:** usando YOLOv8{ADAPTATIVO.tamanho(base, variante)} "
+                       f"({ADAPTATIVO.reducao(base, variante)} degrau(s) abaixo; p95 {p95_texto} / SLO {CONFIG['latency_slo_ms']}ms; "
+                       f"{ADAPTATIVO.mudancas} mudança(s))\n")
+    status_msg += f"**Configurações:**\n"
+    for key, value in CONFIG.items():
+        status_msg += f"- {key}: {value}\n"
+    
+    # Downloads em andamento
+    if DOWNLOADS_EM_ANDAMENTO:
+        status_msg += "\n**Downloads em Andamento:**\n"
+        for size, info in DOWNLOADS_EM_ANDAMENTO.items():
+            status = info['status']
+            if status == 'downloading':
+                percent = info['percent']
+                status_msg += f"- YOLOv8{size}: {percent}% | {'▓' * (percent // 10)}{'░' * (10 - percent // 10)}\n"
+            elif status == 'completed':
+                status_msg += f"- YOLOv8{size}: ✅ Concluído\n"
+            elif status == 'error':
+                error = info.get('error', 'desconhecido')
+                status_msg += f"- YOLOv8{size}: ❌ Erro ({error})\n"
+            else:
+                status_msg += f"- YOLOv8{size}: {status}\n"
+
+    # Modelos carregados
+    status_msg += "\n**Modelos Carregados:**\n"
+    status_msg += f"- Ocupação: {MODEL_POOL.bytes_usados / (1024**2):.0f}MB / {MODEL_POOL.orcamento_bytes / (1024**2):.0f}MB\n"
+    for size, backend, bytes_modelo in reversed(MODEL_POOL.residentes()):
+        servidores = sum(1 for s in GUILD_MODEL_SIZE.values() if s == size)
+        status_msg += f"- YOLOv8{size} ({backend}): {bytes_modelo / (1024**2):.0f}MB ({servidores} servidor(es) com seleção própria)\n"
+    if MODEL_POOL.bytes_drenando:
+        status_msg += f"- Drenando: {MODEL_POOL.bytes_drenando / (1024**2):.0f}MB de modelo(s) despejado(s) com pedidos em andamento\n"
+    status_msg += f"- Carregamentos: {MODEL_POOL.carregamentos} | Descarregados: {MODEL_POOL.evictions} | Pedidos em andamento: {MODEL_POOL.em_uso}\n"
+
+    # Latência medida de cada backend
+    if BACKEND_LATENCIA:
+        status_msg += f"\n**Latência por Backend (YOLOv8{CONFIG['model_size']}):**\n"
+        for backend, latencia in BACKEND_LATENCIA.items():
+            atual = " ← atual" if backend == CONFIG['backend'] else ""
+            status_msg += f"- {backend}: {f'{latencia:.1f}ms' if isinstance(latencia, float) else latencia}{atual}\n"
+
+    # Fila de inferência
+    espera_media, espera_p95 = INFERENCE_EXECUTOR.estatisticas_espera()
+    status_msg += "\n**Fila de Inferência:**\n"
+    status_msg += f"- Workers: {INFERENCE_EXECUTOR.workers} (em execução: {INFERENCE_EXECUTOR.executando})\n"
+    status_msg += f"- Na fila: {INFERENCE_EXECUTOR.profundidade}/{INFERENCE_EXECUTOR.max_fila}\n"
+    status_msg += f"- Espera na fila: média {espera_media * 1000:.0f}ms, p95 {espera_p95 * 1000:.0f}ms\n"
+    status_msg += f"- Tarefas enfileiradas: {INFERENCE_EXECUTOR.enfileiradas} | concluídas: {INFERENCE_EXECUTOR.concluidas} | rejeitadas (fila cheia): {INFERENCE_EXECUTOR.rejeitadas}\n"
+    status_msg += f"- Pedidos aceitos pelo limite de taxa: {RATE_LIMITER.aceitos} | limitados: {RATE_LIMITER.limitados}\n"
+    if MICRO_BATCHER.lotes:
+        media_lote = MICRO_BATCHER.imagens / MICRO_BATCHER.lotes
+        status_msg += f"- Lotes: {MICRO_BATCHER.lotes} (média {media_lote:.1f} imagens/lote, maior {MICRO_BATCHER.maior_lote})\n"
+
+    # Perfil de runtime da CPU
+    if PERFIL_RUNTIME is not None:
+        status_msg += (f"\n**Runtime:** {PERFIL_RUNTIME['processos']} processo(s) x {PERFIL_RUNTIME['threads']} thread(s), "
+                       f"interop {PERFIL_RUNTIME['interop']}{', afinidade de núcleos' if PERFIL_RUNTIME['afinidade'] else ''} "
+                       f"({PERFIL_RUNTIME['imagens_por_s']:.1f} img/s no ajuste; perfil {PERFIL_RUNTIME['origem']}, {PERFIL_RUNTIME['data']})\n")
+
+    # Processos de inferência
+    if PROCESSOS_INFERENCIA is not None and PROCESSOS_INFERENCIA.ativo:
+        status_msg += "\n**Processos de Inferência:**\n"
+        for p in PROCESSOS_INFERENCIA.processos:
+            latencias = sorted(p.latencias)
+            p50 = f"{latencias[len(latencias) // 2] * 1000:.0f}ms" if latencias else "-"
+            modelos = ', '.join(os.path.basename(artefato) for artefato, _ in p.modelos) or 'nenhum'
+            status_msg += (f"- #{p.indice} (pid {p.processo.pid}) {'✅' if p.vivo else '❌'}: {p.pedidos} lote(s), "
+                           f"{p.imagens} imagem(ns), p50 {p50}, erros {p.erros}, reinícios {p.reinicios} | {modelos}\n")
+    
+    # Cache de detecções
+    if DETECTION_CACHE.habilitado:
+        consultas = DETECTION_CACHE.hits + DETECTION_CACHE.misses
+        taxa = DETECTION_CACHE.hits / consultas if consultas else 0
+        status_msg += "\n**Cache de Detecções:**\n"
+        status_msg += f"- Entradas: {len(DETECTION_CACHE)}/{DETECTION_CACHE.max_entradas} ({DETECTION_CACHE.bytes_usados / (1024**2):.1f}MB / {DETECTION_CACHE.max_bytes / (1024**2):.0f}MB)\n"
+        status_msg += f"- Hits: {DETECTION_CACHE.hits} (disco: {DETECTION_CACHE.hits_disco}) | Misses: {DETECTION_CACHE.misses} | Taxa: {taxa:.0%}\n"
+        status_msg += f"- Evictions: {DETECTION_CACHE.evictions}\n"
+    
+    # Histórico de detecções
+    if HISTORICO.habilitado:
+        status_msg += "\n**Histórico de Detecções:**\n"
+        status_msg += (f"- {HISTORICO.caminho}: {HISTORICO.gravados} pedido(s) gravado(s) em {HISTORICO.lotes} lote(s), "
+                       f"{HISTORICO.pendentes} na fila, {HISTORICO.descartados} descartado(s), {HISTORICO.erros} erro(s)\n")
+    elif HISTORICO.erro_inicio:
+        status_msg += f"\n**Histórico de Detecções:** desativado ({HISTORICO.erro_inicio})\n"
+    
+    # Informações do sistema
+    status_msg += "\n**Informações do Sistema:**\n"
+    try:
+        import psutil
+        # Uso de memória
+        mem = psutil.virtual_memory()
+        status_msg += f"- Memória: {mem.percent}% usado ({mem.used / (1024**3):.1f}GB / {mem.total / (1024**3):.1f}GB)\n"
+        # Uso de CPU
+        status_msg += f"- CPU: {psutil.cpu_percent()}% usado\n"
+    except ImportError:
+        status_msg += "- Informações do sistema não disponíveis (psutil não instalado)\n"
+    
+    # Tempo online
+    import time
+    try:
+        uptime = time.time() - bot.start_time
+        hours, rem = divmod(uptime, 3600)
+        minutes, seconds = divmod(rem, 60)
+        status_msg += f"- Tempo online: {int(hours)}h {int(minutes)}m {int(seconds)}s\n"
+    except:
+        pass
+    
+    # Tempo até ficar pronto (import, carregamento e aquecimento do modelo)
+    if INICIALIZACAO['pronto']:
+        detalhes = []
+        if INICIALIZACAO['tempo_modelo'] is not None:
+            detalhes.append(f"modelo {INICIALIZACAO['tempo_modelo']:.1f}s")
+        if INICIALIZACAO['tempo_aquecimento'] is not None:
+            detalhes.append(f"aquecimento {INICIALIZACAO['tempo_aquecimento']:.1f}s")
+        status_msg += f"- Pronto em: {INICIALIZACAO['tempo_ate_pronto']:.1f}s" + (f" ({', '.join(detalhes)})" if detalhes else "") + "\n"
+        if INICIALIZACAO['erro']:
+            status_msg += f"- Erro na inicialização: {INICIALIZACAO['erro']}\n"
+    else:
+        status_msg += f"- Inicializando: {INICIALIZACAO['etapa']} ({time.time() - INICIO_PROCESSO:.0f}s)\n"
+    
+    for parte in dividir_mensagem(status_msg):
+        await ctx.send(parte)
+
+# Iniciar o bot
+if __name__ == "__main__":
+    token = os.getenv('DISCORD_TOKEN')
+    if token:
+        bot.run(token)
+    else:
         print("Token do Discord não encontrado. Verifique seu arquivo config.env")
\ No newline at end of file
@@ -0,0 +1,85 @@
+"""Modo adaptativo: degrau por tamanho configurado e variante, e aquecimento da variante que atende."""
+import asyncio
+import contextlib
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import bot  # noqa: E402
+
+
+class PoolFalso:
+    def __init__(self):
+        self.obtidos = []
+
+    def carregado(self, size, backend=None):
+        return False
+
+    async def obter(self, size, ctx=None, backend=None):
+        self.obtidos.append((size, backend))
+        return (size, backend)
+
+    @contextlib.contextmanager
+    def emprestimo(self, modelo):
+        yield modelo
+
+
+@pytest.fixture
+def controlador(monkeypatch):
+    monkeypatch.setitem(bot.CONFIG, 'adaptive_size', True)
+    monkeypatch.setitem(bot.CONFIG, 'latency_slo_ms', 100)
+    monkeypatch.setattr(bot, 'ADAPTIVE_MIN_AMOSTRAS', 3)
+    monkeypatch.setattr(bot, 'ADAPTIVE_COOLDOWN_S', 0)
+    pool = PoolFalso()
+    aquecidos = []
+
+    async def preparar(modelo):
+        aquecidos.append(modelo)
+
+    monkeypatch.setattr(bot, 'MODEL_POOL', pool)
+    monkeypatch.setattr(bot, 'preparar_em_segundo_plano', preparar)
+    return bot.ControladorAdaptativo(), pool, aquecidos
+
+
+async def registrar_lentas(adaptativo, base, variante, vezes=3):
+    for _ in range(vezes):
+        adaptativo.registrar(1.0, base, variante)
+    # Deixar a troca de degrau (carregar e aquecer) terminar
+    for _ in range(5):
+        await asyncio.sleep(0)
+
+
+def test_desce_um_degrau_aquecendo_a_variante_configurada(controlador):
+    adaptativo, pool, aquecidos = controlador
+    asyncio.run(registrar_lentas(adaptativo, 'x', 'int8'))
+    assert pool.obtidos == [('l', 'int8')]
+    assert aquecidos == [('l', 'int8')]
+    assert adaptativo.tamanho('x', 'int8') == 'l'
+    assert adaptativo.mudancas == 1
+
+
+def test_estado_separado_por_tamanho_e_variante(controlador):
+    adaptativo, _, _ = controlador
+    asyncio.run(registrar_lentas(adaptativo, 'x', 'torch'))
+    assert adaptativo.tamanho('x', 'torch') == 'l'
+    # Outros tamanhos configurados e outras variantes não herdam a redução
+    assert adaptativo.tamanho('n', 'torch') == 'n'
+    assert adaptativo.tamanho('m', 'torch') == 'm'
+    assert adaptativo.tamanho('x', 'int8') == 'x'
+    assert adaptativo.p95('n', 'torch') is None
+
+
+def test_menor_tamanho_nao_desce(controlador):
+    adaptativo, pool, _ = controlador
+    asyncio.run(registrar_lentas(adaptativo, 'n', 'torch'))
+    assert pool.obtidos == []
+    assert adaptativo.tamanho('n', 'torch') == 'n'
+
+
+def test_desligado_usa_o_configurado(controlador, monkeypatch):
+    adaptativo, _, _ = controlador
+    asyncio.run(registrar_lentas(adaptativo, 'x', 'torch'))
+    monkeypatch.setitem(bot.CONFIG, 'adaptive_size', False)
+    assert adaptativo.tamanho('x', 'torch') == 'x'
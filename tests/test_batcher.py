@@ -0,0 +1,94 @@
+"""Micro-lotes: pedidos simultâneos numa só passada do modelo, erros e cancelamento."""
+import asyncio
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import bot  # noqa: E402
+
+
+class ExecutorFalso:
+    def __init__(self, erro=None, bloquear=False):
+        self.lotes = []
+        self.tarefas = []
+        self.erro = erro
+        self.bloquear = bloquear
+
+    async def executar(self, func, modelo, sources, conf):
+        self.lotes.append((modelo, list(sources), conf))
+        self.tarefas.append(asyncio.current_task())
+        if self.bloquear:
+            await asyncio.Event().wait()
+        if self.erro:
+            raise self.erro
+        return [f'det-{source}' for source in sources]
+
+
+@pytest.fixture(autouse=True)
+def janela(monkeypatch):
+    monkeypatch.setitem(bot.CONFIG, 'batch_window_ms', 20)
+    monkeypatch.setitem(bot.CONFIG, 'max_batch_size', 8)
+
+
+def test_pedidos_simultaneos_no_mesmo_lote():
+    executor = ExecutorFalso()
+    batcher = bot.MicroBatcher(executor)
+
+    async def principal():
+        return await asyncio.gather(*(batcher.inferir('modelo', 'n', 0.25, i) for i in range(3)))
+
+    assert asyncio.run(principal()) == ['det-0', 'det-1', 'det-2']
+    assert executor.lotes == [('modelo', [0, 1, 2], 0.25)]
+    assert (batcher.lotes, batcher.imagens, batcher.maior_lote) == (1, 3, 3)
+
+
+def test_confiancas_diferentes_em_lotes_separados():
+    executor = ExecutorFalso()
+    batcher = bot.MicroBatcher(executor)
+
+    async def principal():
+        return await asyncio.gather(batcher.inferir('modelo', 'n', 0.25, 'a'), batcher.inferir('modelo', 'n', 0.5, 'b'))
+
+    assert asyncio.run(principal()) == ['det-a', 'det-b']
+    assert sorted(conf for _, _, conf in executor.lotes) == [0.25, 0.5]
+
+
+def test_lote_cheio_dispara_sem_esperar_a_janela(monkeypatch):
+    monkeypatch.setitem(bot.CONFIG, 'batch_window_ms', 60000)
+    monkeypatch.setitem(bot.CONFIG, 'max_batch_size', 2)
+    batcher = bot.MicroBatcher(ExecutorFalso())
+
+    async def principal():
+        return await asyncio.wait_for(
+            asyncio.gather(batcher.inferir('modelo', 'n', 0.25, 1), batcher.inferir('modelo', 'n', 0.25, 2)), 5
+        )
+
+    assert asyncio.run(principal()) == ['det-1', 'det-2']
+
+
+def test_erro_do_lote_chega_a_todos():
+    batcher = bot.MicroBatcher(ExecutorFalso(erro=bot.FilaCheiaError('cheia')))
+
+    async def principal():
+        return await asyncio.gather(*(batcher.inferir('modelo', 'n', 0.25, i) for i in range(2)), return_exceptions=True)
+
+    resultados = asyncio.run(principal())
+    assert all(isinstance(r, bot.FilaCheiaError) for r in resultados)
+
+
+def test_lote_cancelado_nao_deixa_pedidos_pendentes():
+    executor = ExecutorFalso(bloquear=True)
+    batcher = bot.MicroBatcher(executor)
+
+    async def principal():
+        pedidos = asyncio.gather(*(batcher.inferir('modelo', 'n', 0.25, i) for i in range(2)), return_exceptions=True)
+        while not executor.tarefas:
+            await asyncio.sleep(0.01)
+        # Ex.: desligamento cancelando as tarefas pendentes
+        executor.tarefas[0].cancel()
+        return await asyncio.wait_for(pedidos, 5)
+
+    resultados = asyncio.run(principal())
+    assert all(isinstance(r, asyncio.CancelledError) for r in resultados)
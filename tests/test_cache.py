@@ -0,0 +1,77 @@
+"""Cache de detecções: chave por conteúdo e parâmetros, LRU, TTL, limite de bytes e tier em disco."""
+import asyncio
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import bot  # noqa: E402
+
+
+def cfg(**mudancas):
+    return dict(bot.CONFIG, **dict({'tamanho_configurado': bot.CONFIG['model_size']}, **mudancas))
+
+
+def test_chave_muda_com_o_conteudo_e_os_parametros():
+    base = bot.chave_cache(b'imagem', cfg())
+    assert bot.chave_cache(b'imagem', cfg()) == base
+    assert bot.chave_cache(b'outra', cfg()) != base
+    assert bot.chave_cache(b'imagem', cfg(confidence_threshold=0.9)) != base
+    assert bot.chave_cache(b'imagem', cfg(text_only=True)) != base
+    # Mesmo tamanho efetivo, mas vindo do modo adaptativo a partir de outro configurado
+    assert bot.chave_cache(b'imagem', cfg(tamanho_configurado='x')) != base
+    assert bot.chave_cache(b'imagem', cfg(adaptive_size=not bot.CONFIG['adaptive_size'])) != base
+
+
+def test_lru_por_entradas():
+    cache = bot.DetectionCache(2, 1024 * 1024, 60)
+
+    async def principal():
+        await cache.guardar('a', 'msg a', b'1', [])
+        await cache.guardar('b', 'msg b', b'2', [])
+        await cache.obter('a')  # 'a' passa a ser a mais recente
+        await cache.guardar('c', 'msg c', b'3', [])
+        return [await cache.obter(chave) for chave in 'abc']
+
+    a, b, c = asyncio.run(principal())
+    assert a == ('msg a', b'1', [])
+    assert b is None
+    assert c == ('msg c', b'3', [])
+    assert cache.evictions == 1
+
+
+def test_limite_de_bytes():
+    cache = bot.DetectionCache(10, 100, 60)
+
+    async def principal():
+        await cache.guardar('grande', '', b'x' * 200, [])  # maior que o cache inteiro: ignorada
+        await cache.guardar('a', '', b'x' * 60, [])
+        await cache.guardar('b', '', b'x' * 60, [])
+        return await cache.obter('grande'), await cache.obter('a'), await cache.obter('b')
+
+    grande, a, b = asyncio.run(principal())
+    assert grande is None and a is None and b is not None
+    assert cache.bytes_usados == 60
+
+
+def test_ttl_expira(monkeypatch):
+    cache = bot.DetectionCache(10, 1024, 60)
+    agora = [1000.0]
+    monkeypatch.setattr(bot.time, 'time', lambda: agora[0])
+
+    asyncio.run(cache.guardar('a', 'msg', b'1', []))
+    agora[0] += 61
+    assert asyncio.run(cache.obter('a')) is None
+    assert len(cache) == 0
+
+
+def test_tier_em_disco_sobrevive_a_reinicio(tmp_path):
+    asyncio.run(bot.DetectionCache(10, 1024, 60, str(tmp_path)).guardar('a', 'msg', b'img', [('carro', 2, 0.9)]))
+    reiniciado = bot.DetectionCache(10, 1024, 60, str(tmp_path))
+    assert asyncio.run(reiniciado.obter('a')) == ('msg', b'img', [('carro', 2, 0.9)])
+    assert reiniciado.hits_disco == 1
+
+
+def test_desabilitado_nao_guarda():
+    cache = bot.DetectionCache(0, 1024, 60)
+    asyncio.run(cache.guardar('a', 'msg', b'1', []))
+    assert asyncio.run(cache.obter('a')) is None
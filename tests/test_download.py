@@ -0,0 +1,104 @@
+"""Downloads de modelos contra um servidor aiohttp local (retomada e verificação de checksum)."""
+import asyncio
+import hashlib
+import os
+import sys
+
+import pytest
+from aiohttp import web
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import bot  # noqa: E402
+
+PESOS = os.urandom(256 * 1024 + 123)
+DIGEST = hashlib.sha256(PESOS).hexdigest()
+
+
+async def servir_pesos(request):
+    inicio = 0
+    if request.headers.get('Range'):
+        inicio = int(request.headers['Range'].split('=')[1].rstrip('-'))
+        if inicio >= len(PESOS):
+            return web.Response(status=416)
+        return web.Response(
+            status=206,
+            body=PESOS[inicio:],
+            headers={'Content-Range': f'bytes {inicio}-{len(PESOS) - 1}/{len(PESOS)}'},
+        )
+    return web.Response(body=PESOS)
+
+
+async def baixar(tmp_path, publicado=None):
+    """Sobe o servidor, baixa yolov8n.pt para tmp_path e retorna os pedidos recebidos"""
+    pedidos = []
+
+    @web.middleware
+    async def registrar(request, handler):
+        pedidos.append((request.path, request.headers.get('Range')))
+        return await handler(request)
+
+    app = web.Application(middlewares=[registrar])
+    app.router.add_get('/yolov8n.pt', servir_pesos)
+    if publicado:
+        async def servir_checksum(request):
+            return web.Response(text=f"{publicado}  yolov8n.pt\n")
+        app.router.add_get('/yolov8n.pt.sha256', servir_checksum)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, '127.0.0.1', 0)
+    await site.start()
+    porta = site._server.sockets[0].getsockname()[1]
+    try:
+        downloader = bot.ModelDownloader(f'http://127.0.0.1:{porta}', tentativas=1, chunk_size=64 * 1024)
+        await downloader.baixar('n', str(tmp_path / 'yolov8n.pt'))
+    finally:
+        await runner.cleanup()
+    return pedidos
+
+
+@pytest.fixture(autouse=True)
+def isolado(tmp_path, monkeypatch):
+    monkeypatch.setattr(bot, 'MODEL_SHA256', {})
+    monkeypatch.setattr(bot, 'MODEL_SHA256_FILE', str(tmp_path / 'modelos.sha256'))
+
+
+def test_checksum_configurado_confere(tmp_path, monkeypatch):
+    monkeypatch.setattr(bot, 'MODEL_SHA256', {'n': DIGEST})
+    asyncio.run(baixar(tmp_path))
+    assert (tmp_path / 'yolov8n.pt').read_bytes() == PESOS
+    assert not (tmp_path / 'yolov8n.pt.part').exists()
+
+
+def test_checksum_invalido_descarta_o_parcial(tmp_path, monkeypatch):
+    monkeypatch.setattr(bot, 'MODEL_SHA256', {'n': '0' * 64})
+    with pytest.raises(bot.DownloadError, match='checksum inválido'):
+        asyncio.run(baixar(tmp_path))
+    assert not (tmp_path / 'yolov8n.pt').exists()
+    assert not (tmp_path / 'yolov8n.pt.part').exists()
+
+
+def test_checksum_publicado_e_verificado(tmp_path):
+    with pytest.raises(bot.DownloadError):
+        asyncio.run(baixar(tmp_path, publicado='f' * 64))
+    asyncio.run(baixar(tmp_path, publicado=DIGEST))
+    assert (tmp_path / 'yolov8n.pt').read_bytes() == PESOS
+
+
+def test_primeiro_download_fixa_o_checksum(tmp_path):
+    asyncio.run(baixar(tmp_path))
+    assert bot.ler_checksums_fixados() == {'n': DIGEST}
+
+    # Um próximo download adulterado é recusado pelo checksum fixado
+    os.remove(tmp_path / 'yolov8n.pt')
+    adulterado = hashlib.sha256(b'outro').hexdigest()
+    bot.fixar_checksum('n', adulterado)
+    with pytest.raises(bot.DownloadError, match='checksum inválido'):
+        asyncio.run(baixar(tmp_path))
+
+
+def test_retoma_download_parcial(tmp_path, monkeypatch):
+    monkeypatch.setattr(bot, 'MODEL_SHA256', {'n': DIGEST})
+    (tmp_path / 'yolov8n.pt.part').write_bytes(PESOS[:100000])
+    pedidos = asyncio.run(baixar(tmp_path))
+    assert ('/yolov8n.pt', 'bytes=100000-') in pedidos
+    assert (tmp_path / 'yolov8n.pt').read_bytes() == PESOS
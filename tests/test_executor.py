@@ -0,0 +1,97 @@
+"""Admissão e ordem (justa entre servidores) da fila do executor de inferência."""
+import asyncio
+import os
+import sys
+import threading
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import bot  # noqa: E402
+
+
+def test_mensagem_cheia_com_um_worker_nao_e_rejeitada():
+    # Tamanho padrão da fila em uma máquina de um núcleo
+    executor = bot.InferenceExecutor(1, bot.INFERENCE_QUEUE_MAX)
+    liberar = threading.Event()
+
+    async def principal():
+        ocupada = asyncio.ensure_future(executor.executar(liberar.wait, 5))
+        await asyncio.sleep(0.05)
+        anexos = [asyncio.ensure_future(executor.executar(lambda i=i: i)) for i in range(bot.MAX_FILES_PER_MESSAGE)]
+        await asyncio.sleep(0.05)
+        liberar.set()
+        await ocupada
+        return await asyncio.gather(*anexos)
+
+    assert asyncio.run(principal()) == list(range(bot.MAX_FILES_PER_MESSAGE))
+    assert executor.rejeitadas == 0
+
+
+async def submeter(executor, chave, rotulo, ordem):
+    bot._CHAVE_PRIORIDADE.set(chave)
+    return await executor.executar(ordem.append, rotulo)
+
+
+def test_fila_justa_entre_servidores():
+    executor = bot.InferenceExecutor(1, 20)
+    liberar = threading.Event()
+    ordem = []
+
+    async def principal():
+        ocupada = asyncio.ensure_future(executor.executar(liberar.wait, 5))
+        await asyncio.sleep(0.05)
+        tarefas = [asyncio.ensure_future(submeter(executor, ('guild', 1), f'a{i}', ordem)) for i in range(3)]
+        await asyncio.sleep(0.01)
+        tarefas.append(asyncio.ensure_future(submeter(executor, ('guild', 2), 'b0', ordem)))
+        await asyncio.sleep(0.05)
+        liberar.set()
+        await asyncio.gather(ocupada, *tarefas)
+
+    asyncio.run(principal())
+    # O servidor 2 passa na frente do segundo pedido do servidor 1
+    assert ordem == ['a0', 'b0', 'a1', 'a2']
+
+
+def test_segundo_plano_roda_depois_e_nao_ocupa_a_fila():
+    executor = bot.InferenceExecutor(1, 1)
+    liberar = threading.Event()
+    ordem = []
+
+    async def principal():
+        ocupada = asyncio.ensure_future(executor.executar(liberar.wait, 5))
+        await asyncio.sleep(0.05)
+        fundo = asyncio.ensure_future(submeter(executor, bot.CHAVE_SEGUNDO_PLANO, 'fundo', ordem))
+        await asyncio.sleep(0.01)
+        assert executor.profundidade == 0
+        pedido = asyncio.ensure_future(submeter(executor, ('guild', 1), 'pedido', ordem))
+        await asyncio.sleep(0.05)
+        liberar.set()
+        await asyncio.gather(ocupada, fundo, pedido)
+
+    asyncio.run(principal())
+    assert ordem == ['pedido', 'fundo']
+
+
+def test_fila_cheia_rejeita_e_cancelamento_libera_a_vaga():
+    executor = bot.InferenceExecutor(1, 1)
+    liberar = threading.Event()
+
+    async def principal():
+        ocupada = asyncio.ensure_future(executor.executar(liberar.wait, 5))
+        await asyncio.sleep(0.05)
+        esperando = asyncio.ensure_future(executor.executar(lambda: 'ok'))
+        await asyncio.sleep(0.01)
+        try:
+            await executor.executar(lambda: 'excesso')
+            rejeitada = False
+        except bot.FilaCheiaError:
+            rejeitada = True
+        esperando.cancel()
+        await asyncio.sleep(0.01)
+        profundidade = executor.profundidade
+        liberar.set()
+        await ocupada
+        return rejeitada, profundidade
+
+    rejeitada, profundidade = asyncio.run(principal())
+    assert rejeitada and executor.rejeitadas == 1
+    assert profundidade == 0
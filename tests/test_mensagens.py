@@ -0,0 +1,18 @@
+"""Divisão de textos longos em mensagens dentro do limite do Discord."""
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import bot  # noqa: E402
+
+
+def test_quebra_entre_linhas():
+    texto = "a" * 6 + "\n" + "b" * 6 + "\n"
+    assert bot.dividir_mensagem(texto, limite=10) == ["a" * 6 + "\n", "b" * 6 + "\n"]
+
+
+def test_linha_maior_que_o_limite_nao_e_truncada():
+    texto = "inicio\n" + "x" * 25 + "\nfim\n"
+    partes = bot.dividir_mensagem(texto, limite=10)
+    assert "".join(partes) == texto
+    assert all(len(parte) <= 10 for parte in partes)
@@ -0,0 +1,49 @@
+"""Pipeline do detect em memória: bytes do anexo → arrays → imagem anotada em bytes, sem arquivos."""
+import io
+import os
+import sys
+
+import numpy as np
+from PIL import Image
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import bot  # noqa: E402
+
+
+def jpeg(largura, altura, cor=(10, 200, 30)):
+    buffer = io.BytesIO()
+    Image.new('RGB', (largura, altura), cor).save(buffer, format='JPEG')
+    return buffer.getvalue()
+
+
+def test_decodifica_da_memoria_em_bgr():
+    image, array, original = bot.preparar_imagem(jpeg(320, 240))
+    assert original == (320, 240)
+    assert image.mode == 'RGB' and image.size == (320, 240)
+    assert array.shape == (240, 320, 3) and array.flags['C_CONTIGUOUS']
+    # Canais invertidos para o YOLO (BGR)
+    b, g, r = array[120, 160]
+    assert abs(int(r) - 10) < 8 and abs(int(g) - 200) < 8 and abs(int(b) - 30) < 8
+
+
+def test_imagem_grande_decodificada_reduzida():
+    image, array, original = bot.preparar_imagem(jpeg(2560, 1920), lado_alvo=640)
+    assert original == (2560, 1920)
+    assert 640 <= max(image.size) < 2560
+    assert array.shape[:2] == image.size[::-1]
+
+
+def test_pipeline_nao_grava_arquivos(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    image, _, original = bot.preparar_imagem(jpeg(320, 240))
+    deteccoes = {
+        'xyxy': np.array([[10.0, 10.0, 100.0, 90.0]]),
+        'conf': np.array([0.7]),
+        'cls': np.array([0.0]),
+        'names': {0: 'pessoa'},
+    }
+    mensagem, dados, classes = bot.renderizar_deteccao(deteccoes, image, dict(bot.CONFIG), '', original)
+    assert 'pessoa' in mensagem
+    assert classes[0][:2] == ('pessoa', 1)
+    assert Image.open(io.BytesIO(dados)).size[0] > 0
+    assert os.listdir(tmp_path) == []
@@ -0,0 +1,35 @@
+"""Com processos de inferência, o processo do bot não carrega torch nem ultralytics."""
+import os
+import subprocess
+import sys
+import textwrap
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+RENDERIZAR = textwrap.dedent("""
+    import sys
+    import numpy as np
+    from PIL import Image
+    import bot
+
+    assert bot.INFERENCE_PROCESSES > 0
+    deteccoes = {
+        'xyxy': np.array([[10.0, 10.0, 80.0, 90.0]]),
+        'conf': np.array([0.8]),
+        'cls': np.array([3.0]),
+        'names': {3: 'carro'},
+    }
+    _, dados, _ = bot.renderizar_deteccao(deteccoes, Image.new('RGB', (200, 150)), dict(bot.CONFIG), '')
+    assert dados
+    print(sorted(m for m in ('torch', 'ultralytics') if m in sys.modules))
+""")
+
+
+def test_renderizar_nao_importa_torch(tmp_path):
+    env = dict(os.environ, INFERENCE_PROCESSES='1', PYTHONPATH=RAIZ)
+    saida = subprocess.run(
+        [sys.executable, '-c', RENDERIZAR], cwd=tmp_path, env=env,
+        capture_output=True, text=True, timeout=120,
+    )
+    assert saida.returncode == 0, saida.stderr
+    assert saida.stdout.strip().splitlines()[-1] == '[]'
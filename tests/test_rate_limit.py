@@ -0,0 +1,108 @@
+"""Limites por usuário/servidor e devolução das fichas quando a fila está cheia."""
+import asyncio
+import math
+import os
+import sys
+from types import SimpleNamespace
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import bot  # noqa: E402
+
+
+class MensagemFalsa:
+    async def edit(self, **kwargs):
+        pass
+
+    async def delete(self):
+        pass
+
+
+class AnexoFalso:
+    def __init__(self, nome):
+        self.filename = nome
+
+    async def read(self):
+        return os.urandom(64)
+
+
+def contexto(anexos=1, guild=None):
+    enviados = []
+
+    async def send(conteudo=None, **kwargs):
+        enviados.append(conteudo)
+        return MensagemFalsa()
+
+    ctx = SimpleNamespace(
+        author=SimpleNamespace(id=42, name='usuario'),
+        guild=guild,
+        message=SimpleNamespace(attachments=[AnexoFalso(f'foto{i}.jpg') for i in range(anexos)]),
+        send=send,
+    )
+    return ctx, enviados
+
+
+@pytest.fixture
+def limitador(monkeypatch):
+    monkeypatch.setitem(bot.CONFIG, 'user_rate_per_min', 6)
+    monkeypatch.setitem(bot.CONFIG, 'user_burst', 4)
+    monkeypatch.setitem(bot.CONFIG, 'guild_rate_per_min', 30)
+    monkeypatch.setitem(bot.CONFIG, 'guild_burst', 12)
+    limitador = bot.RateLimiter()
+    monkeypatch.setattr(bot, 'RATE_LIMITER', limitador)
+    return limitador
+
+
+def fichas(limitador):
+    return limitador._buckets[('user', 42)].fichas
+
+
+def test_cobra_o_custo_inteiro(limitador):
+    ctx, _ = contexto()
+    assert limitador.verificar(ctx, 3) == 0
+    assert fichas(limitador) == pytest.approx(1, abs=0.01)
+    assert limitador.verificar(ctx, 2) > 0
+    assert fichas(limitador) == pytest.approx(1, abs=0.01)  # recusado não consome
+
+
+def test_custo_maior_que_a_rajada_nunca_cabe(limitador):
+    ctx, _ = contexto(guild=SimpleNamespace(id=7))
+    assert limitador.maximo_por_mensagem(ctx) == 4
+    assert limitador.verificar(ctx, 5) == math.inf
+
+
+def test_devolver_respeita_a_capacidade(limitador):
+    ctx, _ = contexto()
+    limitador.verificar(ctx, 4)
+    limitador.devolver(ctx, 3)
+    assert fichas(limitador) == pytest.approx(3, abs=0.01)
+    limitador.devolver(ctx, 10)
+    assert fichas(limitador) == 4
+
+
+@pytest.fixture
+def pronto(monkeypatch):
+    monkeypatch.setitem(bot.INICIALIZACAO, 'pronto', True)
+
+
+def test_fila_cheia_nao_gasta_fichas(limitador, pronto, monkeypatch):
+    monkeypatch.setattr(bot, 'INFERENCE_EXECUTOR', SimpleNamespace(cheia=True, rejeitadas=0, estimar_espera=lambda: 3))
+    ctx, enviados = contexto(anexos=2)
+    asyncio.run(bot.detect.callback(ctx))
+    assert 'ocupado' in enviados[-1]
+    assert ('user', 42) not in limitador._buckets
+
+
+def test_rejeicao_da_fila_devolve_as_fichas(limitador, pronto, monkeypatch):
+    async def fila_cheia(*args, **kwargs):
+        raise bot.FilaCheiaError("Fila de inferência cheia")
+
+    monkeypatch.setattr(bot, 'processar_anexo', fila_cheia)
+    monkeypatch.setattr(bot, 'DETECTION_CACHE', bot.DetectionCache(10, 1024 * 1024, 60))
+    ctx, enviados = contexto(anexos=2)
+    asyncio.run(bot.detect.callback(ctx))
+    assert 'ocupado' in enviados[-1]
+    assert fichas(limitador) == pytest.approx(4, abs=0.01)
+    # A nova tentativa não é limitada
+    assert limitador.verificar(ctx, 2) == 0
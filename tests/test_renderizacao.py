@@ -0,0 +1,32 @@
+"""Desenho das detecções direto na imagem decodificada, só com PIL."""
+import os
+import sys
+
+import numpy as np
+from PIL import Image
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import bot  # noqa: E402
+
+
+def deteccoes(cls):
+    return {
+        'xyxy': np.array([[20.0, 40.0, 80.0, 90.0]]),
+        'conf': np.array([0.9]),
+        'cls': np.array([float(cls)]),
+        'names': {i: f'classe{i}' for i in range(30)},
+    }
+
+
+def test_caixa_usa_a_cor_da_classe():
+    for cls in (0, 7, 25):
+        image = Image.new('RGB', (120, 120), (0, 0, 0))
+        bot.desenhar_deteccoes(image, deteccoes(cls))
+        # Borda inferior da caixa, longe do rótulo
+        assert image.getpixel((50, 90)) == bot.PALETA_CAIXAS[cls % len(bot.PALETA_CAIXAS)]
+
+
+def test_paleta_tem_as_20_cores_do_ultralytics():
+    assert len(bot.PALETA_CAIXAS) == 20
+    assert bot.PALETA_CAIXAS[0] == (255, 56, 56)
+    assert all(len(cor) == 3 and all(0 <= c <= 255 for c in cor) for cor in bot.PALETA_CAIXAS)
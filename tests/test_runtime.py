@@ -0,0 +1,93 @@
+"""Distribuição de núcleos do perfil de runtime (processos de inferência x processo principal)."""
+import os
+import sys
+import threading
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import bot  # noqa: E402
+
+
+@pytest.fixture
+def oito_nucleos(monkeypatch):
+    monkeypatch.setattr(os, 'sched_getaffinity', lambda pid: set(range(8)), raising=False)
+    monkeypatch.setattr(bot, 'CPU_RESERVED_CORES', 1)
+
+
+@pytest.fixture
+def sem_afinidade(monkeypatch):
+    monkeypatch.delattr(os, 'sched_getaffinity', raising=False)
+    monkeypatch.delattr(os, 'sched_setaffinity', raising=False)
+
+
+@pytest.fixture
+def registro(monkeypatch):
+    chamadas = {'threads': [], 'pools': [], 'afinidade': []}
+
+    class PoolFalso:
+        ativo = False
+
+        def __init__(self, *args):
+            chamadas['pools'].append(args)
+
+    monkeypatch.setattr(bot, 'PoolProcessos', PoolFalso)
+    monkeypatch.setattr(bot, 'PROCESSOS_INFERENCIA', None)
+    monkeypatch.setattr(bot, 'configurar_threads', lambda threads, interop=None, nucleos=None:
+                        chamadas['threads'].append((threads, interop, nucleos)))
+    monkeypatch.setattr(bot, 'fixar_afinidade', lambda nucleos: chamadas['afinidade'].append(nucleos))
+    return chamadas
+
+
+def test_nucleos_processos_disjuntos(oito_nucleos):
+    assert bot.nucleos_processos(2, 3, True) == [[1, 2, 3], [4, 5, 6]]
+    assert bot.nucleos_processos(2, 4, True) is None  # não cabe nos 7 núcleos livres
+    assert bot.nucleos_processos(2, 3, False) is None
+
+
+def test_nucleos_processos_sem_afinidade(sem_afinidade):
+    assert bot.nucleos_processos(2, 2, True) is None
+    assert bot.nucleos_principal([[1, 2]]) == []
+
+
+def test_candidatos_descontam_reservados(oito_nucleos):
+    assert bot.candidatos_runtime(8, False) == [(1, 8), (1, 4), (2, 4), (4, 2), (8, 1)]
+    assert bot.candidatos_runtime(8, True) == [(1, 7), (1, 3), (2, 3), (4, 1)]
+
+
+def test_principal_fica_com_o_resto(oito_nucleos, registro):
+    bot.aplicar_perfil_runtime({'processos': 2, 'threads': 3, 'interop': 1, 'afinidade': True})
+    assert registro['pools'] == [(2, 3, [[1, 2, 3], [4, 5, 6]], 1)]
+    # Só a afinidade: as threads do torch são configuradas dentro dos processos filhos
+    assert registro['afinidade'] == [[0, 7]]
+    assert registro['threads'] == []
+
+
+def test_principal_vazio_nao_configura_threads(oito_nucleos, registro, monkeypatch):
+    monkeypatch.setattr(bot, 'CPU_RESERVED_CORES', 0)
+    bot.aplicar_perfil_runtime({'processos': 2, 'threads': 4, 'interop': 1, 'afinidade': True})
+    assert registro['pools'] == [(2, 4, [[0, 1, 2, 3], [4, 5, 6, 7]], 1)]
+    assert registro['afinidade'] == []
+    assert registro['threads'] == []
+
+
+def test_perfil_sem_afinidade_disponivel(sem_afinidade, registro):
+    bot.aplicar_perfil_runtime({'processos': 2, 'threads': 1, 'interop': 1, 'afinidade': True})
+    assert registro['pools'] == [(2, 1, None, 1)]
+    assert registro['threads'] == []
+
+
+def test_fixar_afinidade_todas_as_threads(monkeypatch):
+    fixadas = {}
+    monkeypatch.setattr(os, 'sched_setaffinity', lambda tid, nucleos: fixadas.__setitem__(tid, nucleos), raising=False)
+    pronta, fim = threading.Event(), threading.Event()
+    thread = threading.Thread(target=lambda: (pronta.set(), fim.wait()))
+    thread.start()
+    pronta.wait()
+    try:
+        assert bot.fixar_afinidade([0])
+    finally:
+        fim.set()
+        thread.join()
+    assert fixadas[threading.get_native_id()] == [0]
+    assert fixadas[thread.native_id] == [0]